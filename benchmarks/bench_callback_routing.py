@@ -0,0 +1,97 @@
+"""Стоимость маршрутизации callback-а: цепочка фильтров aiogram против таблицы.
+
+Регистрирует N обработчиков с разными префиксами двумя способами —
+``router.callback_query(F.data.startswith("pN:"))`` и ``CallbackTable`` —
+и прогоняет через ``Dispatcher.feed_update`` нажатия на случайные кнопки.
+Без сети: запросы к Telegram API не выполняются::
+
+    python benchmarks/bench_callback_routing.py --handlers 10 50 100 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery, Update
+
+from partyshare.callbacks import CallbackTable
+
+
+def callback_update(update_id: int, data: str) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "chat_instance": "bench",
+                "data": data,
+                "from": {"id": 7, "is_bot": False, "first_name": "Bench"},
+            },
+        }
+    )
+
+
+async def noop(callback: CallbackQuery, *args: Any) -> None:
+    pass
+
+
+def linear_dispatcher(handlers: int) -> Dispatcher:
+    router = Router()
+    for index in range(handlers):
+        router.callback_query.register(noop, F.data.startswith(f"p{index}:"))
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+def table_dispatcher(handlers: int) -> Dispatcher:
+    table = CallbackTable()
+    for index in range(handlers):
+        factory = type(f"P{index}", (CallbackData,), {"__annotations__": {"event_id": int}}, prefix=f"p{index}")
+        table.prefix(factory)(noop)
+    router = Router()
+    table.attach(router)
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def measure(dp: Dispatcher, bot: Bot, updates: list[Update]) -> float:
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / len(updates) * 1e6
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--handlers", type=int, nargs="+", default=[10, 50, 100, 500])
+    parser.add_argument("--updates", type=int, default=5_000)
+    args = parser.parse_args()
+
+    bot = Bot("0:bench")
+    rng = random.Random(1)
+    try:
+        for handlers in args.handlers:
+            updates = [
+                callback_update(i, f"p{rng.randrange(handlers)}:{rng.randrange(10_000)}")
+                for i in range(args.updates)
+            ]
+            linear = await measure(linear_dispatcher(handlers), bot, updates)
+            table = await measure(table_dispatcher(handlers), bot, updates)
+            print(
+                f"handlers={handlers:4d}: filters {linear:8.1f} µs/update, "
+                f"table {table:6.1f} µs/update  (x{linear / table:.1f})"
+            )
+    finally:
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""Пропускная способность обработки апдейтов при 1, 2, 4 и 8 воркер-процессах.
+
+Каждый апдейт проходит через настоящий aiogram ``Dispatcher``, а обработчик
+делает CPU-работу, похожую на ``/summary``: делит расходы события и сводит
+долги. Без БД и Telegram::
+
+    python benchmarks/bench_sharding.py --updates 20000 --workers 1 2 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import random
+import time
+from multiprocessing.queues import Queue
+from typing import Any, Optional
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+
+from partyshare.services.settlement import settle
+from partyshare.services.split import ExpenseItemShare, ExpenseShare, calculate_balances
+from partyshare.sharding import RawUpdate, ShardSupervisor, serve_queue
+from partyshare.webhook import dispatcher_handler
+
+
+def synthetic_update(update_id: int, users: int) -> dict[str, Any]:
+    user_id = 10_000_000 + update_id % users
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+            "text": "/summary",
+        },
+    }
+
+
+def summary_work(seed: int, participants: int = 12, expenses: int = 30) -> int:
+    rng = random.Random(seed)
+    people = list(range(participants))
+    shares = []
+    for _ in range(expenses):
+        items = [
+            ExpenseItemShare(rng.randint(100, 5_000), rng.sample(people, rng.randint(1, participants)))
+            for _ in range(rng.randint(0, 3))
+        ]
+        shares.append(
+            ExpenseShare(
+                payer_id=rng.choice(people),
+                amount_cents=sum(i.amount_cents for i in items) or rng.randint(100, 20_000),
+                is_shared=not items,
+                going_participants=people,
+                items=items or None,
+            )
+        )
+    return len(settle(calculate_balances(shares)))
+
+
+def bench_worker(index: int, queue: Queue[Optional[RawUpdate]], ready: Any) -> None:
+    asyncio.run(_bench_worker(queue, ready))
+
+
+async def _bench_worker(queue: Queue[Optional[RawUpdate]], ready: Any) -> None:
+    router = Router()
+
+    @router.message()
+    async def on_message(message: Message) -> None:
+        summary_work(message.message_id)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot("0:bench")
+    ready.put(True)
+    try:
+        await serve_queue(queue, dispatcher_handler(bot, dp))
+    finally:
+        await bot.session.close()
+
+
+async def run(workers: int, updates: int, users: int) -> float:
+    ready = mp.get_context("spawn").Queue()
+    supervisor = ShardSupervisor(workers, bench_worker, args=(ready,))
+    supervisor.start()
+    for _ in range(workers):
+        await asyncio.to_thread(ready.get)
+
+    started = time.perf_counter()
+    for update_id in range(1, updates + 1):
+        await supervisor.feed(synthetic_update(update_id, users))
+    await asyncio.to_thread(supervisor.stop, 600.0)
+    return updates / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    baseline: Optional[float] = None
+    for workers in args.workers:
+        rate = asyncio.run(run(workers, args.updates, args.users))
+        baseline = baseline or rate
+        print(f"workers={workers}: {rate:8.0f} updates/s  (x{rate / baseline:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Память на активную сессию и стоимость чтения состояния при большом числе пользователей.
+
+Для сравнения те же замеры делаются на прежней раскладке — восемь словарей
+по user_id (``DictLayoutState``).
+
+Запуск::
+
+    python benchmarks/bench_state.py --users 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from partyshare.state import (
+    OWNER_VIEW,
+    MemoryStateStorage,
+    UserSession,
+    UserStateManager,
+)
+
+
+class DictLayoutState:
+    """Прежняя раскладка состояния: отдельный словарь на каждое поле.
+
+    Повторяет только методы, которые нужны замерам.
+    """
+
+    def __init__(self) -> None:
+        self._current_event: dict[int, int] = {}
+        self._active_view: dict[int, str] = {}
+        self._view_events: dict[int, dict[str, int]] = {}
+        self._pending_edit: dict[int, tuple[int, str]] = {}
+        self._creating_event: dict[int, bool] = {}
+        self._adding_expense: dict[int, bool] = {}
+        self._event_data: dict[int, dict[str, str]] = {}
+        self._event_step: dict[int, str] = {}
+
+    def set_view_event(self, user_id: int, view: str, event_id: int) -> None:
+        self._view_events.setdefault(user_id, {})[view] = event_id
+        self._active_view[user_id] = view
+        self._current_event[user_id] = event_id
+
+    def set_creating_event(self, user_id: int) -> None:
+        self._creating_event[user_id] = True
+
+    def set_event_step(self, user_id: int, step: str) -> None:
+        self._event_step[user_id] = step
+
+    def set_event_data(self, user_id: int, key: str, value: str) -> None:
+        self._event_data.setdefault(user_id, {})[key] = value
+
+    def get_view(self, user_id: int) -> str | None:
+        return self._active_view.get(user_id)
+
+    def get_event_step(self, user_id: int) -> str | None:
+        return self._event_step.get(user_id)
+
+    def get_pending_edit(self, user_id: int) -> tuple[int, str] | None:
+        return self._pending_edit.get(user_id)
+
+
+Factory = Callable[[int], Any]
+
+
+def session_layout(users: int) -> UserStateManager:
+    return UserStateManager(MemoryStateStorage(max_entries=users))
+
+
+def dict_layout(users: int) -> DictLayoutState:
+    return DictLayoutState()
+
+
+def populate(manager: Any, users: int) -> None:
+    for user_id in range(users):
+        manager.set_view_event(user_id, OWNER_VIEW, user_id)
+        if user_id % 10 == 0:
+            manager.set_creating_event(user_id)
+            manager.set_event_step(user_id, "datetime")
+            manager.set_event_data(user_id, "title", "Пикник")
+
+
+def measure_memory(factory: Factory, users: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    manager = factory(users)
+    populate(manager, users)
+    total, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total / users
+
+
+def measure_lookups(factory: Factory, users: int, lookups: int) -> float:
+    manager = factory(users)
+    populate(manager, users)
+    rng = random.Random(0)
+    keys = [rng.randrange(users) for _ in range(lookups)]
+    started = time.perf_counter()
+    for user_id in keys:
+        manager.get_view(user_id)
+        manager.get_event_step(user_id)
+        manager.get_pending_edit(user_id)
+    return (time.perf_counter() - started) / (lookups * 3) * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"users:               {args.users}")
+    print(f"session object:      {sys.getsizeof(UserSession())} B")
+    for name, factory in (("sessions", session_layout), ("eight dicts", dict_layout)):
+        print(f"{name}:")
+        print(f"  per user, with map:  {measure_memory(factory, args.users):.0f} B")
+        print(f"  lookup:              {measure_lookups(factory, args.users, args.lookups):.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
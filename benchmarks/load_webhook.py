@@ -0,0 +1,136 @@
+"""Нагрузочный прогон вебхука синтетическими апдейтами.
+
+Без ``--url`` поднимает локальный ``WebhookServer`` с обработчиком-заглушкой,
+который «работает» ``--handler-ms`` миллисекунд, и замеряет время ответа
+Telegram-у и время до обработки всех апдейтов::
+
+    python benchmarks/load_webhook.py --updates 20000 --concurrency 200
+
+С ``--url`` и ``--secret`` шлёт апдейты в уже запущенного бота (только
+тестовый стенд: апдейты адресованы несуществующим пользователям).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Optional
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp import ClientSession, web
+
+from partyshare.webhook import SECRET_HEADER, WebhookServer, dispatcher_handler
+
+PATH = "/telegram/webhook"
+SECRET = "load-test"
+
+
+def synthetic_update(update_id: int, users: int) -> dict[str, Any]:
+    user_id = 10_000_000 + update_id % users
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+            "text": "/help",
+        },
+    }
+
+
+async def start_local_server(port: int, handler_ms: float) -> tuple[WebhookServer, web.AppRunner, Bot, list[int]]:
+    handled: list[int] = []
+    router = Router()
+
+    @router.message()
+    async def on_message(message: Message) -> None:
+        await asyncio.sleep(handler_ms / 1000)
+        handled.append(message.message_id)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot("0:load-test")
+    server = WebhookServer(dispatcher_handler(bot, dp), path=PATH, secret=SECRET)
+    runner = web.AppRunner(server.create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return server, runner, bot, handled
+
+
+async def drive(url: str, secret: str, updates: int, concurrency: int, users: int) -> list[float]:
+    latencies: list[float] = []
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for update_id in range(1, updates + 1):
+        queue.put_nowait(update_id)
+
+    async with ClientSession() as session:
+
+        async def client() -> None:
+            while not queue.empty():
+                update_id = queue.get_nowait()
+                started = time.perf_counter()
+                async with session.post(
+                    url,
+                    json=synthetic_update(update_id, users),
+                    headers={SECRET_HEADER: secret},
+                ) as resp:
+                    await resp.read()
+                    if resp.status != 200:
+                        raise RuntimeError(f"HTTP {resp.status}")
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies
+
+
+def report(latencies: list[float], elapsed: float, processed_at: Optional[float]) -> None:
+    ordered = sorted(latencies)
+
+    def pct(p: float) -> float:
+        return ordered[min(int(len(ordered) * p), len(ordered) - 1)] * 1000
+
+    print(f"updates:      {len(ordered)}")
+    print(f"ack rate:     {len(ordered) / elapsed:.0f} updates/s")
+    print(f"ack latency:  mean {statistics.fmean(ordered) * 1000:.1f} ms, p50 {pct(0.5):.1f} ms, p99 {pct(0.99):.1f} ms")
+    if processed_at is not None:
+        print(f"all handled:  {processed_at:.2f} s")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url")
+    parser.add_argument("--secret", default=SECRET)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--updates", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--handler-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    if args.url:
+        started = time.perf_counter()
+        latencies = await drive(args.url, args.secret, args.updates, args.concurrency, args.users)
+        report(latencies, time.perf_counter() - started, None)
+        return
+
+    server, runner, bot, handled = await start_local_server(args.port, args.handler_ms)
+    try:
+        started = time.perf_counter()
+        latencies = await drive(
+            f"http://127.0.0.1:{args.port}{PATH}", SECRET, args.updates, args.concurrency, args.users
+        )
+        elapsed = time.perf_counter() - started
+        await server.drain()
+        report(latencies, elapsed, time.perf_counter() - started)
+        assert len(handled) == args.updates
+    finally:
+        await runner.cleanup()
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,51 +1,199 @@
 from __future__ import annotations
 
 import asyncio
+import signal
+from multiprocessing.queues import Queue
+from typing import Optional
 
-from aiogram import Bot, Dispatcher
+from aiogram import Bot, Dispatcher, Router
 from aiogram.enums import ParseMode
 
-from partyshare.config import get_settings
+from partyshare.callbacks import callbacks, check_duplicate_commands
+from partyshare.coalesce import status_writes
+from partyshare.config import Settings, get_settings
 from partyshare.db.repo import Database, PartyShareRepository, set_global_repository
 from partyshare.handlers import basic_router, events_router, expenses_router
 from partyshare.handlers.inline import inline_router
-from partyshare.state import state
+from partyshare.leader import LeaderElector
+from partyshare.middlewares import (
+    DEFAULT_RATE_LIMITS,
+    EarlyAckMiddleware,
+    OrderingMiddleware,
+    StateMiddleware,
+    ThrottleMiddleware,
+)
+from partyshare.state import create_storage, state
 from partyshare.logging import configure_logging, get_logger
+from partyshare.metrics import start_metrics_server
+from partyshare.outbox import Outbox, OutboxWorker, set_global_outbox
 from partyshare.scheduler import setup_scheduler
+from partyshare.sharding import RawUpdate, ShardSupervisor, poll_updates, serve_queue
+from partyshare.webhook import dispatcher_handler, run_webhook, shutdown_event
 
 
-async def main() -> None:
-    configure_logging()
-    log = get_logger(__name__)
-    settings = get_settings()
-    
-    log.info("bot.create")
-    bot = Bot(token=settings.bot_token, parse_mode=ParseMode.HTML)
+def create_dispatcher() -> Dispatcher:
     dp = Dispatcher()
-    db = Database(settings.database_url)
-    await db.connect()
-    repo = PartyShareRepository(db)
-
     dp.include_router(basic_router)
     dp.include_router(events_router)
     dp.include_router(expenses_router)
     dp.include_router(inline_router)
+    # Callback-кнопки разбираются таблицей; её роутер последний, чтобы
+    # специальные фильтры других роутеров (если появятся) срабатывали раньше
+    callback_router = Router(name="callbacks")
+    callbacks.attach(callback_router)
+    dp.include_router(callback_router)
+    check_duplicate_commands(dp)
+    settings = get_settings()
+    # Порядок важен: лишние апдейты отсекаются до очереди пользователя,
+    # а состояние подгружается уже внутри неё
+    if settings.rate_limit_enabled:
+        limits = {**DEFAULT_RATE_LIMITS, **settings.rate_limits}
+        dp.update.outer_middleware(ThrottleMiddleware(limits))
+    dp.update.outer_middleware(OrderingMiddleware(max_concurrency=settings.update_concurrency))
+    dp.update.outer_middleware(StateMiddleware(state))
+    dp.callback_query.middleware(EarlyAckMiddleware(max_concurrency=settings.callback_work_concurrency))
+    return dp
+
 
+async def setup_services(settings: Settings) -> tuple[Database, PartyShareRepository, Outbox]:
+    db = Database(settings.database_url)
+    await db.connect()
+    repo = PartyShareRepository(db)
     set_global_repository(repo)
 
-    scheduler = await setup_scheduler(bot, repo)
+    state.use_storage(
+        create_storage(
+            settings.state_backend,
+            repo,
+            ttl=settings.state_ttl,
+            max_entries=settings.state_max_entries,
+            max_bytes=settings.state_max_bytes,
+        )
+    )
+
+    status_writes.configure(window=settings.status_coalesce_window)
+
+    outbox = Outbox(repo)
+    set_global_outbox(outbox)
+    return db, repo, outbox
+
 
+async def main() -> None:
+    configure_logging()
     log = get_logger(__name__)
-    log.info("bot.start")
+    settings = get_settings()
+
+    log.info("bot.create")
+    bot = Bot(token=settings.bot_token, parse_mode=ParseMode.HTML)
+    dp = create_dispatcher()
+    db, repo, outbox = await setup_services(settings)
+
+    outbox_worker = OutboxWorker(
+        bot,
+        repo,
+        outbox,
+        concurrency=settings.outbox_workers,
+        batch_size=settings.outbox_batch_size,
+        poll_interval=settings.outbox_poll_interval,
+        max_attempts=settings.outbox_max_attempts,
+        rate_limit=settings.outbox_rate_limit,
+    )
+    await outbox_worker.start()
+
+    metrics_runner = None
+    if settings.metrics_port:
+        metrics_runner = await start_metrics_server(settings.metrics_host, settings.metrics_port)
+
+    leader = LeaderElector(
+        db,
+        settings.leader_lock_key,
+        check_interval=settings.leader_check_interval,
+    )
+    await leader.start()
+    scheduler = await setup_scheduler(repo, outbox, leader)
+
+    log.info("bot.start", mode=settings.bot_mode, workers=settings.worker_processes)
     try:
-        await dp.start_polling(bot)
+        if settings.worker_processes > 1:
+            await run_sharded(bot, dp, settings)
+        elif settings.bot_mode == "webhook":
+            await dp.emit_startup(bot=bot)
+            try:
+                await run_webhook(
+                    bot,
+                    dispatcher_handler(bot, dp),
+                    settings,
+                    allowed_updates=dp.resolve_used_update_types(),
+                )
+            finally:
+                await dp.emit_shutdown(bot=bot)
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     finally:
         scheduler.shutdown(wait=False)
+        await leader.stop()
+        await status_writes.flush_all()
+        await outbox_worker.stop()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
         await db.close()
         await bot.session.close()
         log.info("bot.stop")
 
 
+async def run_sharded(bot: Bot, dp: Dispatcher, settings: Settings) -> None:
+    """Супервизор: принимает апдейты и раздаёт их воркер-процессам по пользователю.
+
+    Исходящая очередь, планировщик и метрики остаются в этом процессе,
+    воркеры только обрабатывают апдейты.
+    """
+    supervisor = ShardSupervisor(settings.worker_processes, run_worker)
+    supervisor.start()
+    watcher = asyncio.create_task(supervisor.watch())
+    allowed_updates = dp.resolve_used_update_types()
+    try:
+        if settings.bot_mode == "webhook":
+            await run_webhook(bot, supervisor.feed, settings, allowed_updates=allowed_updates)
+        else:
+            await bot.delete_webhook()
+            stop = shutdown_event()
+            polling = asyncio.create_task(
+                poll_updates(bot, supervisor.feed, stop, allowed_updates=allowed_updates)
+            )
+            await stop.wait()
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
+    finally:
+        watcher.cancel()
+        await asyncio.to_thread(supervisor.stop)
+
+
+def run_worker(index: int, queue: Queue[Optional[RawUpdate]]) -> None:
+    """Точка входа воркер-процесса."""
+    # Останавливает воркеры супервизор, присылая None в очередь
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker(index, queue))
+
+
+async def _worker(index: int, queue: Queue[Optional[RawUpdate]]) -> None:
+    configure_logging()
+    log = get_logger(__name__).bind(shard=index)
+    settings = get_settings()
+    bot = Bot(token=settings.bot_token, parse_mode=ParseMode.HTML)
+    dp = create_dispatcher()
+    db, _, _ = await setup_services(settings)
+    await dp.emit_startup(bot=bot)
+    log.info("shard.worker.ready")
+    try:
+        handled = await serve_queue(queue, dispatcher_handler(bot, dp))
+        log.info("shard.worker.stop", handled=handled)
+    finally:
+        await dp.emit_shutdown(bot=bot)
+        await status_writes.flush_all()
+        await db.close()
+        await bot.session.close()
+
+
 if __name__ == "__main__":
     asyncio.run(main())
-
@@ -0,0 +1,144 @@
+"""Рассылка владельца всем участникам события через исходящую очередь."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from partyshare.db.repo import PartyShareRepository
+from partyshare.logging import get_logger
+from partyshare.outbox import Outbox, OutboxMessage, Priority
+
+PROGRESS_INTERVAL = 3.0
+PROGRESS_TIMEOUT = 15 * 60.0
+
+_progress_tasks: set[asyncio.Task[None]] = set()
+
+
+@dataclass(slots=True)
+class BroadcastProgress:
+    total: int
+    sent: int = 0
+    failed: int = 0
+
+    @property
+    def done(self) -> bool:
+        return self.sent + self.failed >= self.total
+
+    @classmethod
+    def from_counts(cls, total: int, counts: dict[str, int]) -> "BroadcastProgress":
+        return cls(total=total, sent=counts.get("sent", 0), failed=counts.get("dead", 0))
+
+
+def unique_recipients(participants: Iterable[Any], exclude_user_ids: Iterable[int] = ()) -> list[int]:
+    """tg_id участников без повторов и без исключённых пользователей, в исходном порядке."""
+    excluded = set(exclude_user_ids)
+    seen: set[int] = set()
+    recipients: list[int] = []
+    for participant in participants:
+        tg_id = participant["tg_id"]
+        if not tg_id or participant["user_id"] in excluded or tg_id in seen:
+            continue
+        seen.add(tg_id)
+        recipients.append(tg_id)
+    return recipients
+
+
+def format_progress(progress: BroadcastProgress) -> str:
+    if progress.done:
+        text = f"✅ Рассылка завершена: доставлено {progress.sent} из {progress.total}"
+    else:
+        text = f"📣 Рассылка: доставлено {progress.sent} из {progress.total}"
+    if progress.failed:
+        text += f" (не доставлено: {progress.failed})"
+    return text
+
+
+async def broadcast_to_participants(
+    bot: Bot,
+    repo: PartyShareRepository,
+    outbox: Outbox,
+    *,
+    event_id: int,
+    text: str,
+    progress_chat_id: int,
+    exclude_user_ids: Iterable[int] = (),
+) -> int:
+    """Ставит сообщение участникам в очередь и запускает отчёт о доставке.
+
+    Прогресс показывается в одном сообщении ``progress_chat_id``, которое
+    редактируется раз в несколько секунд, а не после каждого получателя.
+    Возвращает число получателей.
+    """
+    participants = await repo.get_event_participants(event_id)
+    recipients = unique_recipients(participants, exclude_user_ids)
+    if not recipients:
+        await bot.send_message(progress_chat_id, "Некого оповещать: в событии нет других участников.")
+        return 0
+
+    batch_key = f"broadcast:{event_id}:{uuid.uuid4().hex}"
+    await outbox.enqueue_many(
+        OutboxMessage(
+            chat_id=tg_id,
+            text=text,
+            priority=Priority.BULK,
+            idempotency_key=f"{batch_key}:{tg_id}",
+            batch_key=batch_key,
+        )
+        for tg_id in recipients
+    )
+    get_logger(__name__).info(
+        "broadcast.enqueued",
+        event_id=event_id,
+        recipients=len(recipients),
+        batch_key=batch_key,
+    )
+
+    progress = BroadcastProgress(total=len(recipients))
+    status_message = await bot.send_message(progress_chat_id, format_progress(progress))
+    task = asyncio.create_task(
+        _track_progress(bot, repo, progress_chat_id, status_message.message_id, batch_key, progress)
+    )
+    _progress_tasks.add(task)
+    task.add_done_callback(_progress_tasks.discard)
+    return len(recipients)
+
+
+async def _track_progress(
+    bot: Bot,
+    repo: PartyShareRepository,
+    chat_id: int,
+    message_id: int,
+    batch_key: str,
+    progress: BroadcastProgress,
+    interval: float = PROGRESS_INTERVAL,
+) -> None:
+    log = get_logger(__name__)
+    deadline = time.monotonic() + PROGRESS_TIMEOUT
+    shown = format_progress(progress)
+    while not progress.done and time.monotonic() < deadline:
+        await asyncio.sleep(interval)
+        try:
+            counts = await repo.outbox_batch_progress(batch_key)
+            progress = BroadcastProgress.from_counts(progress.total, counts)
+            text = format_progress(progress)
+            if text != shown:
+                await bot.edit_message_text(text=text, chat_id=chat_id, message_id=message_id)
+                shown = text
+        except TelegramBadRequest as exc:
+            log.warning("broadcast.progress.edit_failed", batch_key=batch_key, error=str(exc))
+        except Exception:
+            log.exception("broadcast.progress.error", batch_key=batch_key)
+    log.info(
+        "broadcast.finished",
+        batch_key=batch_key,
+        sent=progress.sent,
+        failed=progress.failed,
+        total=progress.total,
+    )
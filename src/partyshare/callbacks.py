@@ -0,0 +1,192 @@
+"""Таблица маршрутизации callback-кнопок.
+
+Вместо цепочки фильтров ``F.data.startswith(...)``, которые aiogram
+проверяет по одному на каждое нажатие, ``callback_data`` разбирается один
+раз: сначала ищется точное совпадение, затем — обработчик по первому
+сегменту (префиксу ``CallbackData``). Повторная регистрация того же
+ключа — ошибка при импорте модуля с обработчиками.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.filters import Command
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class OwnerEvent(CallbackData, prefix="owner"):
+    event_id: int
+
+
+class EventParticipants(CallbackData, prefix="event_participants"):
+    event_id: int
+
+
+class EventExpenses(CallbackData, prefix="event_expenses"):
+    event_id: int
+
+
+class EventSettlement(CallbackData, prefix="event_settlement"):
+    event_id: int
+
+
+class EventNav(CallbackData, prefix="event_nav"):
+    view: str
+    direction: str
+
+
+class EventListingTab(CallbackData, prefix="myevents_listing"):
+    listing: str
+
+
+class Manage(CallbackData, prefix="manage"):
+    event_id: int
+
+
+class ManageEdit(CallbackData, prefix="manage_edit"):
+    field: str
+    event_id: int
+
+
+class ManageNotify(CallbackData, prefix="manage_notify"):
+    event_id: int
+
+
+class ManageCancel(CallbackData, prefix="manage_cancel"):
+    event_id: int
+
+
+class ManageRemove(CallbackData, prefix="manage_remove"):
+    event_id: int
+
+
+class Invite(CallbackData, prefix="invite"):
+    event_id: int
+
+
+class CycleStatus(CallbackData, prefix="cycle_status"):
+    event_id: int
+
+
+class Summary(CallbackData, prefix="summary"):
+    event_id: int
+
+
+@dataclass(frozen=True, slots=True)
+class CallbackRoute:
+    handler: Handler
+    factory: Optional[type[CallbackData]] = None
+    early_ack: bool = False
+
+    @property
+    def name(self) -> str:
+        return self.handler.__name__
+
+
+class CallbackTable:
+    def __init__(self) -> None:
+        self._exact: dict[str, CallbackRoute] = {}
+        self._prefix: dict[str, CallbackRoute] = {}
+
+    def __len__(self) -> int:
+        return len(self._exact) + len(self._prefix)
+
+    def exact(self, data: str, *, early_ack: bool = False) -> Callable[[Handler], Handler]:
+        """Обработчик ``handler(callback)`` для кнопки с фиксированным ``callback_data``."""
+
+        def register(handler: Handler) -> Handler:
+            self._add(self._exact, data, CallbackRoute(handler, early_ack=early_ack))
+            return handler
+
+        return register
+
+    def prefix(
+        self, factory: type[CallbackData], *, early_ack: bool = False
+    ) -> Callable[[Handler], Handler]:
+        """Обработчик ``handler(callback, data)``, где ``data`` — разобранный ``factory``."""
+
+        def register(handler: Handler) -> Handler:
+            route = CallbackRoute(handler, factory=factory, early_ack=early_ack)
+            self._add(self._prefix, factory.__prefix__, route)
+            return handler
+
+        return register
+
+    def resolve(self, data: str) -> Optional[tuple[CallbackRoute, Optional[CallbackData]]]:
+        route = self._exact.get(data)
+        if route is not None:
+            return route, None
+        route = self._prefix.get(data.partition(":")[0])
+        if route is None or route.factory is None:
+            return None
+        try:
+            return route, route.factory.unpack(data)
+        except (TypeError, ValueError):
+            return None
+
+    def attach(self, router: Router) -> None:
+        """Регистрирует в ``router`` единственный обработчик, который диспетчеризует по таблице."""
+
+        async def match(callback: CallbackQuery) -> Union[bool, dict[str, Any]]:
+            resolved = self.resolve(callback.data) if callback.data else None
+            if resolved is None:
+                return False
+            route, payload = resolved
+            return {"callback_route": route, "callback_payload": payload}
+
+        async def dispatch_callback(
+            callback: CallbackQuery,
+            callback_route: CallbackRoute,
+            callback_payload: Optional[CallbackData],
+        ) -> Any:
+            if callback_payload is None:
+                return await callback_route.handler(callback)
+            return await callback_route.handler(callback, callback_payload)
+
+        async def stale_callback(callback: CallbackQuery) -> None:
+            await callback.answer("Кнопка устарела, откройте меню заново")
+
+        router.callback_query.register(dispatch_callback, match)
+        router.callback_query.register(stale_callback)
+
+    def _add(self, index: dict[str, CallbackRoute], key: str, route: CallbackRoute) -> None:
+        existing = index.get(key)
+        if existing is not None:
+            raise RuntimeError(
+                f"callback {key!r} уже обрабатывает {existing.name}, повторно: {route.name}"
+            )
+        index[key] = route
+
+
+callbacks = CallbackTable()
+
+
+def check_duplicate_commands(router: Router) -> None:
+    """Падает, если одну команду обрабатывают несколько обработчиков.
+
+    aiogram молча вызывает первый подходящий, и второй обработчик
+    оказывается мёртвым кодом.
+    """
+    seen: dict[str, HandlerObject] = {}
+    for sub_router in router.chain_tail:
+        for handler in sub_router.message.handlers:
+            for handler_filter in handler.filters or ():
+                # callback типизирован как функция, и без object mypy считает
+                # проверку на Command заведомо ложной
+                command: object = handler_filter.callback
+                if not isinstance(command, Command):
+                    continue
+                for key in command.commands:
+                    owner = seen.setdefault(key, handler)
+                    if owner is not handler:
+                        raise RuntimeError(
+                            f"/{key} уже обрабатывает {owner.callback.__name__}, "
+                            f"повторно: {handler.callback.__name__}"
+                        )
@@ -0,0 +1,132 @@
+"""Склейка быстрых повторных записей одного ключа.
+
+Пока окно открыто, новые значения заменяют старое в памяти, а в БД уходит
+только последнее. Окно продлевается с каждым изменением, но не дольше
+``max_delay`` от первого.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+from partyshare.logging import get_logger
+from partyshare.metrics import registry
+
+V = TypeVar("V")
+Flush = Callable[[V], Awaitable[None]]
+
+coalesced_writes = registry.counter(
+    "partyshare_coalesced_writes_total", "Изменения, поглощённые более поздним в том же окне"
+)
+coalesced_flushes = registry.counter("partyshare_coalesced_flushes_total", "Записи после закрытия окна")
+
+
+@dataclass(slots=True)
+class _Pending(Generic[V]):
+    value: V
+    flush: Flush[V]
+    first_at: float
+    timer: Optional[asyncio.TimerHandle] = None
+    task: Optional["asyncio.Task[None]"] = None
+
+
+class WriteCoalescer(Generic[V]):
+    def __init__(self, name: str, *, window: float = 1.5, max_delay: float = 5.0) -> None:
+        self.name = name
+        self.window = window
+        self.max_delay = max_delay
+        self._pending: dict[Hashable, _Pending[V]] = {}
+        # ключи, запись которых уже идёт: их значение ещё не видно в БД
+        self._writing: dict[Hashable, _Pending[V]] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._log = get_logger(__name__)
+
+    def configure(self, *, window: float, max_delay: Optional[float] = None) -> None:
+        self.window = window
+        if max_delay is not None:
+            self.max_delay = max_delay
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def pending(self, key: Hashable) -> Optional[V]:
+        """Последнее значение ключа, ещё не подтверждённое записью в БД."""
+        entry = self._pending.get(key) or self._writing.get(key)
+        return entry.value if entry is not None else None
+
+    def submit(self, key: Hashable, value: V, flush: Flush[V]) -> None:
+        """Запоминает значение; ``flush(value)`` вызовется с последним из них."""
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = _Pending(value, flush, now)
+        else:
+            coalesced_writes.inc(kind=self.name)
+            entry.value = value
+            entry.flush = flush
+            if entry.timer is not None:
+                entry.timer.cancel()
+        delay = min(self.window, entry.first_at + self.max_delay - now)
+        if delay <= 0:
+            self._start(key)
+        else:
+            entry.timer = loop.call_later(delay, self._start, key)
+
+    async def discard(self, key: Hashable) -> None:
+        """Отменяет накопленное значение и дожидается уже идущей записи ключа.
+
+        Вызывается перед прямой записью того же ключа в обход склейки, чтобы
+        отложенная запись не перетёрла её.
+        """
+        entry = self._pending.pop(key, None)
+        if entry is not None and entry.timer is not None:
+            entry.timer.cancel()
+        writing = self._writing.get(key)
+        if writing is not None and writing.task is not None:
+            await asyncio.wait({writing.task})
+
+    async def flush_all(self) -> None:
+        """Немедленно записывает всё накопленное (при остановке бота)."""
+        for key in list(self._pending):
+            self._start(key)
+        # записи, отложенные до конца текущих, запускаются по их завершении
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _start(self, key: Hashable) -> None:
+        entry = self._pending.get(key)
+        if entry is None:
+            return
+        if entry.timer is not None:
+            entry.timer.cancel()
+            entry.timer = None
+        if key in self._writing:
+            # предыдущая запись ключа ещё идёт: новая начнётся после неё,
+            # иначе две записи могут закоммититься в любом порядке
+            return
+        del self._pending[key]
+        self._writing[key] = entry
+        task = entry.task = asyncio.create_task(self._write(key, entry))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, key: Hashable, entry: _Pending[Any]) -> None:
+        try:
+            await entry.flush(entry.value)
+            coalesced_flushes.inc(kind=self.name)
+        except Exception:
+            self._log.exception("coalesce.flush.error", kind=self.name, key=repr(key))
+        finally:
+            if self._writing.get(key) is entry:
+                del self._writing[key]
+            waiting = self._pending.get(key)
+            if waiting is not None and waiting.timer is None:
+                self._start(key)
+
+
+# (event_id, tg_id) -> (users.id, ParticipantStatus)
+status_writes: WriteCoalescer[Any] = WriteCoalescer("participant_status")
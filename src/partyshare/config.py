@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from functools import lru_cache
+from typing import Literal, Optional
 from zoneinfo import ZoneInfo
 
 from pydantic import Field
@@ -19,6 +20,57 @@ class Settings(BaseSettings):
     database_url: str = Field(..., alias="DATABASE_URL")
     tz: str = Field("Europe/Moscow", alias="TZ")
 
+    bot_mode: Literal["polling", "webhook"] = Field("polling", alias="BOT_MODE")
+    webhook_url: Optional[str] = Field(None, alias="WEBHOOK_URL")
+    webhook_path: str = Field("/telegram/webhook", alias="WEBHOOK_PATH")
+    webhook_secret: Optional[str] = Field(None, alias="WEBHOOK_SECRET")
+    webhook_host: str = Field("0.0.0.0", alias="WEBHOOK_HOST")
+    webhook_port: int = Field(8080, alias="WEBHOOK_PORT")
+
+    worker_processes: int = Field(1, alias="WORKER_PROCESSES")
+    update_concurrency: int = Field(64, alias="UPDATE_CONCURRENCY")
+    callback_work_concurrency: int = Field(16, alias="CALLBACK_WORK_CONCURRENCY")
+
+    status_coalesce_window: float = Field(1.5, alias="STATUS_COALESCE_WINDOW")
+
+    rate_limit_enabled: bool = Field(True, alias="RATE_LIMIT_ENABLED")
+    # JSON вида {"nav": [2, 8]} — переопределяет лимиты отдельных классов
+    rate_limits: dict[str, tuple[float, int]] = Field(default_factory=dict, alias="RATE_LIMITS")
+
+    state_backend: Literal["memory", "postgres", "hybrid"] = Field("memory", alias="STATE_BACKEND")
+    state_ttl: float = Field(24 * 3600, alias="STATE_TTL")
+    state_max_entries: int = Field(100_000, alias="STATE_MAX_ENTRIES")
+    state_max_bytes: Optional[int] = Field(None, alias="STATE_MAX_BYTES")
+
+    leader_lock_key: int = Field(726_001, alias="LEADER_LOCK_KEY")
+    leader_check_interval: float = Field(5.0, alias="LEADER_CHECK_INTERVAL")
+
+    reminder_batch_size: int = Field(50, alias="REMINDER_BATCH_SIZE")
+
+    digest_hour: int = Field(9, alias="DIGEST_HOUR")
+    digest_days: int = Field(7, alias="DIGEST_DAYS")
+    digest_debt_days: int = Field(30, alias="DIGEST_DEBT_DAYS")
+    digest_batch_size: int = Field(200, alias="DIGEST_BATCH_SIZE")
+
+    archive_after_days: int = Field(90, alias="ARCHIVE_AFTER_DAYS")
+    archive_batch_size: int = Field(200, alias="ARCHIVE_BATCH_SIZE")
+
+    retention_link_days: int = Field(30, alias="RETENTION_LINK_DAYS")
+    retention_reminder_days: int = Field(7, alias="RETENTION_REMINDER_DAYS")
+    retention_canceled_days: int = Field(30, alias="RETENTION_CANCELED_DAYS")
+    retention_outbox_days: int = Field(30, alias="RETENTION_OUTBOX_DAYS")
+    retention_batch_size: int = Field(1000, alias="RETENTION_BATCH_SIZE")
+    retention_pause: float = Field(0.5, alias="RETENTION_PAUSE")
+
+    outbox_workers: int = Field(4, alias="OUTBOX_WORKERS")
+    outbox_batch_size: int = Field(10, alias="OUTBOX_BATCH_SIZE")
+    outbox_poll_interval: float = Field(1.0, alias="OUTBOX_POLL_INTERVAL")
+    outbox_max_attempts: int = Field(5, alias="OUTBOX_MAX_ATTEMPTS")
+    outbox_rate_limit: float = Field(25.0, alias="OUTBOX_RATE_LIMIT")
+
+    metrics_host: str = Field("0.0.0.0", alias="METRICS_HOST")
+    metrics_port: Optional[int] = Field(None, alias="METRICS_PORT")
+
     @property
     def zoneinfo(self) -> ZoneInfo:
         return ZoneInfo(self.tz)
@@ -4,7 +4,7 @@ from logging.config import fileConfig
 
 from alembic import context
 from sqlalchemy import create_engine, engine_from_config, pool
-from sqlalchemy.engine import make_url
+from sqlalchemy.engine import Connection, make_url
 
 from partyshare.config import get_settings
 
@@ -33,16 +33,27 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+def _run_on(connection: Connection) -> None:
+    context.configure(connection=connection, render_as_batch=True)
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
 def run_migrations_online() -> None:
+    # Готовое соединение (например, тестовое со своей схемой) передаётся
+    # через config.attributes["connection"]
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_on(connection)
+        return
+
     url = _sync_database_url()
     print(f"[alembic] using url: {url}")
     connectable = create_engine(url, poolclass=pool.NullPool)
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, render_as_batch=True)
-
-        with context.begin_transaction():
-            context.run_migrations()
+        _run_on(connection)
 
 
 if context.is_offline_mode():
@@ -0,0 +1,48 @@
+"""outbound message queue
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("chat_id", sa.BigInteger(), nullable=False),
+        sa.Column("method", sa.Text(), nullable=False, server_default="send_message"),
+        sa.Column("payload", postgresql.JSONB, nullable=False),
+        sa.Column("priority", sa.SmallInteger(), nullable=False, server_default="10"),
+        sa.Column("idempotency_key", sa.Text(), unique=True),
+        sa.Column("status", sa.Text(), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("sent_at", sa.DateTime(timezone=True)),
+        sa.CheckConstraint("status in ('pending','sending','sent','dead')", name="outbox_status_check"),
+    )
+    op.create_index(
+        "idx_outbox_ready",
+        "outbox",
+        ["priority", "next_attempt_at", "id"],
+        postgresql_where=sa.text("status in ('pending','sending')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_outbox_ready", table_name="outbox")
+    op.drop_table("outbox")
@@ -0,0 +1,32 @@
+"""outbox batch key for broadcast progress
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("outbox", sa.Column("batch_key", sa.Text()))
+    op.create_index(
+        "idx_outbox_batch_key",
+        "outbox",
+        ["batch_key"],
+        postgresql_where=sa.text("batch_key IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_outbox_batch_key", table_name="outbox")
+    op.drop_column("outbox", "batch_key")
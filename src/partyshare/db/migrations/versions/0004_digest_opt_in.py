@@ -0,0 +1,35 @@
+"""daily digest opt-in
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("digest_enabled", sa.Boolean(), nullable=False, server_default=sa.text("false")),
+    )
+    op.create_index(
+        "idx_users_digest_enabled",
+        "users",
+        ["id"],
+        postgresql_where=sa.text("digest_enabled"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_users_digest_enabled", table_name="users")
+    op.drop_column("users", "digest_enabled")
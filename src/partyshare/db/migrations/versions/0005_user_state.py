@@ -0,0 +1,35 @@
+"""unlogged user state table
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Состояние диалогов не переживает крэш БД без потерь, зато не пишется в WAL
+    op.execute(
+        """
+        CREATE UNLOGGED TABLE user_state (
+            tg_id BIGINT PRIMARY KEY,
+            data JSONB NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """
+    )
+    op.create_index("idx_user_state_updated_at", "user_state", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_user_state_updated_at", table_name="user_state")
+    op.drop_table("user_state")
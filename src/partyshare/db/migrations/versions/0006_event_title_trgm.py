@@ -0,0 +1,26 @@
+"""trigram index on event titles
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Поиск событий по названию в inline-режиме: ILIKE '%…%' и similarity по GIN
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE INDEX idx_events_title_trgm ON events USING gin (title gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    op.drop_index("idx_events_title_trgm", table_name="events")
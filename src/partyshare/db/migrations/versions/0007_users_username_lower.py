@@ -0,0 +1,25 @@
+"""case-insensitive username index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # resolve_usernames: lower(username) = ANY($1) для /invite и /additem
+    op.execute("CREATE INDEX idx_users_username_lower ON users (lower(username))")
+
+
+def downgrade() -> None:
+    op.drop_index("idx_users_username_lower", table_name="users")
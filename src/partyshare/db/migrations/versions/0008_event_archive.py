@@ -0,0 +1,52 @@
+"""archive tables for finished events
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+# Таблица -> (первичный ключ, индексы архива). Колонки архива повторяют
+# горячую таблицу в том же порядке: перенос идёт через INSERT ... SELECT *,
+# поэтому новые колонки нужно добавлять в обе таблицы.
+ARCHIVED = {
+    "events": ("id", ["owner_id"]),
+    "event_participants": ("event_id, user_id", ["user_id"]),
+    "expenses": ("id", ["event_id"]),
+    "expense_items": ("id", ["expense_id"]),
+    "expense_item_consumers": ("item_id, user_id", []),
+    "reminders": ("id", ["event_id"]),
+}
+# Исторические чтения идут через all_* — горячая таблица плюс архив
+VIEWS = ["events", "event_participants", "expenses", "expense_items", "expense_item_consumers"]
+
+
+def upgrade() -> None:
+    for table, (primary_key, indexes) in ARCHIVED.items():
+        op.execute(f"CREATE TABLE {table}_archive (LIKE {table} INCLUDING CONSTRAINTS)")
+        op.execute(f"ALTER TABLE {table}_archive ADD PRIMARY KEY ({primary_key})")
+        for column in indexes:
+            op.create_index(f"idx_{table}_archive_{column}", f"{table}_archive", [column])
+    for table in VIEWS:
+        op.execute(
+            f"CREATE VIEW all_{table} AS SELECT * FROM {table} UNION ALL SELECT * FROM {table}_archive"
+        )
+    # Перенос позиций по expense_id — без индекса каждый батч читал бы всю таблицу
+    op.create_index("idx_expense_items_expense", "expense_items", ["expense_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_expense_items_expense", table_name="expense_items")
+    for table in VIEWS:
+        op.execute(f"DROP VIEW all_{table}")
+    for table in ARCHIVED:
+        op.drop_table(f"{table}_archive")
@@ -0,0 +1,37 @@
+"""indexes for retention cleanup
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Очистка ищет кандидатов по частичным индексам, а не сканированием таблиц
+    op.execute("CREATE INDEX idx_reminders_sent_remind_at ON reminders (remind_at) WHERE sent")
+    op.execute(
+        "CREATE INDEX idx_event_invite_links_expires_at ON event_invite_links (expires_at) "
+        "WHERE expires_at IS NOT NULL"
+    )
+    op.execute("CREATE INDEX idx_events_canceled_starts_at ON events (starts_at) WHERE canceled")
+    # Каскадное удаление и архивация событий находят зависимые строки по event_id
+    op.create_index("idx_reminders_event", "reminders", ["event_id"])
+    op.create_index("idx_event_invite_links_event", "event_invite_links", ["event_id", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_event_invite_links_event", table_name="event_invite_links")
+    op.drop_index("idx_reminders_event", table_name="reminders")
+    op.drop_index("idx_events_canceled_starts_at", table_name="events")
+    op.drop_index("idx_event_invite_links_expires_at", table_name="event_invite_links")
+    op.drop_index("idx_reminders_sent_remind_at", table_name="reminders")
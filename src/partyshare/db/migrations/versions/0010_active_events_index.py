@@ -0,0 +1,29 @@
+"""partial index for active events listing
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # «Мои события» и inline-поиск читают только неотменённые события владельца
+    # по диапазону starts_at: отменённые в индекс не попадают
+    op.execute(
+        "CREATE INDEX idx_events_owner_active_starts_at ON events (owner_id, starts_at) "
+        "WHERE NOT canceled"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_events_owner_active_starts_at", table_name="events")
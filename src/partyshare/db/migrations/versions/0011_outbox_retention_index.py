@@ -0,0 +1,25 @@
+"""partial index for purging delivered outbox messages
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Очистка доставленных сообщений очереди ищет кандидатов по sent_at
+    op.execute("CREATE INDEX idx_outbox_sent_at ON outbox (sent_at) WHERE status = 'sent'")
+
+
+def downgrade() -> None:
+    op.drop_index("idx_outbox_sent_at", table_name="outbox")
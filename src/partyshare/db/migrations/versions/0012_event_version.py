@@ -0,0 +1,39 @@
+"""event version for caches keyed on event data
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+# Архив переносится через INSERT ... SELECT *, поэтому колонка добавляется в
+# обе таблицы, а all_events пересоздаётся: * во view раскрыт при создании
+TABLES = ["events", "events_archive"]
+ALL_EVENTS = "CREATE VIEW all_events AS SELECT * FROM events UNION ALL SELECT * FROM events_archive"
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(
+            table,
+            sa.Column("version", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        )
+    op.execute("DROP VIEW all_events")
+    op.execute(ALL_EVENTS)
+
+
+def downgrade() -> None:
+    op.execute("DROP VIEW all_events")
+    for table in TABLES:
+        op.drop_column(table, "version")
+    op.execute(ALL_EVENTS)
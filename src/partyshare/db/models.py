@@ -13,6 +13,40 @@ class ParticipantStatus(str, Enum):
     MAYBE = "maybe"
 
 
+class EventListing(str, Enum):
+    """Срез списка «Мои события»."""
+
+    UPCOMING = "upcoming"
+    PAST = "past"
+    CANCELED = "canceled"
+
+
+class InviteResult(str, Enum):
+    JOINED = "joined"
+    ALREADY_PARTICIPANT = "already_participant"
+    NOT_FOUND = "not_found"
+    EXPIRED = "expired"
+    EXHAUSTED = "exhausted"
+    EVENT_CANCELED = "event_canceled"
+
+
+@dataclass(frozen=True, slots=True)
+class InviteToken:
+    """Закэшированное о токене приглашения; ``rejected`` — заранее известный отказ."""
+
+    event_id: Optional[int]
+    expires_at: Optional[datetime] = None
+    rejected: Optional[InviteResult] = None
+
+
+@dataclass(slots=True)
+class ExpenseEntry:
+    title: str
+    amount_cents: int
+    currency: str = "EUR"
+    is_shared: bool = True
+
+
 @dataclass(slots=True)
 class User:
     id: int
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
-from typing import Any, Iterable, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Iterable, Optional, Sequence
 
 import asyncpg
 
+from partyshare.db.models import EventListing, ExpenseEntry, InviteResult, InviteToken
+from partyshare.db.singleflight import SingleFlight, single_flight
 from partyshare.logging import get_logger, sql_logger
+from partyshare.utils.cache import TTLCache
 
 
 class Database:
@@ -13,13 +18,20 @@ class Database:
         self._pool: asyncpg.Pool | None = None
         self._log = get_logger(__name__)
 
+    @property
+    def _pg_dsn(self) -> str:
+        # asyncpg ожидает схему postgresql/postgres, без "+asyncpg"
+        return self._dsn.replace("+asyncpg", "")
+
     async def connect(self) -> None:
         if self._pool is None:
-            # asyncpg ожидает схему postgresql/postgres, без "+asyncpg"
-            dsn = self._dsn.replace("+asyncpg", "")
-            self._pool = await asyncpg.create_pool(dsn)
+            self._pool = await asyncpg.create_pool(self._pg_dsn)
             self._log.info("db.pool.created")
 
+    async def connect_dedicated(self) -> asyncpg.Connection:
+        """Отдельное соединение вне пула, например для сессионных advisory-блокировок."""
+        return await asyncpg.connect(self._pg_dsn)
+
     async def close(self) -> None:
         if self._pool is not None:
             await self._pool.close()
@@ -56,16 +68,149 @@ class Database:
         sql_logger.info("sql.executemany", query=command)
         await self._pool.executemany(command, args)
 
+    async def cursor(self, query: str, *args: Any, prefetch: int = 500) -> AsyncIterator[asyncpg.Record]:
+        """Серверный курсор: строки читаются порциями по ``prefetch``, а не списком целиком."""
+        await self._ensure_pool()
+        assert self._pool
+        sql_logger.info("sql.cursor", query=query, args=args)
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                async for record in conn.cursor(query, *args, prefetch=prefetch):
+                    yield record
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[asyncpg.Connection]:
+        """Соединение из пула с открытой транзакцией; при исключении — откат."""
+        await self._ensure_pool()
+        assert self._pool
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                yield conn
+
     async def _ensure_pool(self) -> None:
         if self._pool is None:
             await self.connect()
 
 
+# Балансы участников по событиям из CTE ``scope_events(event_id)``: доли
+# считаются так же, как ``split_amount`` — округление к чётному, остаток по
+# одному центу участникам по возрастанию ``user_id``. Результат — CTE
+# ``balances(event_id, user_id, balance)``. Читает и архив, так что годится
+# и для давно прошедших событий.
+BALANCE_CTES = """
+going AS (
+    SELECT ep.event_id,
+           ep.user_id,
+           row_number() OVER (PARTITION BY ep.event_id ORDER BY ep.user_id) AS rn,
+           count(*) OVER (PARTITION BY ep.event_id) AS n
+    FROM all_event_participants ep
+    JOIN scope_events se ON se.event_id = ep.event_id
+    WHERE ep.status = 'going'
+),
+parts AS (
+    SELECT x.event_id, x.amount_cents::bigint AS amount, g.user_id, g.rn, g.n
+    FROM all_expenses x
+    JOIN going g ON g.event_id = x.event_id
+    WHERE x.is_shared
+    UNION ALL
+    SELECT x.event_id,
+           i.amount_cents::bigint,
+           c.user_id,
+           row_number() OVER (PARTITION BY i.id ORDER BY c.user_id),
+           count(*) OVER (PARTITION BY i.id)
+    FROM all_expense_items i
+    JOIN all_expenses x ON x.id = i.expense_id
+    JOIN scope_events se ON se.event_id = x.event_id
+    JOIN all_expense_item_consumers c ON c.item_id = i.id
+    WHERE NOT x.is_shared
+    UNION ALL
+    SELECT x.event_id, i.amount_cents::bigint, g.user_id, g.rn, g.n
+    FROM all_expense_items i
+    JOIN all_expenses x ON x.id = i.expense_id
+    JOIN going g ON g.event_id = x.event_id
+    WHERE NOT x.is_shared
+      AND NOT EXISTS (SELECT 1 FROM all_expense_item_consumers c WHERE c.item_id = i.id)
+),
+rounded AS (
+    SELECT p.event_id, p.user_id, p.rn, b.base, p.amount - b.base * p.n AS rem
+    FROM parts p
+    CROSS JOIN LATERAL (
+        SELECT p.amount / p.n
+               + CASE
+                     WHEN 2 * (p.amount % p.n) > p.n THEN 1
+                     WHEN 2 * (p.amount % p.n) = p.n THEN (p.amount / p.n) % 2
+                     ELSE 0
+                 END AS base
+    ) b
+),
+balances AS (
+    SELECT event_id, user_id, sum(delta) AS balance
+    FROM (
+        SELECT event_id,
+               user_id,
+               -(base + CASE
+                            WHEN rem > 0 AND rn <= rem THEN 1
+                            WHEN rem < 0 AND rn <= -rem THEN -1
+                            ELSE 0
+                        END) AS delta
+        FROM rounded
+        UNION ALL
+        SELECT x.event_id, x.payer_id, x.amount_cents
+        FROM all_expenses x
+        JOIN scope_events se ON se.event_id = x.event_id
+    ) ledger
+    GROUP BY event_id, user_id
+)
+"""
+
+
+def username_key(username: str) -> str:
+    """Ключ ``resolve_usernames``: имя без ``@`` в нижнем регистре."""
+    return username.lstrip("@").lower()
+
+
+def escape_like(value: str) -> str:
+    """Экранирует ``%``, ``_`` и ``\\`` для подстановки в ``LIKE``."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+INVITE_CACHE_TTL = 600.0
+INVITE_NEGATIVE_TTL = 30.0
+INVITE_CACHE_SIZE = 10_000
+IDENTITY_CACHE_TTL = 3600.0
+IDENTITY_CACHE_SIZE = 50_000
+# С этого размера позиции чека и их потребители пишутся через COPY, а не INSERT
+COPY_THRESHOLD = 50
+
+# Условие и порядок для каждого среза «Моих событий». Предстоящие и прошедшие
+# отбираются по частичному индексу ``events (owner_id, starts_at) WHERE NOT
+# canceled``, отменённые — по ``idx_events_canceled_starts_at``.
+LISTING_FILTERS: dict[EventListing, tuple[str, str]] = {
+    EventListing.UPCOMING: ("NOT e.canceled AND e.starts_at >= now()", "e.starts_at"),
+    EventListing.PAST: ("NOT e.canceled AND e.starts_at < now()", "e.starts_at DESC"),
+    EventListing.CANCELED: ("e.canceled", "e.starts_at DESC"),
+}
+# Срезы, куда попадают заархивированные события: они читаются через all_*
+ARCHIVED_LISTINGS = frozenset({EventListing.PAST, EventListing.CANCELED})
+
+
 class PartyShareRepository:
     def __init__(self, db: Database) -> None:
         self.db = db
+        self.flights = SingleFlight()
+        # Счётчик использований остаётся в БД; кэш лишь отсекает заведомые отказы
+        self.invite_tokens: TTLCache[str, InviteToken] = TTLCache(
+            ttl=INVITE_CACHE_TTL, max_entries=INVITE_CACHE_SIZE
+        )
+        # tg_id -> (users.id, username, full_name): ensure_user без запроса, если профиль не менялся
+        self.identities: TTLCache[int, tuple[int, Optional[str], Optional[str]]] = TTLCache(
+            ttl=IDENTITY_CACHE_TTL, max_entries=IDENTITY_CACHE_SIZE
+        )
 
     async def ensure_user(self, tg_id: int, username: Optional[str], full_name: Optional[str]) -> int:
+        cached = self.identities.get(tg_id)
+        if cached is not None and cached[1] == username and cached[2] == full_name:
+            return cached[0]
         row = await self.db.fetchrow(
             """
             INSERT INTO users (tg_id, username, full_name)
@@ -80,11 +225,32 @@ class PartyShareRepository:
             full_name,
         )
         assert row is not None
-        return int(row["id"])
+        user_id = int(row["id"])
+        self.identities.set(tg_id, (user_id, username, full_name))
+        return user_id
 
     async def get_user_by_username(self, username: str) -> asyncpg.Record | None:
         clean = username.lstrip("@")
-        return await self.db.fetchrow("SELECT * FROM users WHERE username = $1", clean)
+        return await self.db.fetchrow(
+            "SELECT * FROM users WHERE lower(username) = lower($1) ORDER BY id DESC LIMIT 1",
+            clean,
+        )
+
+    async def resolve_usernames(self, usernames: Iterable[str]) -> dict[str, asyncpg.Record]:
+        """Пользователи по списку ``@username`` одним запросом.
+
+        Ключ — имя без ``@`` в нижнем регистре: в Telegram имена
+        регистронезависимы. Неизвестных имён в результате нет.
+        """
+        names = list(dict.fromkeys(username_key(name) for name in usernames if name.lstrip("@")))
+        if not names:
+            return {}
+        rows = await self.db.fetch(
+            "SELECT * FROM users WHERE lower(username) = ANY($1::text[]) ORDER BY id",
+            names,
+        )
+        # При дубликатах после смены имён побеждает более новая запись
+        return {username_key(row["username"]): row for row in rows}
 
     async def create_event(
         self,
@@ -116,39 +282,118 @@ class PartyShareRepository:
             row["id"],
             owner_id,
         )
+        # Чтения этого id, начатые до создания события, вернут None
+        self.forget_event_reads(row["id"])
         return row
 
-    async def get_event(self, event_id: int) -> asyncpg.Record | None:
-        return await self.db.fetchrow("SELECT * FROM events WHERE id = $1", event_id)
+    @single_flight
+    async def get_event(self, event_id: int, include_archived: bool = False) -> asyncpg.Record | None:
+        """Событие по id; ``include_archived`` — искать и среди заархивированных.
+
+        Пути, которые меняют событие, читают только горячую таблицу: архив
+        доступен лишь для просмотра.
+        """
+        table = "all_events" if include_archived else "events"
+        return await self.db.fetchrow(f"SELECT * FROM {table} WHERE id = $1", event_id)
 
     async def update_event_field(self, event_id: int, field: str, value: Any) -> None:
         if field not in {"title", "starts_at", "location", "notes", "canceled", "owner_id"}:
             raise ValueError("Недопустимое поле для обновления")
-        await self.db.execute(f"UPDATE events SET {field} = $1 WHERE id = $2", value, event_id)
+        await self.db.execute(
+            f"UPDATE events SET {field} = $1, version = version + 1 WHERE id = $2", value, event_id
+        )
+        self.forget_event_reads(event_id)
 
-    async def list_owner_events(self, owner_id: int) -> list[asyncpg.Record]:
+    def forget_event_reads(self, event_id: int) -> None:
+        """Вызывается после записи в событие.
+
+        Кэши по данным события (карточки приглашений) ключуются колонкой
+        ``events.version``: её поднимает каждая запись, в том числе в других
+        процессах. Здесь забываются только выполняющиеся чтения этого процесса.
+        """
+        self.flights.forget("get_event", event_id)
+        self.forget_participant_reads(event_id)
+
+    def forget_participant_reads(self, event_id: int) -> None:
+        """Вызывается после записи в участников события: старое чтение не годится."""
+        self.flights.forget("get_event_participants", event_id)
+
+    async def list_owner_events(
+        self,
+        owner_id: int,
+        listing: EventListing = EventListing.UPCOMING,
+        limit: Optional[int] = None,
+    ) -> list[asyncpg.Record]:
+        """События владельца из среза ``listing``; ``limit=None`` — без ограничения."""
+        condition, order = LISTING_FILTERS[listing]
+        events = "all_events" if listing in ARCHIVED_LISTINGS else "events"
         return await self.db.fetch(
-            """
+            f"""
             SELECT e.*, r.remind_at
-            FROM events e
+            FROM {events} e
             LEFT JOIN reminders r ON r.event_id = e.id
+            WHERE e.owner_id = $1 AND {condition}
+            ORDER BY {order}
+            LIMIT $2
+            """,
+            owner_id,
+            limit,
+        )
+
+    async def search_owner_events(self, owner_id: int, query: str, limit: int) -> list[asyncpg.Record]:
+        """Предстоящие события владельца, в названии которых есть ``query``.
+
+        Подстрока ищется через ``ILIKE`` по триграммному GIN-индексу, порядок —
+        по ``similarity``. К каждому событию приложена его последняя
+        пригласительная ссылка (``token``, ``link_expires_at``).
+        """
+        return await self.db.fetch(
+            r"""
+            SELECT e.*, l.token, l.expires_at AS link_expires_at
+            FROM events e
+            LEFT JOIN LATERAL (
+                SELECT token, expires_at
+                FROM event_invite_links
+                WHERE event_id = e.id
+                ORDER BY id DESC
+                LIMIT 1
+            ) l ON true
             WHERE e.owner_id = $1
-            ORDER BY e.starts_at
+              AND NOT e.canceled
+              AND e.starts_at >= now()
+              AND e.title ILIKE '%' || $2 || '%'
+            ORDER BY similarity(e.title, $3) DESC, e.starts_at
+            LIMIT $4
             """,
             owner_id,
+            escape_like(query),
+            query,
+            limit,
         )
 
-    async def list_participant_events(self, user_id: int) -> list[asyncpg.Record]:
+    async def list_participant_events(
+        self,
+        user_id: int,
+        listing: EventListing = EventListing.UPCOMING,
+        limit: Optional[int] = None,
+    ) -> list[asyncpg.Record]:
+        """События, где пользователь участник, из среза ``listing``."""
+        condition, order = LISTING_FILTERS[listing]
+        archived = listing in ARCHIVED_LISTINGS
+        events = "all_events" if archived else "events"
+        participants = "all_event_participants" if archived else "event_participants"
         return await self.db.fetch(
-            """
+            f"""
             SELECT e.*, ep.status, r.remind_at
-            FROM events e
-            JOIN event_participants ep ON ep.event_id = e.id
+            FROM {events} e
+            JOIN {participants} ep ON ep.event_id = e.id
             LEFT JOIN reminders r ON r.event_id = e.id
-            WHERE ep.user_id = $1
-            ORDER BY e.starts_at
+            WHERE ep.user_id = $1 AND {condition}
+            ORDER BY {order}
+            LIMIT $2
             """,
             user_id,
+            limit,
         )
 
     async def set_participant_status(self, event_id: int, user_id: int, status: str) -> None:
@@ -162,6 +407,37 @@ class PartyShareRepository:
             user_id,
             status,
         )
+        self.forget_participant_reads(event_id)
+
+    async def update_participant_status(self, event_id: int, user_id: int, status: str) -> bool:
+        """Меняет статус существующего участника; ``False`` — участника уже нет."""
+        result = await self.db.execute(
+            "UPDATE event_participants SET status = $3 WHERE event_id = $1 AND user_id = $2",
+            event_id,
+            user_id,
+            status,
+        )
+        self.forget_participant_reads(event_id)
+        return result != "UPDATE 0"
+
+    async def add_participants(self, event_id: int, user_ids: Iterable[int], status: str) -> set[int]:
+        """Добавляет участников одним запросом; возвращает тех, кого ещё не было.
+
+        Статус уже состоящих в событии не меняется.
+        """
+        rows = await self.db.fetch(
+            """
+            INSERT INTO event_participants (event_id, user_id, status)
+            SELECT $1, user_id, $3 FROM unnest($2::bigint[]) AS user_id
+            ON CONFLICT (event_id, user_id) DO NOTHING
+            RETURNING user_id
+            """,
+            event_id,
+            list(dict.fromkeys(user_ids)),
+            status,
+        )
+        self.forget_participant_reads(event_id)
+        return {row["user_id"] for row in rows}
 
     async def get_participant(self, event_id: int, user_id: int) -> asyncpg.Record | None:
         return await self.db.fetchrow(
@@ -189,13 +465,123 @@ class PartyShareRepository:
             expires_at,
         )
         assert row is not None
+        self.invite_tokens.pop(token)
         return row
 
-    async def get_invite_link_by_token(self, token: str) -> asyncpg.Record | None:
-        return await self.db.fetchrow(
-            "SELECT * FROM event_invite_links WHERE token = $1",
+    async def redeem_invite(
+        self, token: str, user_id: int, status: str
+    ) -> tuple[InviteResult, asyncpg.Record | None]:
+        """Проверяет ссылку, добавляет участника и списывает использование за один запрос.
+
+        Использование списывается ``UPDATE`` с условием ``uses < max_uses``:
+        при одновременных входах Postgres перепроверяет его на свежей версии
+        строки, поэтому лимит не превышается. Вторая запись — данные события
+        (``None``, если ссылка не найдена).
+        """
+        rejected = self.cached_invite_rejection(token)
+        if rejected is not None:
+            return rejected, None
+        row = await self.db.fetchrow(
+            """
+            WITH link AS (
+                SELECT l.id, l.event_id, l.expires_at, e.canceled
+                FROM event_invite_links l
+                JOIN events e ON e.id = l.event_id
+                WHERE l.token = $1
+            ),
+            existing AS (
+                SELECT 1
+                FROM event_participants ep
+                JOIN link ON ep.event_id = link.event_id
+                WHERE ep.user_id = $2
+            ),
+            claimed AS (
+                UPDATE event_invite_links l
+                SET uses = l.uses + 1
+                FROM link
+                WHERE l.id = link.id
+                  AND NOT link.canceled
+                  AND NOT EXISTS (SELECT 1 FROM existing)
+                  AND (l.expires_at IS NULL OR l.expires_at > now())
+                  AND (l.max_uses IS NULL OR l.uses < l.max_uses)
+                RETURNING l.event_id
+            ),
+            joined AS (
+                INSERT INTO event_participants (event_id, user_id, status)
+                SELECT event_id, $2, $3 FROM claimed
+                ON CONFLICT (event_id, user_id) DO NOTHING
+                RETURNING event_id
+            )
+            SELECT
+                CASE
+                    WHEN link.id IS NULL THEN 'not_found'
+                    WHEN EXISTS (SELECT 1 FROM existing) THEN 'already_participant'
+                    WHEN link.canceled THEN 'event_canceled'
+                    WHEN EXISTS (SELECT 1 FROM joined) THEN 'joined'
+                    WHEN link.expires_at IS NOT NULL AND link.expires_at <= now() THEN 'expired'
+                    ELSE 'exhausted'
+                END AS result,
+                link.expires_at AS link_expires_at,
+                e.id AS event_id, e.title, e.starts_at, e.location, e.notes
+            FROM (SELECT 1) AS one
+            LEFT JOIN link ON true
+            LEFT JOIN events e ON e.id = link.event_id
+            """,
+            token,
+            user_id,
+            status,
+        )
+        assert row is not None
+        result = InviteResult(row["result"])
+        if result is InviteResult.JOINED:
+            self.forget_participant_reads(row["event_id"])
+        if result is InviteResult.NOT_FOUND:
+            self.invite_tokens.set(token, InviteToken(None, rejected=result), ttl=INVITE_NEGATIVE_TTL)
+            return result, None
+        # Исчерпание и отмена необратимы, истечение проверяется по expires_at
+        final = result in (InviteResult.EXHAUSTED, InviteResult.EVENT_CANCELED)
+        self.invite_tokens.set(
             token,
+            InviteToken(row["event_id"], row["link_expires_at"], result if final else None),
         )
+        return result, row
+
+    def cached_invite_rejection(self, token: str) -> Optional[InviteResult]:
+        """Отказ по токену, известный без запроса к БД, иначе ``None``."""
+        cached = self.invite_tokens.get(token)
+        if cached is None:
+            return None
+        if cached.rejected is not None:
+            return cached.rejected
+        if cached.expires_at is not None and cached.expires_at <= datetime.now(timezone.utc):
+            return InviteResult.EXPIRED
+        return None
+
+    async def revoke_invite_links(self, event_id: int) -> list[str]:
+        """Завершает срок действия всех активных ссылок события, возвращает их токены."""
+        # Отозванный токен мог попасть в карточки приглашений: версия растёт
+        rows = await self.db.fetch(
+            """
+            WITH revoked AS (
+                UPDATE event_invite_links
+                SET expires_at = now()
+                WHERE event_id = $1 AND (expires_at IS NULL OR expires_at > now())
+                RETURNING token
+            ),
+            bumped AS (
+                UPDATE events SET version = version + 1
+                WHERE id = $1 AND EXISTS (SELECT 1 FROM revoked)
+            )
+            SELECT token FROM revoked
+            """,
+            event_id,
+        )
+        tokens = [row["token"] for row in rows]
+        if tokens:
+            self.forget_event_reads(event_id)
+        for token in tokens:
+            self.invite_tokens.set(token, InviteToken(event_id, rejected=InviteResult.EXPIRED))
+        return tokens
 
     async def get_invite_link(self, event_id: int) -> asyncpg.Record | None:
         return await self.db.fetchrow(
@@ -203,12 +589,6 @@ class PartyShareRepository:
             event_id,
         )
 
-    async def increment_invite_use(self, invite_id: int) -> None:
-        await self.db.execute(
-            "UPDATE event_invite_links SET uses = uses + 1 WHERE id = $1",
-            invite_id,
-        )
-
     async def create_reminder(self, event_id: int, remind_at) -> None:
         await self.db.execute(
             """
@@ -220,7 +600,7 @@ class PartyShareRepository:
             remind_at,
         )
 
-    async def fetch_pending_reminders(self, now) -> list[asyncpg.Record]:
+    async def fetch_pending_reminders(self, now, limit: Optional[int] = None) -> list[asyncpg.Record]:
         return await self.db.fetch(
             """
             SELECT r.id, r.event_id, e.title, e.starts_at, e.owner_id
@@ -228,19 +608,58 @@ class PartyShareRepository:
             JOIN events e ON e.id = r.event_id
             WHERE r.sent = false
               AND r.remind_at <= $1
+              AND e.starts_at > $1
+              AND e.canceled = false
+            ORDER BY r.remind_at, r.id
+            LIMIT $2
+            """,
+            now,
+            limit,
+        )
+
+    async def count_pending_reminders(self, now) -> int:
+        count = await self.db.fetchval(
+            """
+            SELECT count(*)
+            FROM reminders r
+            JOIN events e ON e.id = r.event_id
+            WHERE r.sent = false
+              AND r.remind_at <= $1
+              AND e.starts_at > $1
               AND e.canceled = false
             """,
             now,
         )
+        return int(count or 0)
+
+    async def drop_stale_reminders(self, now) -> list[asyncpg.Record]:
+        """Помечает отправленными напоминания о событиях, которые уже начались или отменены."""
+        return await self.db.fetch(
+            """
+            UPDATE reminders r
+            SET sent = true
+            FROM events e
+            WHERE e.id = r.event_id
+              AND r.sent = false
+              AND r.remind_at <= $1
+              AND (e.starts_at <= $1 OR e.canceled)
+            RETURNING r.id, r.event_id, e.title
+            """,
+            now,
+        )
 
     async def mark_reminder_sent(self, reminder_id: int) -> None:
         await self.db.execute("UPDATE reminders SET sent = true WHERE id = $1", reminder_id)
 
-    async def get_event_participants(self, event_id: int) -> list[asyncpg.Record]:
+    @single_flight
+    async def get_event_participants(
+        self, event_id: int, include_archived: bool = False
+    ) -> list[asyncpg.Record]:
+        table = "all_event_participants" if include_archived else "event_participants"
         return await self.db.fetch(
-            """
+            f"""
             SELECT ep.*, u.tg_id, u.username, u.full_name
-            FROM event_participants ep
+            FROM {table} ep
             JOIN users u ON u.id = ep.user_id
             WHERE ep.event_id = $1
             """,
@@ -253,71 +672,112 @@ class PartyShareRepository:
             event_id,
             user_id,
         )
+        self.forget_participant_reads(event_id)
 
-    async def create_expense(
+    async def create_expenses(
         self,
         event_id: int,
         payer_id: int,
         created_by: int,
-        title: str,
-        amount_cents: int,
-        currency: str,
-        is_shared: bool,
-    ) -> asyncpg.Record:
-        row = await self.db.fetchrow(
+        entries: Sequence[ExpenseEntry],
+    ) -> list[asyncpg.Record]:
+        """Все расходы одним INSERT; строки возвращаются в порядке ``entries``."""
+        rows = await self.db.fetch(
             """
             INSERT INTO expenses (event_id, payer_id, created_by, title, amount_cents, currency, is_shared)
-            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            SELECT $1, $2, $3, e.title, e.amount_cents, e.currency, e.is_shared
+            FROM unnest($4::text[], $5::int[], $6::text[], $7::bool[])
+                WITH ORDINALITY AS e(title, amount_cents, currency, is_shared, n)
+            ORDER BY e.n
             RETURNING *
             """,
             event_id,
             payer_id,
             created_by,
-            title,
-            amount_cents,
-            currency,
-            is_shared,
+            [entry.title for entry in entries],
+            [entry.amount_cents for entry in entries],
+            [entry.currency for entry in entries],
+            [entry.is_shared for entry in entries],
         )
-        assert row is not None
-        return row
+        return sorted(rows, key=lambda row: row["id"])
 
-    async def add_expense_item(
+    async def add_expense_items(
         self,
         expense_id: int,
-        label: Optional[str],
-        amount_cents: int,
-        consumer_ids: Iterable[int],
-    ) -> asyncpg.Record:
-        row = await self.db.fetchrow(
-            """
-            INSERT INTO expense_items (expense_id, label, amount_cents)
-            VALUES ($1, $2, $3)
-            RETURNING *
-            """,
-            expense_id,
-            label,
-            amount_cents,
-        )
-        assert row is not None
-        if consumer_ids:
-            await self.db.executemany(
-                """
-                INSERT INTO expense_item_consumers (item_id, user_id)
-                VALUES ($1, $2)
-                ON CONFLICT DO NOTHING
-                """,
-                ((row["id"], consumer) for consumer in consumer_ids),
-            )
-        return row
+        items: Sequence[tuple[Optional[str], int, Iterable[int]]],
+    ) -> list[int]:
+        """Добавляет позиции ``(label, amount_cents, consumer_ids)`` одной транзакцией.
+
+        Идентификаторы берутся из последовательности заранее, поэтому
+        потребителей можно записать без RETURNING, а большие чеки —
+        через ``COPY``.
+        """
+        if not items:
+            return []
+        consumers = [list(dict.fromkeys(consumer_ids)) for _, _, consumer_ids in items]
+        async with self.db.transaction() as conn:
+            item_ids = [
+                row["id"]
+                for row in await conn.fetch(
+                    "SELECT nextval(pg_get_serial_sequence('expense_items', 'id')) AS id "
+                    "FROM generate_series(1, $1)",
+                    len(items),
+                )
+            ]
+            item_rows = [
+                (item_id, expense_id, label, amount_cents)
+                for item_id, (label, amount_cents, _) in zip(item_ids, items, strict=True)
+            ]
+            consumer_rows = [
+                (item_id, user_id)
+                for item_id, user_ids in zip(item_ids, consumers, strict=True)
+                for user_id in user_ids
+            ]
+            if len(item_rows) + len(consumer_rows) >= COPY_THRESHOLD:
+                await conn.copy_records_to_table(
+                    "expense_items",
+                    records=item_rows,
+                    columns=["id", "expense_id", "label", "amount_cents"],
+                )
+                if consumer_rows:
+                    await conn.copy_records_to_table(
+                        "expense_item_consumers",
+                        records=consumer_rows,
+                        columns=["item_id", "user_id"],
+                    )
+            else:
+                await conn.execute(
+                    """
+                    INSERT INTO expense_items (id, expense_id, label, amount_cents)
+                    SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::text[], $4::int[])
+                    """,
+                    item_ids,
+                    [expense_id] * len(items),
+                    [label for label, _, _ in items],
+                    [amount_cents for _, amount_cents, _ in items],
+                )
+                if consumer_rows:
+                    await conn.execute(
+                        """
+                        INSERT INTO expense_item_consumers (item_id, user_id)
+                        SELECT * FROM unnest($1::bigint[], $2::bigint[])
+                        """,
+                        [item_id for item_id, _ in consumer_rows],
+                        [user_id for _, user_id in consumer_rows],
+                    )
+        return item_ids
 
     async def get_expense_items(self, expense_id: int) -> list[asyncpg.Record]:
         return await self.db.fetch(
             """
-            SELECT ei.*, array_agg(eic.user_id) FILTER (WHERE eic.user_id IS NOT NULL) AS consumers
-            FROM expense_items ei
-            LEFT JOIN expense_item_consumers eic ON eic.item_id = ei.id
+            SELECT ei.*,
+                   (
+                       SELECT array_agg(eic.user_id ORDER BY eic.user_id)
+                       FROM all_expense_item_consumers eic
+                       WHERE eic.item_id = ei.id
+                   ) AS consumers
+            FROM all_expense_items ei
             WHERE ei.expense_id = $1
-            GROUP BY ei.id
             ORDER BY ei.id
             """,
             expense_id,
@@ -330,7 +790,7 @@ class PartyShareRepository:
                    u.username AS payer_username,
                    u.full_name AS payer_full_name,
                    u.tg_id AS payer_tg_id
-            FROM expenses e
+            FROM all_expenses e
             LEFT JOIN users u ON u.id = e.payer_id
             WHERE e.event_id = $1
             ORDER BY e.created_at
@@ -341,23 +801,148 @@ class PartyShareRepository:
     async def delete_expense(self, expense_id: int) -> None:
         await self.db.execute("DELETE FROM expenses WHERE id = $1", expense_id)
 
+    async def set_digest_enabled(self, user_id: int, enabled: bool) -> None:
+        await self.db.execute("UPDATE users SET digest_enabled = $1 WHERE id = $2", enabled, user_id)
+
+    def iter_digest_rows(self, window_start, window_end, debts_since) -> AsyncIterator[asyncpg.Record]:
+        """Все строки дайджеста одним запросом, упорядоченные по ``tg_id``.
+
+        ``kind = 'event'`` — событие пользователя в окне ``[window_start, window_end)``;
+        ``kind = 'debt'`` — ненулевой баланс пользователя по событию, начавшемуся
+        не раньше ``debts_since``. Балансы — из ``BALANCE_CTES``.
+        """
+        return self.db.cursor(
+            f"""
+            WITH digest_users AS (
+                SELECT id, tg_id FROM users WHERE digest_enabled
+            ),
+            scope_events AS (
+                SELECT DISTINCT ep.event_id
+                FROM event_participants ep
+                JOIN digest_users du ON du.id = ep.user_id
+                JOIN events e ON e.id = ep.event_id
+                WHERE e.canceled = false
+                  AND e.starts_at >= $3
+                  AND EXISTS (SELECT 1 FROM expenses x WHERE x.event_id = e.id)
+            ),
+            {BALANCE_CTES}
+            SELECT du.tg_id, 'event' AS kind, e.id AS event_id, e.title, e.starts_at,
+                   ep.status, NULL::bigint AS balance_cents
+            FROM digest_users du
+            JOIN event_participants ep ON ep.user_id = du.id
+            JOIN events e ON e.id = ep.event_id
+            WHERE e.canceled = false
+              AND e.starts_at >= $1
+              AND e.starts_at < $2
+              AND ep.status <> 'declined'
+            UNION ALL
+            SELECT du.tg_id, 'debt', e.id, e.title, e.starts_at, NULL, b.balance::bigint
+            FROM balances b
+            JOIN digest_users du ON du.id = b.user_id
+            JOIN events e ON e.id = b.event_id
+            WHERE b.balance <> 0
+            ORDER BY tg_id, kind DESC, starts_at
+            """,
+            window_start,
+            window_end,
+            debts_since,
+        )
+
+    def iter_event_ledger(self, event_id: int) -> AsyncIterator[asyncpg.Record]:
+        """Расходы события построчно: по строке на позицию, для общих расходов — одна строка."""
+        return self._iter_ledger("SELECT $1::bigint AS event_id", event_id)
+
+    def iter_user_ledger(self, user_id: int) -> AsyncIterator[asyncpg.Record]:
+        """То же по всем событиям, в которых участвует пользователь."""
+        return self._iter_ledger(
+            "SELECT event_id FROM all_event_participants WHERE user_id = $1", user_id
+        )
+
+    def _iter_ledger(self, scope: str, arg: int) -> AsyncIterator[asyncpg.Record]:
+        return self.db.cursor(
+            f"""
+            WITH scope_events AS ({scope})
+            SELECT ev.id AS event_id,
+                   ev.title AS event_title,
+                   x.id AS expense_id,
+                   x.created_at,
+                   x.title AS expense_title,
+                   coalesce('@' || pu.username, pu.full_name) AS payer,
+                   x.currency,
+                   x.amount_cents,
+                   x.is_shared,
+                   i.id AS item_id,
+                   i.label AS item_label,
+                   i.amount_cents AS item_amount_cents,
+                   (
+                       SELECT string_agg(coalesce('@' || u.username, u.full_name), ' ' ORDER BY u.id)
+                       FROM all_expense_item_consumers c
+                       JOIN users u ON u.id = c.user_id
+                       WHERE c.item_id = i.id
+                   ) AS consumers
+            FROM scope_events se
+            JOIN all_events ev ON ev.id = se.event_id
+            JOIN all_expenses x ON x.event_id = ev.id
+            LEFT JOIN users pu ON pu.id = x.payer_id
+            LEFT JOIN all_expense_items i ON i.expense_id = x.id
+            ORDER BY ev.starts_at, ev.id, x.created_at, x.id, i.id
+            """,
+            arg,
+        )
+
+    def iter_event_balances(self, event_id: int) -> AsyncIterator[asyncpg.Record]:
+        """Балансы всех участников события."""
+        return self._iter_balances("SELECT $1::bigint AS event_id", event_id, None)
+
+    def iter_user_balances(self, user_id: int) -> AsyncIterator[asyncpg.Record]:
+        """Баланс пользователя по каждому его событию с расходами."""
+        return self._iter_balances(
+            "SELECT event_id FROM all_event_participants WHERE user_id = $1", user_id, user_id
+        )
+
+    def _iter_balances(self, scope: str, arg: int, only_user: Optional[int]) -> AsyncIterator[asyncpg.Record]:
+        return self.db.cursor(
+            f"""
+            WITH scope_events AS ({scope}),
+            {BALANCE_CTES}
+            SELECT ev.id AS event_id,
+                   ev.title AS event_title,
+                   coalesce('@' || u.username, u.full_name) AS user_name,
+                   b.balance::bigint AS balance_cents
+            FROM balances b
+            JOIN all_events ev ON ev.id = b.event_id
+            JOIN users u ON u.id = b.user_id
+            WHERE $2::bigint IS NULL OR b.user_id = $2
+            ORDER BY ev.starts_at, ev.id, b.balance DESC
+            """,
+            arg,
+            only_user,
+        )
+
     async def get_user(self, user_id: int) -> asyncpg.Record | None:
         return await self.db.fetchrow("SELECT * FROM users WHERE id = $1", user_id)
 
     async def transfer_ownership(self, event_id: int, new_owner_id: int) -> None:
-        await self.db.execute("UPDATE events SET owner_id = $1 WHERE id = $2", new_owner_id, event_id)
+        await self.db.execute(
+            "UPDATE events SET owner_id = $1, version = version + 1 WHERE id = $2", new_owner_id, event_id
+        )
+        self.forget_event_reads(event_id)
         await self.set_participant_status(event_id, new_owner_id, "going")
 
     async def cancel_event(self, event_id: int) -> None:
-        await self.db.execute("UPDATE events SET canceled = true WHERE id = $1", event_id)
+        await self.db.execute(
+            "UPDATE events SET canceled = true, version = version + 1 WHERE id = $1", event_id
+        )
+        self.forget_event_reads(event_id)
 
     async def list_event_participants_with_status(self, event_id: int) -> list[asyncpg.Record]:
         return await self.db.fetch(
             """
             SELECT ep.user_id, ep.status, u.tg_id, u.username, u.full_name
-            FROM event_participants ep
+            FROM all_event_participants ep
             JOIN users u ON u.id = ep.user_id
             WHERE ep.event_id = $1
+            ORDER BY ep.user_id
             """,
             event_id,
         )
@@ -365,6 +950,317 @@ class PartyShareRepository:
     async def get_expense(self, expense_id: int) -> asyncpg.Record | None:
         return await self.db.fetchrow("SELECT * FROM expenses WHERE id = $1", expense_id)
 
+    async def load_user_state(self, tg_id: int, ttl_seconds: float) -> Optional[str]:
+        return await self.db.fetchval(
+            """
+            SELECT data::text
+            FROM user_state
+            WHERE tg_id = $1
+              AND updated_at > now() - make_interval(secs => $2)
+            """,
+            tg_id,
+            ttl_seconds,
+        )
+
+    async def save_user_state(self, tg_id: int, data: str) -> None:
+        await self.db.execute(
+            """
+            INSERT INTO user_state (tg_id, data, updated_at)
+            VALUES ($1, $2::jsonb, now())
+            ON CONFLICT (tg_id) DO UPDATE
+                SET data = EXCLUDED.data,
+                    updated_at = EXCLUDED.updated_at
+            """,
+            tg_id,
+            data,
+        )
+
+    async def delete_user_state(self, tg_id: int) -> None:
+        await self.db.execute("DELETE FROM user_state WHERE tg_id = $1", tg_id)
+
+    async def archive_events(self, started_before: datetime, batch_size: int) -> int:
+        """Переносит до ``batch_size`` событий, начавшихся до ``started_before``, в архив.
+
+        Событие уезжает вместе с участниками, расходами, позициями,
+        потребителями и напоминаниями; пригласительные ссылки удаляются.
+        Всё — одним запросом, то есть атомарно: в горячих таблицах и в архиве
+        событие не бывает одновременно или частично. ``SKIP LOCKED`` не
+        мешает тем, кто прямо сейчас меняет событие.
+        """
+        moved = await self.db.fetchval(
+            """
+            WITH batch AS (
+                SELECT id FROM events
+                WHERE starts_at < $1
+                ORDER BY starts_at
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            ),
+            batch_expenses AS (
+                SELECT x.id FROM expenses x JOIN batch b ON x.event_id = b.id
+            ),
+            batch_items AS (
+                SELECT i.id FROM expense_items i JOIN batch_expenses bx ON i.expense_id = bx.id
+            ),
+            consumers AS (
+                DELETE FROM expense_item_consumers c USING batch_items bi
+                WHERE c.item_id = bi.id
+                RETURNING c.*
+            ),
+            items AS (
+                DELETE FROM expense_items i USING batch_items bi WHERE i.id = bi.id RETURNING i.*
+            ),
+            expenses_moved AS (
+                DELETE FROM expenses x USING batch_expenses bx WHERE x.id = bx.id RETURNING x.*
+            ),
+            participants AS (
+                DELETE FROM event_participants p USING batch b WHERE p.event_id = b.id RETURNING p.*
+            ),
+            reminders_moved AS (
+                DELETE FROM reminders r USING batch b WHERE r.event_id = b.id RETURNING r.*
+            ),
+            links AS (
+                DELETE FROM event_invite_links l USING batch b WHERE l.event_id = b.id
+            ),
+            events_moved AS (
+                DELETE FROM events e USING batch b WHERE e.id = b.id RETURNING e.*
+            ),
+            a1 AS (INSERT INTO expense_item_consumers_archive SELECT * FROM consumers),
+            a2 AS (INSERT INTO expense_items_archive SELECT * FROM items),
+            a3 AS (INSERT INTO expenses_archive SELECT * FROM expenses_moved),
+            a4 AS (INSERT INTO event_participants_archive SELECT * FROM participants),
+            a5 AS (INSERT INTO reminders_archive SELECT * FROM reminders_moved),
+            a6 AS (INSERT INTO events_archive SELECT * FROM events_moved RETURNING id)
+            SELECT count(*) FROM a6
+            """,
+            started_before,
+            batch_size,
+        )
+        return int(moved or 0)
+
+    async def purge_expired_invite_links(self, expired_before: datetime, limit: int) -> int:
+        return await self._delete_batch("event_invite_links", "expires_at < $1", expired_before, limit)
+
+    async def purge_sent_reminders(self, sent_before: datetime, limit: int) -> int:
+        return await self._delete_batch("reminders", "sent AND remind_at < $1", sent_before, limit)
+
+    async def purge_canceled_events(self, started_before: datetime, limit: int) -> int:
+        """Отменённые прошедшие события без расходов; с расходами их заберёт архив."""
+        return await self._delete_batch(
+            "events",
+            "canceled AND starts_at < $1 AND NOT EXISTS (SELECT 1 FROM expenses x WHERE x.event_id = events.id)",
+            started_before,
+            limit,
+        )
+
+    async def purge_sent_outbox(self, sent_before: datetime, limit: int) -> int:
+        """Доставленные сообщения очереди; dead letter остаётся для разбора."""
+        return await self._delete_batch("outbox", "status = 'sent' AND sent_at < $1", sent_before, limit)
+
+    async def _delete_batch(self, table: str, where: str, arg: Any, limit: int) -> int:
+        """Удаляет не больше ``limit`` строк по ``where``; занятые строки пропускает.
+
+        Строки выбираются по ``ctid``, поэтому удаление идёт TID-сканом
+        ровно по отобранным строкам, а транзакция остаётся короткой.
+        """
+        result = await self.db.execute(
+            f"""
+            DELETE FROM {table}
+            WHERE ctid = ANY(ARRAY(
+                SELECT ctid FROM {table}
+                WHERE {where}
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            ))
+            """,
+            arg,
+            limit,
+        )
+        return int(result.split()[-1])
+
+    async def purge_user_state(self, ttl_seconds: float) -> int:
+        result = await self.db.execute(
+            "DELETE FROM user_state WHERE updated_at <= now() - make_interval(secs => $1)",
+            ttl_seconds,
+        )
+        return int(result.split()[-1])
+
+    async def enqueue_outbox(
+        self,
+        chat_id: int,
+        method: str,
+        payload: str,
+        priority: int,
+        idempotency_key: Optional[str],
+        batch_key: Optional[str] = None,
+    ) -> Optional[int]:
+        """Ставит сообщение в очередь; повтор с тем же ``idempotency_key`` игнорируется."""
+        return await self.db.fetchval(
+            """
+            INSERT INTO outbox (chat_id, method, payload, priority, idempotency_key, batch_key)
+            VALUES ($1, $2, $3::jsonb, $4, $5, $6)
+            ON CONFLICT (idempotency_key) DO NOTHING
+            RETURNING id
+            """,
+            chat_id,
+            method,
+            payload,
+            priority,
+            idempotency_key,
+            batch_key,
+        )
+
+    async def enqueue_outbox_many(
+        self,
+        chat_ids: list[int],
+        methods: list[str],
+        payloads: list[str],
+        priorities: list[int],
+        idempotency_keys: list[Optional[str]],
+        batch_keys: list[Optional[str]],
+    ) -> int:
+        inserted = await self.db.fetchval(
+            """
+            WITH inserted AS (
+                INSERT INTO outbox (chat_id, method, payload, priority, idempotency_key, batch_key)
+                SELECT chat_id, method, payload::jsonb, priority, idempotency_key, batch_key
+                FROM unnest(
+                    $1::bigint[], $2::text[], $3::text[], $4::smallint[], $5::text[], $6::text[]
+                ) AS t(chat_id, method, payload, priority, idempotency_key, batch_key)
+                ON CONFLICT (idempotency_key) DO NOTHING
+                RETURNING 1
+            )
+            SELECT count(*) FROM inserted
+            """,
+            chat_ids,
+            methods,
+            payloads,
+            priorities,
+            idempotency_keys,
+            batch_keys,
+        )
+        return int(inserted or 0)
+
+    async def outbox_batch_progress(self, batch_key: str) -> dict[str, int]:
+        rows = await self.db.fetch(
+            "SELECT status, count(*) AS cnt FROM outbox WHERE batch_key = $1 GROUP BY status",
+            batch_key,
+        )
+        return {row["status"]: int(row["cnt"]) for row in rows}
+
+    async def claim_outbox(self, limit: int, lease_seconds: float) -> list[asyncpg.Record]:
+        """Забирает готовые к отправке сообщения в порядке приоритета.
+
+        Сообщение «арендуется» на ``lease_seconds``: если воркер упал, не
+        подтвердив отправку, по истечении аренды его заберёт другой воркер.
+        """
+        return await self.db.fetch(
+            """
+            WITH ready AS (
+                SELECT id
+                FROM outbox
+                WHERE status IN ('pending', 'sending')
+                  AND next_attempt_at <= now()
+                ORDER BY priority, id
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE outbox o
+            SET status = 'sending',
+                attempts = o.attempts + 1,
+                next_attempt_at = now() + make_interval(secs => $2)
+            FROM ready
+            WHERE o.id = ready.id
+            RETURNING o.*
+            """,
+            limit,
+            lease_seconds,
+        )
+
+    async def renew_outbox_lease(self, outbox_id: int, attempts: int, lease_seconds: float) -> bool:
+        """Продлевает аренду перед отправкой; ``False`` — сообщение уже забрал другой воркер.
+
+        Аренду однозначно задаёт ``attempts``: каждый захват его увеличивает.
+        """
+        renewed = await self.db.fetchval(
+            """
+            UPDATE outbox
+            SET next_attempt_at = now() + make_interval(secs => $3)
+            WHERE id = $1 AND attempts = $2 AND status = 'sending'
+            RETURNING id
+            """,
+            outbox_id,
+            attempts,
+            lease_seconds,
+        )
+        return renewed is not None
+
+    async def release_outbox(self, outbox_ids: list[int], attempts: list[int], delay_seconds: float) -> int:
+        """Возвращает захваченные, но не отправленные сообщения в очередь.
+
+        Захват не считается попыткой; сообщения станут доступны через
+        ``delay_seconds``. Сообщения, которые уже забрал другой воркер, не трогаются.
+        """
+        result = await self.db.execute(
+            """
+            UPDATE outbox o
+            SET status = 'pending',
+                attempts = o.attempts - 1,
+                next_attempt_at = now() + make_interval(secs => $3)
+            FROM unnest($1::bigint[], $2::int[]) AS t(id, attempts)
+            WHERE o.id = t.id AND o.attempts = t.attempts AND o.status = 'sending'
+            """,
+            outbox_ids,
+            attempts,
+            delay_seconds,
+        )
+        return int(result.split()[-1])
+
+    async def mark_outbox_sent(self, outbox_id: int, attempts: int) -> bool:
+        """Помечает сообщение доставленным; ``False`` — аренду уже забрал другой воркер.
+
+        Как и остальные завершения попытки, применяется только к аренде
+        ``attempts`` в статусе ``sending``.
+        """
+        result = await self.db.execute(
+            """
+            UPDATE outbox
+            SET status = 'sent', sent_at = now(), last_error = NULL
+            WHERE id = $1 AND attempts = $2 AND status = 'sending'
+            """,
+            outbox_id,
+            attempts,
+        )
+        return result != "UPDATE 0"
+
+    async def retry_outbox(self, outbox_id: int, attempts: int, delay_seconds: float, error: str) -> bool:
+        result = await self.db.execute(
+            """
+            UPDATE outbox
+            SET status = 'pending',
+                next_attempt_at = now() + make_interval(secs => $3),
+                last_error = $4
+            WHERE id = $1 AND attempts = $2 AND status = 'sending'
+            """,
+            outbox_id,
+            attempts,
+            delay_seconds,
+            error,
+        )
+        return result != "UPDATE 0"
+
+    async def dead_letter_outbox(self, outbox_id: int, attempts: int, error: str) -> bool:
+        result = await self.db.execute(
+            """
+            UPDATE outbox
+            SET status = 'dead', last_error = $3
+            WHERE id = $1 AND attempts = $2 AND status = 'sending'
+            """,
+            outbox_id,
+            attempts,
+            error,
+        )
+        return result != "UPDATE 0"
 
 _global_repo: PartyShareRepository | None = None
 
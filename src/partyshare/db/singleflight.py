@@ -0,0 +1,95 @@
+"""Склейка одновременных одинаковых чтений в один запрос.
+
+Пока запрос с теми же аргументами ещё выполняется, новые вызовы не идут в
+БД, а ждут его результат. Кэша нет: как только запрос завершился,
+следующий вызов снова читает из БД. После записи репозиторий забывает
+выполняющиеся чтения затронутых данных (``forget``), чтобы записавший не
+получил результат запроса, начатого до его записи.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, TypeVar
+
+from partyshare.metrics import registry
+
+T = TypeVar("T")
+Method = Callable[..., Awaitable[Any]]
+
+singleflight_shared = registry.counter(
+    "partyshare_db_singleflight_shared_total",
+    "Вызовы чтения, получившие результат уже выполнявшегося запроса",
+)
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Task[Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Результат ``fn()`` и признак того, что он получен от чужого вызова."""
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        # Отмена одного из ожидающих не должна отменять запрос для остальных
+        return await asyncio.shield(task), shared
+
+    def forget(self, *prefix: Hashable) -> None:
+        """Новые вызовы с ключом, начинающимся с ``prefix``, не присоединятся
+        к уже выполняющемуся запросу."""
+        size = len(prefix)
+        stale = [
+            key
+            for key in self._calls
+            if isinstance(key, tuple) and key[:size] == prefix
+        ]
+        for key in stale:
+            del self._calls[key]
+
+    def _forget(self, key: Hashable, task: asyncio.Task[Any]) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+
+def single_flight(method: Method) -> Method:
+    """Включает склейку для метода чтения репозитория.
+
+    Ключ — имя метода и значения всех параметров по порядку (с подставленными
+    значениями по умолчанию), поэтому ``get_event(5)`` и ``get_event(event_id=5)``
+    склеиваются. Значения должны быть хешируемыми; ``*args``/``**kwargs`` в
+    сигнатуре не поддерживаются. Списки результатов копируются, чтобы
+    вызывающие не делили один объект.
+    """
+    name = method.__name__
+    signature = inspect.signature(method)
+    if any(
+        param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD)
+        for param in signature.parameters.values()
+    ):
+        raise TypeError(f"single_flight: {name} must not take *args or **kwargs")
+
+    @functools.wraps(method)
+    async def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (name, *list(bound.arguments.values())[1:])
+        result, shared = await self.flights.do(
+            key, lambda: method(*bound.args, **bound.kwargs)
+        )
+        if shared:
+            singleflight_shared.inc(method=name)
+            if isinstance(result, list):
+                return list(result)
+        return result
+
+    return wrapper
@@ -4,6 +4,8 @@ from aiogram import Router
 from aiogram.filters import Command, CommandStart
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 
+from partyshare.callbacks import callbacks
+from partyshare.db.models import InviteResult
 from partyshare.db.repo import get_global_repository
 from partyshare.config import get_settings
 
@@ -21,6 +23,14 @@ def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
+START_INVITE_ERRORS = {
+    InviteResult.NOT_FOUND: "❌ Приглашение не найдено или устарело.\n\nПопроси друга отправить новую ссылку!",
+    InviteResult.EXPIRED: "❌ Срок действия приглашения истёк.\n\nПопроси друга отправить новую ссылку!",
+    InviteResult.EXHAUSTED: "❌ По этой ссылке уже присоединилось максимальное число участников.",
+    InviteResult.EVENT_CANCELED: "❌ Событие отменено.",
+}
+
+
 @basic_router.message(CommandStart())
 async def cmd_start(message: Message) -> None:
     # Очищаем все состояния пользователя
@@ -40,41 +50,28 @@ async def cmd_start(message: Message) -> None:
         if param.startswith("invite_"):
             token = param[7:]  # Убираем "invite_"
             repo = get_global_repository()
-            
-            # Получаем приглашение по токену
-            invite = await repo.get_invite_link_by_token(token)
-            
-            if not invite:
-                await message.answer(
-                    "❌ Приглашение не найдено или устарело.\n\n"
-                    "Попроси друга отправить новую ссылку!",
-                    reply_markup=get_main_menu_keyboard()
-                )
-                return
-            
-            # Получаем событие
-            event = await repo.get_event(invite['event_id'])
-            
-            if not event:
-                await message.answer(
-                    "❌ Событие не найдено.\n\n"
-                    "Возможно, оно было удалено.",
-                    reply_markup=get_main_menu_keyboard()
-                )
+
+            # Заведомо недействительные токены отсекаются кэшем без запросов к БД
+            rejected = repo.cached_invite_rejection(token)
+            if rejected is not None:
+                await message.answer(START_INVITE_ERRORS[rejected], reply_markup=get_main_menu_keyboard())
                 return
-            
-            # Регистрируем пользователя в базе
+
             repo_user_id = await repo.ensure_user(user.id, user.username, user.full_name)
-            
-            # Проверяем, не является ли пользователь уже участником
-            participants = await repo.get_event_participants(invite['event_id'])
-            already_participant = any(p['user_id'] == repo_user_id for p in participants)
-            
-            if already_participant:
-                settings = get_settings()
-                local_dt = event['starts_at'].astimezone(settings.zoneinfo)
-                date_str = local_dt.strftime("%d.%m.%Y в %H:%M")
-                
+
+            # Проверка ссылки, добавление участника и списание использования — один запрос
+            result, event = await repo.redeem_invite(token, repo_user_id, "going")
+
+            if event is None or result not in (InviteResult.JOINED, InviteResult.ALREADY_PARTICIPANT):
+                await message.answer(START_INVITE_ERRORS[result], reply_markup=get_main_menu_keyboard())
+                return
+
+            # Форматируем дату
+            settings = get_settings()
+            local_dt = event['starts_at'].astimezone(settings.zoneinfo)
+            date_str = local_dt.strftime("%d.%m.%Y в %H:%M")
+
+            if result is InviteResult.ALREADY_PARTICIPANT:
                 await message.answer(
                     f"✅ Ты уже участник события!\n\n"
                     f"🎉 <b>{event['title']}</b>\n"
@@ -83,22 +80,7 @@ async def cmd_start(message: Message) -> None:
                     reply_markup=get_main_menu_keyboard()
                 )
                 return
-            
-            # Добавляем участника
-            await repo.set_participant_status(
-                event_id=invite['event_id'],
-                user_id=repo_user_id,
-                status='going'
-            )
-            
-            # Увеличиваем счётчик использований
-            await repo.increment_invite_use(invite['id'])
-            
-            # Форматируем дату
-            settings = get_settings()
-            local_dt = event['starts_at'].astimezone(settings.zoneinfo)
-            date_str = local_dt.strftime("%d.%m.%Y в %H:%M")
-            
+
             success_text = (
                 f"🎉 <b>Поздравляем!</b>\n\n"
                 f"Ты присоединился к событию:\n\n"
@@ -126,7 +108,7 @@ async def cmd_start(message: Message) -> None:
     )
 
 
-@basic_router.callback_query(lambda c: c.data == "menu:main")
+@callbacks.exact("menu:main")
 async def cb_main_menu(callback: CallbackQuery) -> None:
     """Возврат в главное меню"""
     # Очищаем все состояния
@@ -145,7 +127,7 @@ async def cb_main_menu(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
-@basic_router.callback_query(lambda c: c.data == "menu:help")
+@callbacks.exact("menu:help")
 async def cb_help_menu(callback: CallbackQuery) -> None:
     """Меню помощи"""
     help_text = (
@@ -154,14 +136,19 @@ async def cb_help_menu(callback: CallbackQuery) -> None:
         "/newevent - создать событие\n"
         "/myevents - список твоих событий\n"
         "/status - изменить статус участия\n"
-        "/invite - пригласить друга\n"
+        "/invite - пригласить друзей по @username\n"
         "/invitelink - создать инвайт-ссылку\n"
+        "/revokelink - отозвать инвайт-ссылки события\n"
         "/manage - управление событием\n\n"
         "<b>Расходы:</b>\n"
         "/addexpense - добавить расход\n"
         "/additem - добавить позицию\n"
         "/summary - сводка по балансам\n"
-        "/settle - расчёты между участниками\n\n"
+        "/settle - расчёты между участниками\n"
+        "/export - выгрузить расходы события в CSV\n"
+        "/export_all - выгрузить всю свою историю в CSV\n\n"
+        "<b>Прочее:</b>\n"
+        "/digest on|off - ежедневный дайджест\n\n"
         "<b>Формат команд:</b>\n"
         "• /newevent [название] | [дата] | [место] | [заметки]\n"
         "• /addexpense [event_id] | [название] | [сумма валюта] | shared/items\n"
@@ -182,15 +169,42 @@ async def cmd_help(message: Message) -> None:
         "/newevent - создать событие\n"
         "/myevents - список твоих событий\n"
         "/status - изменить статус участия\n"
-        "/invite - пригласить друга\n"
+        "/invite - пригласить друзей по @username\n"
         "/invitelink - создать инвайт-ссылку\n"
+        "/revokelink - отозвать инвайт-ссылки события\n"
         "/manage - управление событием\n\n"
         "<b>Расходы:</b>\n"
         "/addexpense - добавить расход\n"
         "/additem - добавить позицию\n"
         "/summary - сводка по балансам\n"
-        "/settle - расчёты между участниками\n\n"
+        "/settle - расчёты между участниками\n"
+        "/export - выгрузить расходы события в CSV\n"
+        "/export_all - выгрузить всю свою историю в CSV\n\n"
+        "<b>Прочее:</b>\n"
+        "/digest on|off - ежедневный дайджест\n\n"
         "Используй /start чтобы вернуться в главное меню"
     )
     await message.answer(help_text)
 
+
+
+@basic_router.message(Command("digest"))
+async def cmd_digest(message: Message) -> None:
+    """Подписка на ежедневный дайджест событий и долгов"""
+    user = message.from_user
+    if not user or not message.text:
+        return
+
+    parts = message.text.split()
+    if len(parts) != 2 or parts[1] not in {"on", "off"}:
+        await message.answer("Использование: /digest on|off")
+        return
+
+    repo = get_global_repository()
+    user_id = await repo.ensure_user(user.id, user.username, user.full_name)
+    enabled = parts[1] == "on"
+    await repo.set_digest_enabled(user_id, enabled)
+    if enabled:
+        await message.answer("✅ Каждое утро пришлю события на неделю вперёд и незакрытые расчёты.")
+    else:
+        await message.answer("Дайджест отключён.")
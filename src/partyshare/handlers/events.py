@@ -1,18 +1,42 @@
 from __future__ import annotations
 
+import html
 import secrets
+from dataclasses import replace
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import NamedTuple, Optional
 
 from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, Message
 
+from partyshare.broadcast import broadcast_to_participants
+from partyshare.callbacks import (
+    CycleStatus,
+    EventExpenses,
+    EventListingTab,
+    EventNav,
+    EventParticipants,
+    EventSettlement,
+    Invite,
+    Manage,
+    ManageCancel,
+    ManageEdit,
+    ManageNotify,
+    ManageRemove,
+    OwnerEvent,
+    Summary,
+    callbacks,
+)
+from partyshare.coalesce import status_writes
 from partyshare.config import get_settings
-from partyshare.db.repo import get_global_repository
+from partyshare.db.repo import get_global_repository, username_key
 from partyshare.keyboards import build_events_keyboard, manage_keyboard
+from partyshare.middlewares import answer_once
+from partyshare.outbox import get_global_outbox
 from partyshare.services.authz import assert_event_owner, assert_event_participant
 from partyshare.services.events import (
+    EventCardData,
     build_event_cards,
     format_event_card,
     humanize_status,
@@ -20,30 +44,69 @@ from partyshare.services.events import (
 )
 from partyshare.services.split import ExpenseItemShare, ExpenseShare, calculate_balances
 from partyshare.services.settlement import settle
-from partyshare.state import OWNER_VIEW, PARTICIPANT_VIEW, state
+from partyshare.state import (
+    CANCELED_LISTING,
+    OWNER_VIEW,
+    PARTICIPANT_VIEW,
+    PAST_LISTING,
+    UPCOMING_LISTING,
+    state,
+)
+from partyshare.utils.cache import TTLCache
 from partyshare.utils.parse import parse_event_datetime, parse_russian_date
-from partyshare.db.models import ParticipantStatus
+from partyshare.db.models import EventListing, InviteResult, ParticipantStatus
 
 events_router = Router()
 
+# Прошедших и отменённых событий со временем становится много: в карусель
+# попадают только самые свежие из них
+PAST_EVENTS_LIMIT = 50
+
+LISTING_TITLES = {
+    PAST_LISTING: "прошедшие",
+    CANCELED_LISTING: "отменённые",
+}
+
+EMPTY_LISTING_TEXT = {
+    UPCOMING_LISTING: "Предстоящих событий нет. Создайте новое командой /newevent.",
+    PAST_LISTING: "Прошедших событий нет.",
+    CANCELED_LISTING: "Отменённых событий нет.",
+}
+
+
+class StatusCard(NamedTuple):
+    """Показанная участнику карточка с кнопкой статуса и его ``users.id``."""
+
+    user_id: int
+    card: EventCardData
+    has_prev: bool
+    has_next: bool
+
+
+# (event_id, tg_id) — тот же ключ, что в status_writes — -> последняя
+# показанная карточка. Повторные нажатия на статус берут участие, статус и
+# данные для перерисовки отсюда, не обращаясь к БД
+_status_cards: TTLCache[tuple[int, int], StatusCard] = TTLCache(ttl=60, max_entries=10_000)
+
 
 def get_repo():
     return get_global_repository()
 
 
-@events_router.callback_query(lambda c: c.data == "menu:myevents")
+@callbacks.exact("menu:myevents", early_ack=True)
 async def cb_menu_myevents(callback: CallbackQuery) -> None:
     """Показать список событий из главного меню"""
     repo = get_repo()
     user = callback.from_user
     if not user:
-        await callback.answer("Ошибка: пользователь не найден")
+        await answer_once(callback, "Ошибка: пользователь не найден")
         return
 
-    # Получаем события пользователя (где он владелец или участник)
+    # Получаем предстоящие события пользователя (где он владелец или участник);
+    # прошедшие загружаются отдельной кнопкой
     user_id = await repo.ensure_user(user.id, user.username, user.full_name)
-    owner_events = await repo.list_owner_events(user_id)
-    participant_events = await repo.list_participant_events(user_id)
+    owner_events = await repo.list_owner_events(user_id, EventListing.UPCOMING)
+    participant_events = await repo.list_participant_events(user_id, EventListing.UPCOMING)
     
     # Объединяем списки и убираем дубликаты
     event_ids_seen = set()
@@ -57,15 +120,22 @@ async def cb_menu_myevents(callback: CallbackQuery) -> None:
             events.append(event)
             event_ids_seen.add(event['id'])
 
+    past_button = [
+        InlineKeyboardButton(
+            text="🕓 Прошедшие события", callback_data=EventListingTab(listing=PAST_LISTING).pack()
+        )
+    ]
+
     if not events:
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="➕ Создать событие", callback_data="menu:newevent")],
+            past_button,
             [InlineKeyboardButton(text="◀️ Назад в меню", callback_data="menu:main")]
         ])
         await callback.message.edit_text(
             "📅 <b>Мои события</b>\n\n"
-            "У тебя пока нет событий.\n"
-            "Создай первое или присоединись к существующему!",
+            "Предстоящих событий нет.\n"
+            "Создай новое или присоединись к существующему!",
             reply_markup=keyboard
         )
     else:
@@ -86,11 +156,12 @@ async def cb_menu_myevents(callback: CallbackQuery) -> None:
             buttons.append([
                 InlineKeyboardButton(
                     text=f"{i}. {event_text[:40]}", 
-                    callback_data=f"owner:{event['id']}"
+                    callback_data=OwnerEvent(event_id=event['id']).pack()
                 )
             ])
         
-        # Добавляем кнопку возврата в меню
+        # Добавляем кнопки прошедших событий и возврата в меню
+        buttons.append(past_button)
         buttons.append([InlineKeyboardButton(text="◀️ Назад в меню", callback_data="menu:main")])
         keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
         
@@ -99,31 +170,25 @@ async def cb_menu_myevents(callback: CallbackQuery) -> None:
             reply_markup=keyboard
         )
     
-    await callback.answer()
+    await answer_once(callback)
 
 
-@events_router.callback_query(lambda c: c.data and c.data.startswith("owner:"))
-async def cb_owner_event(callback: CallbackQuery) -> None:
+@callbacks.prefix(OwnerEvent, early_ack=True)
+async def cb_owner_event(callback: CallbackQuery, data: OwnerEvent) -> None:
     """Меню управления событием для владельца"""
     user = callback.from_user
     if not user:
-        await callback.answer("Ошибка")
+        await answer_once(callback, "Ошибка")
         return
     
-    # Извлекаем event_id из callback data
-    event_id_str = callback.data.split(":", 1)[1]
-    try:
-        event_id = int(event_id_str)
-    except ValueError:
-        await callback.answer("Неверный ID события")
-        return
+    event_id = data.event_id
     
     # Получаем информацию о событии
     repo = get_repo()
-    event = await repo.get_event(event_id)
+    event = await repo.get_event(event_id, include_archived=True)
     
     if not event:
-        await callback.answer("Событие не найдено")
+        await answer_once(callback, "Событие не найдено")
         return
     
     # Получаем user_id из базы
@@ -131,7 +196,7 @@ async def cb_owner_event(callback: CallbackQuery) -> None:
     
     # Проверяем, что пользователь - владелец события
     if event['owner_id'] != repo_user_id:
-        await callback.answer("У вас нет прав для управления этим событием")
+        await answer_once(callback, "У вас нет прав для управления этим событием")
         return
     
     # Форматируем информацию о событии
@@ -151,47 +216,42 @@ async def cb_owner_event(callback: CallbackQuery) -> None:
         text += f"\n📋 <b>Заметки:</b>\n{event['notes']}\n"
     
     # Получаем список участников
-    participants = await repo.get_event_participants(event_id)
+    participants = await repo.get_event_participants(event_id, include_archived=True)
     text += f"\n👥 <b>Участников:</b> {len(participants)}\n"
     
     # Создаем клавиатуру с действиями
     buttons = [
-        [InlineKeyboardButton(text="👥 Список участников", callback_data=f"event_participants:{event_id}")],
+        [InlineKeyboardButton(text="👥 Список участников", callback_data=EventParticipants(event_id=event_id).pack())],
         [InlineKeyboardButton(text="✉️ Поделиться приглашением", switch_inline_query=f"invite_{event_id}")],
-        [InlineKeyboardButton(text="💰 Расходы", callback_data=f"event_expenses:{event_id}")],
-        [InlineKeyboardButton(text="🧮 Расчёты", callback_data=f"event_settlement:{event_id}")],
+        [InlineKeyboardButton(text="💰 Расходы", callback_data=EventExpenses(event_id=event_id).pack())],
+        [InlineKeyboardButton(text="🧮 Расчёты", callback_data=EventSettlement(event_id=event_id).pack())],
         [InlineKeyboardButton(text="◀️ К списку событий", callback_data="menu:myevents")]
     ]
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     
     await callback.message.edit_text(text, reply_markup=keyboard)
-    await callback.answer()
+    await answer_once(callback)
 
 
-@events_router.callback_query(lambda c: c.data and c.data.startswith("event_participants:"))
-async def cb_event_participants(callback: CallbackQuery) -> None:
+@callbacks.prefix(EventParticipants, early_ack=True)
+async def cb_event_participants(callback: CallbackQuery, data: EventParticipants) -> None:
     """Показать список участников события"""
     user = callback.from_user
     if not user:
-        await callback.answer("Ошибка")
+        await answer_once(callback, "Ошибка")
         return
     
-    event_id_str = callback.data.split(":", 1)[1]
-    try:
-        event_id = int(event_id_str)
-    except ValueError:
-        await callback.answer("Неверный ID события")
-        return
+    event_id = data.event_id
     
     repo = get_repo()
-    event = await repo.get_event(event_id)
+    event = await repo.get_event(event_id, include_archived=True)
     
     if not event:
-        await callback.answer("Событие не найдено")
+        await answer_once(callback, "Событие не найдено")
         return
     
     # Получаем участников
-    participants = await repo.get_event_participants(event_id)
+    participants = await repo.get_event_participants(event_id, include_archived=True)
     
     text = f"👥 <b>Участники события \"{event['title']}\"</b>\n\n"
     
@@ -206,33 +266,28 @@ async def cb_event_participants(callback: CallbackQuery) -> None:
             text += f"{i}. {status_emoji} {name}{username}\n"
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="◀️ Назад к событию", callback_data=f"owner:{event_id}")]
+        [InlineKeyboardButton(text="◀️ Назад к событию", callback_data=OwnerEvent(event_id=event_id).pack())]
     ])
     
     await callback.message.edit_text(text, reply_markup=keyboard)
-    await callback.answer()
+    await answer_once(callback)
 
 
-@events_router.callback_query(lambda c: c.data and c.data.startswith("event_expenses:"))
-async def cb_event_expenses(callback: CallbackQuery) -> None:
+@callbacks.prefix(EventExpenses, early_ack=True)
+async def cb_event_expenses(callback: CallbackQuery, data: EventExpenses) -> None:
     """Показать расходы события"""
     user = callback.from_user
     if not user:
-        await callback.answer("Ошибка")
+        await answer_once(callback, "Ошибка")
         return
     
-    event_id_str = callback.data.split(":", 1)[1]
-    try:
-        event_id = int(event_id_str)
-    except ValueError:
-        await callback.answer("Неверный ID события")
-        return
+    event_id = data.event_id
     
     repo = get_repo()
-    event = await repo.get_event(event_id)
+    event = await repo.get_event(event_id, include_archived=True)
     
     if not event:
-        await callback.answer("Событие не найдено")
+        await answer_once(callback, "Событие не найдено")
         return
     
     expenses = await repo.get_event_expenses(event_id)
@@ -257,33 +312,28 @@ async def cb_event_expenses(callback: CallbackQuery) -> None:
             text += f"\n<b>Итого:</b> {total} RUB"
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="◀️ Назад к событию", callback_data=f"owner:{event_id}")]
+        [InlineKeyboardButton(text="◀️ Назад к событию", callback_data=OwnerEvent(event_id=event_id).pack())]
     ])
     
     await callback.message.edit_text(text, reply_markup=keyboard)
-    await callback.answer()
+    await answer_once(callback)
 
 
-@events_router.callback_query(lambda c: c.data and c.data.startswith("event_settlement:"))
-async def cb_event_settlement(callback: CallbackQuery) -> None:
+@callbacks.prefix(EventSettlement, early_ack=True)
+async def cb_event_settlement(callback: CallbackQuery, data: EventSettlement) -> None:
     """Показать расчёты по событию"""
     user = callback.from_user
     if not user:
-        await callback.answer("Ошибка")
+        await answer_once(callback, "Ошибка")
         return
     
-    event_id_str = callback.data.split(":", 1)[1]
-    try:
-        event_id = int(event_id_str)
-    except ValueError:
-        await callback.answer("Неверный ID события")
-        return
+    event_id = data.event_id
     
     repo = get_repo()
-    event = await repo.get_event(event_id)
+    event = await repo.get_event(event_id, include_archived=True)
     
     if not event:
-        await callback.answer("Событие не найдено")
+        await answer_once(callback, "Событие не найдено")
         return
     
     text = f"🧮 <b>Расчёты по событию \"{event['title']}\"</b>\n\n"
@@ -294,14 +344,14 @@ async def cb_event_settlement(callback: CallbackQuery) -> None:
     text += "• Итоговая статистика"
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="◀️ Назад к событию", callback_data=f"owner:{event_id}")]
+        [InlineKeyboardButton(text="◀️ Назад к событию", callback_data=OwnerEvent(event_id=event_id).pack())]
     ])
     
     await callback.message.edit_text(text, reply_markup=keyboard)
-    await callback.answer()
+    await answer_once(callback)
 
 
-@events_router.callback_query(lambda c: c.data == "menu:newevent")
+@callbacks.exact("menu:newevent")
 async def cb_menu_newevent(callback: CallbackQuery) -> None:
     """Начало создания события - запрос названия"""
     user = callback.from_user
@@ -327,7 +377,7 @@ async def cb_menu_newevent(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
-@events_router.callback_query(lambda c: c.data == "menu:cancel_create")
+@callbacks.exact("menu:cancel_create")
 async def cb_cancel_create(callback: CallbackQuery) -> None:
     """Отмена создания события"""
     user = callback.from_user
@@ -347,7 +397,7 @@ async def cb_cancel_create(callback: CallbackQuery) -> None:
     await callback.answer("Отменено")
 
 
-@events_router.callback_query(lambda c: c.data == "event:skip_location")
+@callbacks.exact("event:skip_location")
 async def cb_skip_location(callback: CallbackQuery) -> None:
     """Пропуск указания места"""
     user = callback.from_user
@@ -369,7 +419,7 @@ async def cb_skip_location(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
-@events_router.callback_query(lambda c: c.data == "event:skip_notes")
+@callbacks.exact("event:skip_notes")
 async def cb_skip_notes(callback: CallbackQuery) -> None:
     """Пропуск заметок и создание события"""
     user = callback.from_user
@@ -381,7 +431,7 @@ async def cb_skip_notes(callback: CallbackQuery) -> None:
     await callback.answer("Событие создано!")
 
 
-@events_router.callback_query(lambda c: c.data == "menu:addexpense")
+@callbacks.exact("menu:addexpense")
 async def cb_menu_addexpense(callback: CallbackQuery) -> None:
     """Инструкция по добавлению расхода"""
     text = (
@@ -406,6 +456,19 @@ async def cb_menu_addexpense(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
+async def notify_participants(message: Message, repo, event_id: int, owner_id: int, text: str) -> None:
+    """Рассылка всем участникам, кроме владельца; прогресс — в чат владельца."""
+    await broadcast_to_participants(
+        message.bot,
+        repo,
+        get_global_outbox(),
+        event_id=event_id,
+        text=text,
+        progress_chat_id=message.chat.id,
+        exclude_user_ids=(owner_id,),
+    )
+
+
 def format_event_details(event, participants) -> str:
     lines = [
         f"Управление событием #{event['id']}",
@@ -472,46 +535,61 @@ async def build_summary_message(repo, event_id: int) -> str:
     return "\n".join([summary_text, *expense_lines])
 
 
+async def _load_view_cards(user_id: int, tg_id: int, view: str, listing: str) -> list[EventCardData]:
+    repo = get_repo()
+    settings = get_settings()
+    limit = PAST_EVENTS_LIMIT if listing != UPCOMING_LISTING else None
+    if view == OWNER_VIEW:
+        rows = await repo.list_owner_events(user_id, EventListing(listing), limit)
+        return build_event_cards(rows, settings.zoneinfo, True)
+    rows = await repo.list_participant_events(user_id, EventListing(listing), limit)
+    cards = build_event_cards(rows, settings.zoneinfo, False)
+    for card in cards:
+        pending = status_writes.pending((card.event_id, tg_id))
+        if pending is not None:
+            card.status = pending[1]
+    return cards
+
+
 async def build_myevents_view(
     user_id: int,
+    tg_id: int,
     *,
     active_view: Optional[str] = None,
     direction: Optional[str] = None,
+    listing: Optional[str] = None,
 ) -> tuple[str, InlineKeyboardMarkup]:
-    repo = get_repo()
-    settings = get_settings()
-
-    owner_cards = build_event_cards(
-        await repo.list_owner_events(user_id), settings.zoneinfo, True
-    )
-    participant_cards = build_event_cards(
-        await repo.list_participant_events(user_id), settings.zoneinfo, False
-    )
-
-    views = {
-        OWNER_VIEW: owner_cards,
-        PARTICIPANT_VIEW: participant_cards,
-    }
+    """Карточка «Моих событий»: вкладка ``active_view``, срез ``listing``.
 
+    Запрашивается только список активной вкладки; вторая читается, лишь
+    если первая пуста. По умолчанию показываются предстоящие события.
+    """
+    if listing is None:
+        listing = state.get_listing(tg_id) or UPCOMING_LISTING
     if active_view is None:
-        active_view = state.get_view(user_id)
-
-    if not active_view or not views.get(active_view):
-        if owner_cards:
-            active_view = OWNER_VIEW
-        elif participant_cards:
-            active_view = PARTICIPANT_VIEW
+        active_view = state.get_view(tg_id)
+
+    order = [OWNER_VIEW, PARTICIPANT_VIEW]
+    if active_view in order:
+        order.remove(active_view)
+        order.insert(0, active_view)
+
+    cards: list[EventCardData] = []
+    for view in order:
+        cards = await _load_view_cards(user_id, tg_id, view, listing)
+        if cards:
+            active_view = view
+            break
+    else:
+        if listing == UPCOMING_LISTING:
+            state.clear_user(tg_id)
         else:
-            state.clear_user(user_id)
-            return (
-                "Событий пока нет. Создайте новое командой /newevent.",
-                build_events_keyboard(OWNER_VIEW, None),
-            )
+            state.set_listing(tg_id, listing)
+        return EMPTY_LISTING_TEXT[listing], build_events_keyboard(OWNER_VIEW, None, listing=listing)
 
-    cards = views[active_view]
     ids = [card.event_id for card in cards]
 
-    current_event_id = state.get_view_event(user_id, active_view)
+    current_event_id = state.get_view_event(tg_id, active_view)
     if current_event_id not in ids:
         current_event_id = ids[0]
 
@@ -526,18 +604,34 @@ async def build_myevents_view(
         idx += 1
 
     current_card = cards[idx]
-    state.set_view_event(user_id, active_view, current_card.event_id)
+    state.set_view_event(tg_id, active_view, current_card.event_id)
+    state.set_listing(tg_id, listing)
 
+    has_prev, has_next = idx > 0, idx < len(cards) - 1
+    if active_view == PARTICIPANT_VIEW and listing == UPCOMING_LISTING:
+        _status_cards.set(
+            (current_card.event_id, tg_id), StatusCard(user_id, current_card, has_prev, has_next)
+        )
+    return render_myevents_card(active_view, listing, current_card, has_prev, has_next)
+
+
+def render_myevents_card(
+    active_view: str, listing: str, card: EventCardData, has_prev: bool, has_next: bool
+) -> tuple[str, InlineKeyboardMarkup]:
+    settings = get_settings()
     title = "Раздел «Я владелец»" if active_view == OWNER_VIEW else "Раздел «Я участник»"
-    body = format_event_card(current_card, settings.zoneinfo)
-    status_label = humanize_status(current_card.status) if current_card.status else None
+    if listing != UPCOMING_LISTING:
+        title += f" · {LISTING_TITLES[listing]}"
+    body = format_event_card(card, settings.zoneinfo)
+    status_label = humanize_status(card.status) if card.status else None
 
     keyboard = build_events_keyboard(
         active_view,
-        current_card.event_id,
+        card.event_id,
+        listing=listing,
         status_label=status_label,
-        has_prev=idx > 0,
-        has_next=idx < len(cards) - 1,
+        has_prev=has_prev,
+        has_next=has_next,
     )
 
     return f"{title}\n\n{body}", keyboard
@@ -588,8 +682,8 @@ async def cmd_myevents(message: Message) -> None:
         return
 
     user_id = await repo.ensure_user(user.id, user.username, user.full_name)
-    state.clear_user(user_id)
-    text, keyboard = await build_myevents_view(user_id)
+    state.clear_user(user.id)
+    text, keyboard = await build_myevents_view(user_id, user.id)
     await message.answer(text, reply_markup=keyboard)
 
 
@@ -619,6 +713,9 @@ async def cmd_status(message: Message) -> None:
 
     user_id = await repo.ensure_user(user.id, user.username, user.full_name)
     await assert_event_participant(repo.db, user_id, event_id)
+    # отложенное переключение кнопкой не должно перетереть явно заданный статус
+    await status_writes.discard((event_id, user.id))
+    _status_cards.pop((event_id, user.id))
     await repo.set_participant_status(event_id, user_id, status)
     await message.answer("Статус обновлён")
 
@@ -629,12 +726,12 @@ async def cmd_invite(message: Message) -> None:
     if not message.text:
         return
     parts = message.text.split()
-    if len(parts) != 3:
-        await message.answer("Использование: /invite [event_id] @username")
+    if len(parts) < 3 or not parts[1].isdigit():
+        await message.answer("Использование: /invite [event_id] @username1 @username2 ...")
         return
 
     event_id = int(parts[1])
-    username = parts[2]
+    usernames = list(dict.fromkeys(parts[2:]))
     user = message.from_user
     if not user:
         return
@@ -642,13 +739,29 @@ async def cmd_invite(message: Message) -> None:
     current_user_id = await repo.ensure_user(user.id, user.username, user.full_name)
     await assert_event_owner(repo.db, current_user_id, event_id)
 
-    invited = await repo.get_user_by_username(username)
-    if not invited:
-        await message.answer("Пользователь не найден, пусть сначала напишет боту.")
-        return
+    found = await repo.resolve_usernames(usernames)
+    added = await repo.add_participants(
+        event_id, [row["id"] for row in found.values()], ParticipantStatus.INVITED.value
+    )
 
-    await repo.set_participant_status(event_id, invited["id"], "invited")
-    await message.answer(f"Пользователь {username} приглашён.")
+    invited, already, missing = [], [], []
+    for username in usernames:
+        row = found.get(username_key(username))
+        if row is None:
+            missing.append(username)
+        elif row["id"] in added:
+            invited.append(username)
+        else:
+            already.append(username)
+
+    lines = []
+    if invited:
+        lines.append(f"Приглашены: {' '.join(invited)}")
+    if already:
+        lines.append(f"Уже участвуют: {' '.join(already)}")
+    if missing:
+        lines.append(f"Не найдены (пусть сначала напишут боту): {' '.join(missing)}")
+    await message.answer("\n".join(lines))
 
 
 @events_router.message(Command("summary"))
@@ -668,7 +781,7 @@ async def cmd_summary(message: Message) -> None:
         return
 
     user_id = await repo.ensure_user(user.id, user.username, user.full_name)
-    await assert_event_participant(repo.db, user_id, event_id)
+    await assert_event_participant(repo.db, user_id, event_id, include_archived=True)
 
     summary_message = await build_summary_message(repo, event_id)
     await message.answer(summary_message)
@@ -689,7 +802,7 @@ async def cmd_settle(message: Message) -> None:
     if not user:
         return
     user_id = await repo.ensure_user(user.id, user.username, user.full_name)
-    await assert_event_participant(repo.db, user_id, event_id)
+    await assert_event_participant(repo.db, user_id, event_id, include_archived=True)
 
     expenses = await repo.get_event_expenses(event_id)
     going_ids = [p["user_id"] for p in await repo.list_event_participants_with_status(event_id) if p["status"] == "going"]
@@ -745,50 +858,66 @@ async def cmd_manage(message: Message) -> None:
 
     user_id = await repo.ensure_user(user.id, user.username, user.full_name)
     await assert_event_owner(repo.db, user_id, event_id)
-    state.set_view_event(user_id, OWNER_VIEW, event_id)
+    state.set_view_event(user.id, OWNER_VIEW, event_id)
 
-    text, keyboard = await build_myevents_view(user_id, active_view=OWNER_VIEW)
+    text, keyboard = await build_myevents_view(user_id, user.id, active_view=OWNER_VIEW)
     await message.answer(text, reply_markup=keyboard)
 
 
-@events_router.callback_query(F.data == "myevents_owner")
+@callbacks.exact("myevents_owner")
 async def cb_myevents_owner(callback: CallbackQuery) -> None:
     user = callback.from_user
     if not user or not callback.message:
         return
-    text, keyboard = await build_myevents_view(user.id, active_view=OWNER_VIEW)
+    user_id = await get_repo().ensure_user(user.id, user.username, user.full_name)
+    text, keyboard = await build_myevents_view(user_id, user.id, active_view=OWNER_VIEW)
     await callback.answer("Раздел владельца")
     await callback.message.edit_text(text, reply_markup=keyboard)
 
 
-@events_router.callback_query(F.data == "myevents_participant")
+@callbacks.exact("myevents_participant")
 async def cb_myevents_participant(callback: CallbackQuery) -> None:
     user = callback.from_user
     if not user or not callback.message:
         return
-    text, keyboard = await build_myevents_view(user.id, active_view=PARTICIPANT_VIEW)
+    user_id = await get_repo().ensure_user(user.id, user.username, user.full_name)
+    text, keyboard = await build_myevents_view(user_id, user.id, active_view=PARTICIPANT_VIEW)
     await callback.answer("Раздел участника")
     await callback.message.edit_text(text, reply_markup=keyboard)
 
 
-@events_router.callback_query(F.data.startswith("event_nav:"))
-async def cb_event_nav(callback: CallbackQuery) -> None:
+@callbacks.prefix(EventListingTab)
+async def cb_myevents_listing(callback: CallbackQuery, data: EventListingTab) -> None:
     user = callback.from_user
     if not user or not callback.message:
         return
-    _, view, direction = callback.data.split(":")
-    text, keyboard = await build_myevents_view(user.id, active_view=view, direction=direction)
+    if data.listing not in EMPTY_LISTING_TEXT:
+        await callback.answer("Неизвестный раздел")
+        return
+    user_id = await get_repo().ensure_user(user.id, user.username, user.full_name)
+    text, keyboard = await build_myevents_view(user_id, user.id, listing=data.listing)
     await callback.answer()
     await callback.message.edit_text(text, reply_markup=keyboard)
 
 
-@events_router.callback_query(F.data.startswith("manage:"))
-async def cb_manage(callback: CallbackQuery) -> None:
+@callbacks.prefix(EventNav)
+async def cb_event_nav(callback: CallbackQuery, data: EventNav) -> None:
     user = callback.from_user
     if not user or not callback.message:
         return
-    _, raw_event_id = callback.data.split(":")
-    event_id = int(raw_event_id)
+    view, direction = data.view, data.direction
+    user_id = await get_repo().ensure_user(user.id, user.username, user.full_name)
+    text, keyboard = await build_myevents_view(user_id, user.id, active_view=view, direction=direction)
+    await callback.answer()
+    await callback.message.edit_text(text, reply_markup=keyboard)
+
+
+@callbacks.prefix(Manage)
+async def cb_manage(callback: CallbackQuery, data: Manage) -> None:
+    user = callback.from_user
+    if not user or not callback.message:
+        return
+    event_id = data.event_id
 
     repo = get_repo()
     event = await repo.get_event(event_id)
@@ -799,23 +928,23 @@ async def cb_manage(callback: CallbackQuery) -> None:
     await callback.message.edit_text(text, reply_markup=manage_keyboard(event_id))
 
 
-@events_router.callback_query(F.data == "manage_back")
+@callbacks.exact("manage_back")
 async def cb_manage_back(callback: CallbackQuery) -> None:
     user = callback.from_user
     if not user or not callback.message:
         return
-    text, keyboard = await build_myevents_view(user.id, active_view=OWNER_VIEW)
+    user_id = await get_repo().ensure_user(user.id, user.username, user.full_name)
+    text, keyboard = await build_myevents_view(user_id, user.id, active_view=OWNER_VIEW)
     await callback.answer()
     await callback.message.edit_text(text, reply_markup=keyboard)
 
 
-@events_router.callback_query(F.data.startswith("manage_edit:"))
-async def cb_manage_edit(callback: CallbackQuery) -> None:
+@callbacks.prefix(ManageEdit)
+async def cb_manage_edit(callback: CallbackQuery, data: ManageEdit) -> None:
     user = callback.from_user
     if not user or not callback.message:
         return
-    _, field, raw_event_id = callback.data.split(":")
-    event_id = int(raw_event_id)
+    field, event_id = data.field, data.event_id
 
     prompts = {
         "title": "Введите новое название:",
@@ -828,28 +957,49 @@ async def cb_manage_edit(callback: CallbackQuery) -> None:
     await callback.message.answer(f"#{event_id} {prompts[field]}")
 
 
-@events_router.callback_query(F.data.startswith("manage_cancel:"))
-async def cb_manage_cancel(callback: CallbackQuery) -> None:
+@callbacks.prefix(ManageNotify)
+async def cb_manage_notify(callback: CallbackQuery, data: ManageNotify) -> None:
+    user = callback.from_user
+    if not user or not callback.message:
+        return
+    event_id = data.event_id
+
+    state.set_pending_edit(user.id, event_id, "notify")
+    await callback.answer()
+    await callback.message.answer(f"#{event_id} Введите сообщение для всех участников:")
+
+
+@callbacks.prefix(ManageCancel)
+async def cb_manage_cancel(callback: CallbackQuery, data: ManageCancel) -> None:
     user = callback.from_user
     if not user or not callback.message:
         return
-    _, raw_event_id = callback.data.split(":")
-    event_id = int(raw_event_id)
+    event_id = data.event_id
 
     repo = get_repo()
+    user_id = await repo.ensure_user(user.id, user.username, user.full_name)
+    await assert_event_owner(repo.db, user_id, event_id)
+    event = await repo.get_event(event_id)
     await repo.cancel_event(event_id)
     await callback.answer("Событие отменено")
-    text, keyboard = await build_myevents_view(user.id, active_view=OWNER_VIEW)
+    if event and not event["canceled"]:
+        await notify_participants(
+            callback.message,
+            repo,
+            event_id,
+            user_id,
+            f"❌ Событие «{html.escape(event['title'])}» отменено.",
+        )
+    text, keyboard = await build_myevents_view(user_id, user.id, active_view=OWNER_VIEW)
     await callback.message.edit_text(text, reply_markup=keyboard)
 
 
-@events_router.callback_query(F.data.startswith("manage_remove:"))
-async def cb_manage_remove(callback: CallbackQuery) -> None:
+@callbacks.prefix(ManageRemove)
+async def cb_manage_remove(callback: CallbackQuery, data: ManageRemove) -> None:
     user = callback.from_user
     if not user or not callback.message:
         return
-    _, raw_event_id = callback.data.split(":")
-    event_id = int(raw_event_id)
+    event_id = data.event_id
 
     repo = get_repo()
     participants = await repo.get_event_participants(event_id)
@@ -900,45 +1050,71 @@ async def cmd_invitelink(message: Message) -> None:
     await message.answer(f"Пригласительная ссылка:\n/join {link['token']}")
 
 
-@events_router.message(Command("join"))
-async def cmd_join(message: Message) -> None:
+@events_router.message(Command("revokelink"))
+async def cmd_revokelink(message: Message) -> None:
     repo = get_repo()
-    parts = message.text.split()
+    parts = message.text.split() if message.text else []
     if len(parts) != 2:
-        await message.answer("Использование: /join [token]")
+        await message.answer("Использование: /revokelink [event_id]")
         return
 
-    token = parts[1]
-    link = await repo.get_invite_link_by_token(token)
-    if not link:
-        await message.answer("Ссылка недействительна")
+    try:
+        event_id = int(parts[1])
+    except ValueError:
+        await message.answer("Некорректный event_id")
         return
 
-    if link["expires_at"] and link["expires_at"] < datetime.now(timezone.utc):
-        await message.answer("Срок действия ссылки истёк")
+    user = message.from_user
+    if not user:
         return
 
-    if link["max_uses"] and link["uses"] >= link["max_uses"]:
-        await message.answer("Превышено максимальное число использований")
+    user_id = await repo.ensure_user(user.id, user.username, user.full_name)
+    await assert_event_owner(repo.db, user_id, event_id)
+
+    tokens = await repo.revoke_invite_links(event_id)
+    if not tokens:
+        await message.answer("Активных пригласительных ссылок нет")
+        return
+    await message.answer(f"Отозвано ссылок: {len(tokens)}")
+
+
+JOIN_MESSAGES = {
+    InviteResult.JOINED: "Вы присоединились к событию! Обновите /myevents",
+    InviteResult.ALREADY_PARTICIPANT: "Вы уже участник этого события",
+    InviteResult.NOT_FOUND: "Ссылка недействительна",
+    InviteResult.EXPIRED: "Срок действия ссылки истёк",
+    InviteResult.EXHAUSTED: "Превышено максимальное число использований",
+    InviteResult.EVENT_CANCELED: "Событие отменено",
+}
+
+
+@events_router.message(Command("join"))
+async def cmd_join(message: Message) -> None:
+    repo = get_repo()
+    parts = message.text.split()
+    if len(parts) != 2:
+        await message.answer("Использование: /join [token]")
         return
 
     user = message.from_user
     if not user:
         return
 
-    user_id = await repo.ensure_user(user.id, user.username, user.full_name)
-    await repo.set_participant_status(link["event_id"], user_id, "invited")
-    await repo.increment_invite_use(link["id"])
-    await message.answer("Вы присоединились к событию! Обновите /myevents")
+    token = parts[1]
+    # Несуществующие и отозванные токены отсекаются кэшем без запросов к БД
+    result = repo.cached_invite_rejection(token)
+    if result is None:
+        user_id = await repo.ensure_user(user.id, user.username, user.full_name)
+        result, _ = await repo.redeem_invite(token, user_id, ParticipantStatus.INVITED.value)
+    await message.answer(JOIN_MESSAGES[result])
 
 
-@events_router.callback_query(F.data.startswith("invite:"))
-async def cb_invite(callback: CallbackQuery) -> None:
+@callbacks.prefix(Invite)
+async def cb_invite(callback: CallbackQuery, data: Invite) -> None:
     user = callback.from_user
     if not user or not callback.message:
         return
-    _, raw_event_id = callback.data.split(":")
-    event_id = int(raw_event_id)
+    event_id = data.event_id
 
     text = (
         "Чтобы пригласить друга, отправьте ему команду /invitelink"
@@ -948,28 +1124,54 @@ async def cb_invite(callback: CallbackQuery) -> None:
     await callback.message.answer(text)
 
 
-@events_router.callback_query(F.data.startswith("cycle_status:"))
-async def cb_cycle_status(callback: CallbackQuery) -> None:
+@callbacks.prefix(CycleStatus)
+async def cb_cycle_status(callback: CallbackQuery, data: CycleStatus) -> None:
     user = callback.from_user
-    if not user or not callback.message:
+    message = callback.message
+    if not user or not message:
         return
-    repo = get_repo()
-    _, raw_event_id = callback.data.split(":")
-    event_id = int(raw_event_id)
+    event_id = data.event_id
+    key = (event_id, user.id)
 
-    user_id = await repo.ensure_user(user.id, user.username, user.full_name)
-    participant = await repo.get_participant(event_id, user_id)
-    if not participant:
-        await callback.answer("Вы не участник события", show_alert=True)
-        return
+    shown = _status_cards.get(key)
+    if shown is not None:
+        user_id = shown.user_id
+        current_status = shown.card.status or ParticipantStatus.INVITED
+    else:
+        repo = get_repo()
+        user_id = await repo.ensure_user(user.id, user.username, user.full_name)
+        participant = await repo.get_participant(event_id, user_id)
+        if not participant:
+            await callback.answer("Вы не участник события", show_alert=True)
+            return
+        current_status = ParticipantStatus(participant["status"])
+    # Пока окно склейки открыто, текущий статус — последний из памяти
+    pending = status_writes.pending(key)
+    if pending is not None:
+        current_status = pending[1]
 
-    current_status = ParticipantStatus(participant["status"])
     new_status = next_status(current_status)
 
-    await repo.set_participant_status(event_id, user_id, new_status.value)
-    text, keyboard = await build_myevents_view(user_id, active_view=PARTICIPANT_VIEW)
-    await callback.answer("Статус обновлён")
-    await callback.message.edit_text(text, reply_markup=keyboard)
+    async def write_status(value: tuple[int, ParticipantStatus]) -> None:
+        # только UPDATE: удалённого за время окна участника запись не вернёт
+        if not await get_repo().update_participant_status(event_id, value[0], value[1].value):
+            _status_cards.pop(key)
+
+    status_writes.submit(key, (user_id, new_status), write_status)
+    await callback.answer(f"Статус: {humanize_status(new_status)}")
+    if shown is not None:
+        card = replace(shown.card, status=new_status)
+        _status_cards.set(key, shown._replace(card=card))
+        text, keyboard = render_myevents_card(
+            PARTICIPANT_VIEW, UPCOMING_LISTING, card, shown.has_prev, shown.has_next
+        )
+    else:
+        # карточка старше кэша: перечитываем её, новый статус подставит pending
+        state.set_view_event(user.id, PARTICIPANT_VIEW, event_id)
+        text, keyboard = await build_myevents_view(
+            user_id, user.id, active_view=PARTICIPANT_VIEW, listing=UPCOMING_LISTING
+        )
+    await message.edit_text(text, reply_markup=keyboard)
 
 
 @events_router.message(Command("transfer_ownership"))
@@ -1032,134 +1234,23 @@ async def cmd_remove(message: Message) -> None:
         await message.answer("Пользователь не найден")
         return
 
+    await status_writes.discard((event_id, target["tg_id"]))
+    _status_cards.pop((event_id, target["tg_id"]))
     await repo.remove_participant(event_id, target["id"])
     await message.answer("Участник удалён")
 
 
-## Дублирующийся блок /invitelink удалён ниже
-## Дублирующийся блок /join удалён ниже
-## Дублирующийся блок callback invite: удалён ниже
-## Дублирующийся блок callback cycle_status: удалён ниже
-    repo = get_repo()
-    parts = message.text.split()
-    if len(parts) < 2:
-        await message.answer("Использование: /invitelink [event_id] [--max=N] [--ttl=hours]")
-        return
-
-    try:
-        event_id = int(parts[1])
-    except ValueError:
-        await message.answer("Некорректный event_id")
-        return
-
-    user = message.from_user
-    if not user:
-        return
-
-    user_id = await repo.ensure_user(user.id, user.username, user.full_name)
-    await assert_event_owner(repo.db, user_id, event_id)
-
-    max_uses: Optional[int] = None
-    ttl_hours: Optional[int] = None
-    for arg in parts[2:]:
-        if arg.startswith("--max="):
-            max_uses = int(arg.split("=", 1)[1])
-        if arg.startswith("--ttl="):
-            ttl_hours = int(arg.split("=", 1)[1])
-
-    token = secrets.token_urlsafe(8)
-    expires_at = None
-    if ttl_hours:
-        expires_at = datetime.now(timezone.utc) + timedelta(hours=ttl_hours)
-
-    link = await repo.add_invite_link(event_id, token, max_uses, expires_at)
-    await message.answer(f"Пригласительная ссылка: /join {link['token']}")
-
-
-@events_router.message(Command("join"))
-async def cmd_join(message: Message) -> None:
-    repo = get_repo()
-    parts = message.text.split()
-    if len(parts) != 2:
-        await message.answer("Использование: /join [token]")
-        return
-
-    token = parts[1]
-    link = await repo.get_invite_link_by_token(token)
-    if not link:
-        await message.answer("Ссылка недействительна")
-        return
-
-    if link["expires_at"] and link["expires_at"] < datetime.now(timezone.utc):
-        await message.answer("Срок действия ссылки истёк")
-        return
-
-    if link["max_uses"] and link["uses"] >= link["max_uses"]:
-        await message.answer("Превышено максимальное число использований")
-        return
-
-    user = message.from_user
-    if not user:
-        return
-
-    user_id = await repo.ensure_user(user.id, user.username, user.full_name)
-    await repo.set_participant_status(link["event_id"], user_id, "invited")
-    await repo.increment_invite_use(link["id"])
-    await message.answer("Вы присоединились к событию! Обновите /myevents")
-
-
-@events_router.callback_query(F.data.startswith("invite:"))
-async def cb_invite(callback: CallbackQuery) -> None:
+@callbacks.prefix(Summary, early_ack=True)
+async def cb_summary(callback: CallbackQuery, data: Summary) -> None:
     user = callback.from_user
     if not user or not callback.message:
         return
-    _, raw_event_id = callback.data.split(":")
-    event_id = int(raw_event_id)
-
-    text = (
-        "Чтобы пригласить друга, отправьте ему команду /invitelink"
-        f" или используйте: /invitelink {event_id}"
-    )
-    await callback.answer()
-    await callback.message.answer(text)
-
-
-@events_router.callback_query(F.data.startswith("cycle_status:"))
-async def cb_cycle_status(callback: CallbackQuery) -> None:
-    user = callback.from_user
-    if not user or not callback.message:
-        return
-    repo = get_repo()
-    _, raw_event_id = callback.data.split(":")
-    event_id = int(raw_event_id)
-
-    user_id = await repo.ensure_user(user.id, user.username, user.full_name)
-    participant = await repo.get_participant(event_id, user_id)
-    if not participant:
-        await callback.answer("Вы не участник события", show_alert=True)
-        return
-
-    current_status = ParticipantStatus(participant["status"])
-    new_status = next_status(current_status)
-
-    await repo.set_participant_status(event_id, user_id, new_status.value)
-    text, keyboard = await build_myevents_view(user_id, active_view=PARTICIPANT_VIEW)
-    await callback.answer("Статус обновлён")
-    await callback.message.edit_text(text, reply_markup=keyboard)
-
-
-@events_router.callback_query(F.data.startswith("summary:"))
-async def cb_summary(callback: CallbackQuery) -> None:
-    user = callback.from_user
-    if not user or not callback.message:
-        return
-    _, raw_event_id = callback.data.split(":")
-    event_id = int(raw_event_id)
+    event_id = data.event_id
 
     repo = get_repo()
     summary_message = await build_summary_message(repo, event_id)
 
-    await callback.answer()
+    await answer_once(callback)
     await callback.message.answer(summary_message)
 
 
@@ -1299,7 +1390,7 @@ async def create_event_from_data(message: Message, repo, user) -> None:
         event_text += f"📋 <b>Заметки:</b> {notes}\n"
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="⚙️ Управление событием", callback_data=f"owner:{event['id']}")],
+        [InlineKeyboardButton(text="⚙️ Управление событием", callback_data=OwnerEvent(event_id=event['id']).pack())],
         [InlineKeyboardButton(text="📅 Мои события", callback_data="menu:myevents")],
         [InlineKeyboardButton(text="◀️ В меню", callback_data="menu:main")]
     ])
@@ -1340,6 +1431,20 @@ async def handle_text_input(message: Message) -> None:
     await assert_event_owner(repo.db, user_id, event_id)
 
     value = message.text.strip() if message.text else ""
+    if field == "notify":
+        event = await repo.get_event(event_id)
+        if not event or not value:
+            await message.answer("Не удалось отправить оповещение.")
+            return
+        await notify_participants(
+            message,
+            repo,
+            event_id,
+            user_id,
+            f"📣 Сообщение организатора «{html.escape(event['title'])}»:\n\n{html.escape(value)}",
+        )
+        return
+
     if field == "time":
         settings = get_settings()
         try:
@@ -1349,15 +1454,36 @@ async def handle_text_input(message: Message) -> None:
             state.set_pending_edit(user.id, event_id, field)
             return
         await repo.update_event_field(event_id, "starts_at", value_dt)
+        event = await repo.get_event(event_id)
+        if event:
+            local_dt = value_dt.astimezone(settings.zoneinfo).strftime("%d.%m.%Y %H:%M")
+            await notify_participants(
+                message,
+                repo,
+                event_id,
+                user_id,
+                f"⏰ Время события «{html.escape(event['title'])}» изменено: {local_dt}",
+            )
     elif field in {"title", "location", "notes"}:
         if value == "-":
             value = None
         await repo.update_event_field(event_id, field, value)
+        if field == "location":
+            event = await repo.get_event(event_id)
+            if event:
+                place = html.escape(value) if value else "не указано"
+                await notify_participants(
+                    message,
+                    repo,
+                    event_id,
+                    user_id,
+                    f"📍 Место события «{html.escape(event['title'])}» изменено: {place}",
+                )
     else:
         await message.answer("Неизвестное поле для обновления.")
         return
 
     await message.answer("Поле обновлено.")
-    text, keyboard = await build_myevents_view(user_id, active_view=OWNER_VIEW)
+    text, keyboard = await build_myevents_view(user_id, user.id, active_view=OWNER_VIEW)
     await message.answer(text, reply_markup=keyboard)
 
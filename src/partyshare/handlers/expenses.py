@@ -4,8 +4,12 @@ from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
 
-from partyshare.db.repo import get_global_repository
+from partyshare.config import get_settings
+from partyshare.db.repo import get_global_repository, username_key
 from partyshare.services.authz import assert_event_owner, assert_event_participant
+from partyshare.services.entries import parse_batch, parse_expense, parse_item
+from partyshare.services.export import BALANCE_HEADER, LEDGER_HEADER, balance_rows, ledger_rows
+from partyshare.utils.csvfile import CsvInputFile
 
 expenses_router = Router()
 
@@ -20,36 +24,34 @@ def _extract_event_id(text: str) -> int | None:
     return None
 
 
+ADDEXPENSE_USAGE = (
+    "Использование: /addexpense [event_id] | [название] | [сумма] [валюта] | shared|items\n"
+    "Несколько расходов — по одному на строке после /addexpense [event_id]"
+)
+ADDITEM_USAGE = (
+    "Использование: /additem [expense_id] | [название] | [сумма] | @u1 @u2 ...\n"
+    "Несколько позиций — по одной на строке после /additem [expense_id]"
+)
+
+
+def _command_payload(message: Message) -> str:
+    parts = (message.text or "").split(maxsplit=1)
+    return parts[1] if len(parts) > 1 else ""
+
+
 @expenses_router.message(Command("addexpense"))
 async def cmd_addexpense(message: Message) -> None:
     repo = get_global_repository()
     if not message.text:
         return
-    parts = [part.strip() for part in message.text.replace("/addexpense", "", 1).split("|")]
-    if len(parts) < 3:
-        await message.answer("Использование: /addexpense [event_id] | [название] | [сумма] [валюта] | shared|items")
-        return
-
-    try:
-        event_id = int(parts[0])
-    except ValueError:
-        await message.answer("Некорректный event_id")
+    batch = parse_batch(_command_payload(message), parse_expense)
+    if batch.target_id is None or not (batch.entries or batch.errors):
+        await message.answer(ADDEXPENSE_USAGE)
         return
-
-    title = parts[1]
-    amount_currency = parts[2].split()
-    if len(amount_currency) < 1:
-        await message.answer("Укажите сумму")
+    if batch.errors:
+        await message.answer("Ничего не добавлено:\n" + "\n".join(batch.errors))
         return
-
-    try:
-        amount_cents = int(float(amount_currency[0]) * 100)
-    except ValueError:
-        await message.answer("Некорректная сумма")
-        return
-
-    currency = amount_currency[1] if len(amount_currency) > 1 else "EUR"
-    mode = parts[3].strip() if len(parts) > 3 else "shared"
+    event_id = batch.target_id
 
     user = message.from_user
     if not user:
@@ -58,25 +60,20 @@ async def cmd_addexpense(message: Message) -> None:
     user_id = await repo.ensure_user(user.id, user.username, user.full_name)
     await assert_event_participant(repo.db, user_id, event_id)
 
-    is_shared = mode.lower() == "shared"
-    expense = await repo.create_expense(
-        event_id=event_id,
-        payer_id=user_id,
-        created_by=user_id,
-        title=title,
-        amount_cents=amount_cents,
-        currency=currency,
-        is_shared=is_shared,
-    )
+    expenses = await repo.create_expenses(event_id, user_id, user_id, batch.entries)
 
-    msg = f"Расход добавлен: #{expense['id']} {expense['title']}"
-    if not is_shared:
-        msg += (
-            "\nДобавьте позиции через /additem "
+    if len(expenses) == 1:
+        lines = [f"Расход добавлен: #{expenses[0]['id']} {expenses[0]['title']}"]
+    else:
+        lines = [f"Добавлено расходов: {len(expenses)}"]
+        lines += [f"#{expense['id']} {expense['title']}" for expense in expenses]
+    if any(not expense["is_shared"] for expense in expenses):
+        lines.append(
+            "Добавьте позиции через /additem "
             "<expense_id> | <label> | <amount> | @user1 @user2"
         )
 
-    await message.answer(msg)
+    await message.answer("\n".join(lines))
 
 
 @expenses_router.message(Command("additem"))
@@ -84,31 +81,14 @@ async def cmd_additem(message: Message) -> None:
     repo = get_global_repository()
     if not message.text:
         return
-    parts = [part.strip() for part in message.text.replace("/additem", "", 1).split("|")]
-    if len(parts) < 3:
-        await message.answer("Использование: /additem [expense_id] | [название] | [сумма] | @u1 @u2 ...")
+    batch = parse_batch(_command_payload(message), parse_item)
+    if batch.target_id is None or not (batch.entries or batch.errors):
+        await message.answer(ADDITEM_USAGE)
         return
-
-    try:
-        expense_id = int(parts[0])
-    except ValueError:
-        await message.answer("Некорректный expense_id")
+    if batch.errors:
+        await message.answer("Ничего не добавлено:\n" + "\n".join(batch.errors))
         return
-
-    label = parts[1]
-    amount = parts[2].strip()
-    try:
-        amount_cents = int(float(amount) * 100)
-    except ValueError:
-        await message.answer("Некорректная сумма позиции")
-        return
-
-    consumers = []
-    if len(parts) > 3:
-        for username in parts[3].split():
-            user = await repo.get_user_by_username(username)
-            if user:
-                consumers.append(user["id"])
+    expense_id = batch.target_id
 
     user = message.from_user
     if not user:
@@ -122,6 +102,94 @@ async def cmd_additem(message: Message) -> None:
 
     await assert_event_participant(repo.db, current_user_id, expense["event_id"])
 
-    item = await repo.add_expense_item(expense_id, label, amount_cents, consumers)
-    await message.answer(f"Позиция добавлена: #{item['id']} {item['label'] or ''}")
+    # Все упомянутые имена со всех строк — одним запросом
+    mentioned = [name for entry in batch.entries for name in entry.usernames]
+    found = await repo.resolve_usernames(mentioned)
+    missing = list(dict.fromkeys(name for name in mentioned if username_key(name) not in found))
+
+    item_ids = await repo.add_expense_items(
+        expense_id,
+        [
+            (
+                entry.label,
+                entry.amount_cents,
+                [found[username_key(name)]["id"] for name in entry.usernames if username_key(name) in found],
+            )
+            for entry in batch.entries
+        ],
+    )
+
+    if len(item_ids) == 1:
+        lines = [f"Позиция добавлена: #{item_ids[0]} {batch.entries[0].label or ''}"]
+    else:
+        total = sum(entry.amount_cents for entry in batch.entries)
+        lines = [f"Добавлено позиций: {len(item_ids)} на сумму {total / 100:.2f}"]
+        lines += [f"#{item_id} {entry.label}" for item_id, entry in zip(item_ids, batch.entries, strict=True)]
+    if missing:
+        lines.append(f"Не найдены (пусть сначала напишут боту): {' '.join(missing)}")
+    await message.answer("\n".join(lines))
+
+
+@expenses_router.message(Command("export"))
+async def cmd_export(message: Message) -> None:
+    """CSV с расходами и балансами события; строки идут из курсора прямо в загрузку."""
+    repo = get_global_repository()
+    if not message.text:
+        return
+    event_id = _extract_event_id(message.text)
+    if event_id is None:
+        await message.answer("Использование: /export [event_id]")
+        return
+
+    user = message.from_user
+    if not user:
+        return
+
+    user_id = await repo.ensure_user(user.id, user.username, user.full_name)
+    await assert_event_participant(repo.db, user_id, event_id, include_archived=True)
+
+    tz = get_settings().zoneinfo
+    await message.answer_document(
+        CsvInputFile(
+            lambda: ledger_rows(repo.iter_event_ledger(event_id), tz),
+            LEDGER_HEADER,
+            f"event_{event_id}_expenses.csv",
+        ),
+        caption=f"Расходы события #{event_id}",
+    )
+    await message.answer_document(
+        CsvInputFile(
+            lambda: balance_rows(repo.iter_event_balances(event_id)),
+            BALANCE_HEADER,
+            f"event_{event_id}_balances.csv",
+        ),
+        caption="Балансы участников: плюс — должны вам, минус — должны вы",
+    )
+
+
+@expenses_router.message(Command("export_all"))
+async def cmd_export_all(message: Message) -> None:
+    """История расходов пользователя по всем его событиям и его баланс в каждом."""
+    repo = get_global_repository()
+    user = message.from_user
+    if not user:
+        return
 
+    user_id = await repo.ensure_user(user.id, user.username, user.full_name)
+    tz = get_settings().zoneinfo
+    await message.answer_document(
+        CsvInputFile(
+            lambda: ledger_rows(repo.iter_user_ledger(user_id), tz),
+            LEDGER_HEADER,
+            "partyshare_expenses.csv",
+        ),
+        caption="Все расходы в ваших событиях",
+    )
+    await message.answer_document(
+        CsvInputFile(
+            lambda: balance_rows(repo.iter_user_balances(user_id)),
+            BALANCE_HEADER,
+            "partyshare_balances.csv",
+        ),
+        caption="Ваш баланс по каждому событию",
+    )
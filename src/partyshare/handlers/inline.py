@@ -1,7 +1,10 @@
 """Inline-режим для приглашения участников."""
 
 import secrets
-from aiogram import Router
+from datetime import datetime, timezone
+from typing import Any, Mapping, NamedTuple, Optional
+
+from aiogram import Bot, Router
 from aiogram.types import (
     InlineQuery,
     InlineQueryResultArticle,
@@ -12,92 +15,206 @@ from aiogram.types import (
 
 from partyshare.config import get_settings
 from partyshare.db.repo import get_global_repository
+from partyshare.services.search import normalize_query, similarity, title_matches
+from partyshare.utils.cache import TTLCache
 
 inline_router = Router()
 
+# Telegram кэширует ответ на клиенте; is_personal — у каждого пользователя свой
+INLINE_CACHE_TIME = 300
+# Поиск по названию: короче не ищем, больше не показываем
+SEARCH_MIN_LENGTH = 3
+SEARCH_PAGE_SIZE = 10
+SEARCH_CANDIDATES = 50
+
+
+class SearchResult(NamedTuple):
+    query: str
+    rows: list[Mapping[str, Any]]
+    complete: bool  # найдены все совпадения, а не первые SEARCH_CANDIDATES
+
+
+# (event_id, events.version) -> готовая карточка владельца. Версию поднимает
+# каждая запись в событие в любом процессе, поэтому устаревшая карточка не
+# найдётся по новому ключу. Для чужих событий сюда ничего не попадает
+_cards: TTLCache[tuple[int, int], InlineQueryResultArticle] = TTLCache(ttl=600, max_entries=5_000)
+# tg_id -> последний поиск пользователя; живёт недолго, пока он печатает
+_searches: TTLCache[int, SearchResult] = TTLCache(ttl=30, max_entries=5_000)
+
+
+async def build_invite_card(event: Mapping[str, Any], bot_username: Optional[str]) -> InlineQueryResultArticle:
+    """Карточка приглашения; вызывается только для владельца ``event``.
+
+    Если действующей ссылки нет, создаёт её, поэтому проверка владельца
+    должна идти раньше.
+    """
+    event_id = event['id']
+    invite = await get_global_repository().get_invite_link(event_id)
+    token = await ensure_invite_token(
+        event_id,
+        invite['token'] if invite else None,
+        invite['expires_at'] if invite else None,
+    )
+    return render_invite_card(event, token, bot_username)
+
+
+async def ensure_invite_token(
+    event_id: int, token: Optional[str], expires_at: Optional[datetime]
+) -> str:
+    """Токен действующей ссылки события; если её нет или она истекла — создаёт новую."""
+    if token and not (expires_at and expires_at <= datetime.now(timezone.utc)):
+        return token
+    invite = await get_global_repository().add_invite_link(
+        event_id=event_id,
+        token=secrets.token_urlsafe(16),
+        max_uses=None,
+        expires_at=None
+    )
+    return invite['token']
+
+
+def render_invite_card(event: Mapping[str, Any], token: str, bot_username: Optional[str]) -> InlineQueryResultArticle:
+    # Форматируем дату
+    settings = get_settings()
+    local_dt = event['starts_at'].astimezone(settings.zoneinfo)
+    date_str = local_dt.strftime("%d.%m.%Y в %H:%M")
+
+    # Формируем текст приглашения
+    invite_text = (
+        f"🎉 <b>Приглашение на событие!</b>\n\n"
+        f"<b>{event['title']}</b>\n\n"
+        f"📅 <b>Когда:</b> {date_str}\n"
+    )
+
+    if event.get('location'):
+        invite_text += f"📍 <b>Где:</b> {event['location']}\n"
+
+    if event.get('notes'):
+        invite_text += f"\n📋 {event['notes']}\n"
+
+    invite_text += "\n👇 Нажми кнопку ниже, чтобы присоединиться!"
+
+    # Создаём кнопку для присоединения
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(
+            text="✅ Присоединиться к событию",
+            url=f"https://t.me/{bot_username}?start=invite_{token}"
+        )]
+    ])
+
+    return InlineQueryResultArticle(
+        id=f"invite_{event['id']}",
+        title=f"🎉 {event['title']}",
+        description=f"Пригласить на событие {date_str}",
+        input_message_content=InputTextMessageContent(
+            message_text=invite_text,
+            parse_mode="HTML"
+        ),
+        reply_markup=keyboard,
+        thumbnail_url="https://telegram.org/img/t_logo.png"
+    )
+
+
+async def card_for_search_row(row: Mapping[str, Any], bot_username: Optional[str]) -> InlineQueryResultArticle:
+    key = (row['id'], row['version'])
+    card = _cards.get(key)
+    if card is None:
+        token = await ensure_invite_token(row['id'], row['token'], row['link_expires_at'])
+        card = render_invite_card(row, token, bot_username)
+        _cards.set(key, card)
+    return card
+
+
+async def search_candidates(tg_id: int, owner_id: int, query: str) -> list[Mapping[str, Any]]:
+    """Найденные события владельца, с переиспользованием результата по префиксу.
+
+    Если по более короткому префиксу найдены все совпадения (не больше
+    ``SEARCH_CANDIDATES``), уточнённый запрос фильтруется в памяти: всё, что
+    содержит ``query``, содержит и префикс. Запомненный результат живёт
+    ``_searches.ttl`` секунд и изменений событий за это время не видит —
+    Telegram всё равно держит ответ на клиенте дольше (``INLINE_CACHE_TIME``).
+    """
+    repo = get_global_repository()
+    cached = _searches.get(tg_id)
+    if cached is not None:
+        if query == cached.query:
+            return cached.rows
+        if cached.complete and query.startswith(cached.query):
+            rows = [row for row in cached.rows if title_matches(query, row['title'])]
+            rows.sort(key=lambda row: (-similarity(row['title'], query), row['starts_at']))
+            return rows
+
+    rows = list(await repo.search_owner_events(owner_id, query, SEARCH_CANDIDATES + 1))
+    complete = len(rows) <= SEARCH_CANDIDATES
+    rows = rows[:SEARCH_CANDIDATES]
+    _searches.set(tg_id, SearchResult(query, rows, complete))
+    return rows
+
+
+async def search_results(
+    inline_query: InlineQuery, bot: Bot, query: str
+) -> tuple[list[InlineQueryResultArticle], str]:
+    """Страница результатов поиска и offset следующей страницы."""
+    user = inline_query.from_user
+    repo = get_global_repository()
+    owner_id = await repo.ensure_user(user.id, user.username, user.full_name)
+    rows = await search_candidates(user.id, owner_id, query)
+
+    start = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    page = rows[start:start + SEARCH_PAGE_SIZE]
+    if not page:
+        return [], ""
+    me = await bot.me()
+    results = [await card_for_search_row(row, me.username) for row in page]
+    end = start + len(page)
+    return results, str(end) if end < len(rows) else ""
+
 
 @inline_router.inline_query()
-async def inline_query_handler(inline_query: InlineQuery) -> None:
-    """Обработчик inline-запросов для приглашений на события."""
+async def inline_query_handler(inline_query: InlineQuery, bot: Bot) -> None:
+    """Обработчик inline-запросов для приглашений на события.
+
+    Карточка события строится один раз на версию события, а владелец
+    проверяется по кэшу пользователей, так что повторный запрос владельца
+    стоит одного чтения события по ключу. Любой другой текст — поиск по
+    названиям предстоящих событий пользователя.
+    """
     user = inline_query.from_user
     query = inline_query.query.strip()
-    
+
     results = []
-    
+    next_offset = ""
+
     # Если запрос начинается с "invite_", показываем конкретное событие
     if query.startswith("invite_"):
         try:
             event_id = int(query.split("_")[1])
+        except (ValueError, IndexError):
+            event_id = None
+
+        if event_id is not None:
             repo = get_global_repository()
+            repo_user_id = await repo.ensure_user(user.id, user.username, user.full_name)
+
             event = await repo.get_event(event_id)
-            
-            if event:
-                # Получаем user_id
-                repo_user_id = await repo.ensure_user(user.id, user.username, user.full_name)
-                
-                # Проверяем, что пользователь - владелец события
-                if event['owner_id'] == repo_user_id:
-                    # Получаем или создаём invite link
-                    invite = await repo.get_invite_link(event_id)
-                    
-                    if not invite:
-                        token = secrets.token_urlsafe(16)
-                        invite = await repo.add_invite_link(
-                            event_id=event_id,
-                            token=token,
-                            max_uses=None,
-                            expires_at=None
-                        )
-                    
-                    # Форматируем дату
-                    settings = get_settings()
-                    local_dt = event['starts_at'].astimezone(settings.zoneinfo)
-                    date_str = local_dt.strftime("%d.%m.%Y в %H:%M")
-                    
-                    # Формируем текст приглашения
-                    invite_text = (
-                        f"🎉 <b>Приглашение на событие!</b>\n\n"
-                        f"<b>{event['title']}</b>\n\n"
-                        f"📅 <b>Когда:</b> {date_str}\n"
-                    )
-                    
-                    if event.get('location'):
-                        invite_text += f"📍 <b>Где:</b> {event['location']}\n"
-                    
-                    if event.get('notes'):
-                        invite_text += f"\n📋 {event['notes']}\n"
-                    
-                    invite_text += "\n👇 Нажми кнопку ниже, чтобы присоединиться!"
-                    
-                    # Создаём кнопку для присоединения
-                    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(
-                            text="✅ Присоединиться к событию",
-                            url=f"https://t.me/{inline_query.bot.username}?start=invite_{invite['token']}"
-                        )]
-                    ])
-                    
-                    # Создаём результат
-                    result = InlineQueryResultArticle(
-                        id=f"invite_{event_id}",
-                        title=f"🎉 {event['title']}",
-                        description=f"Пригласить на событие {date_str}",
-                        input_message_content=InputTextMessageContent(
-                            message_text=invite_text,
-                            parse_mode="HTML"
-                        ),
-                        reply_markup=keyboard,
-                        thumbnail_url="https://telegram.org/img/t_logo.png"
-                    )
-                    
-                    results.append(result)
-        except (ValueError, IndexError):
-            pass
-    
+            # Карточку и ссылку собираем только для владельца события
+            if event and event['owner_id'] == repo_user_id:
+                key = (event_id, event['version'])
+                card = _cards.get(key)
+                if card is None:
+                    me = await bot.me()
+                    card = await build_invite_card(event, me.username)
+                    _cards.set(key, card)
+                results.append(card)
+
+    # Поиск по названию: на первые буквы не ходим в БД вовсе
+    elif len(normalize_query(query)) >= SEARCH_MIN_LENGTH:
+        results, next_offset = await search_results(inline_query, bot, normalize_query(query))
+
     # Отправляем результаты
     await inline_query.answer(
         results,
-        cache_time=10,
-        is_personal=True
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=True,
+        next_offset=next_offset
     )
-
@@ -2,7 +2,31 @@ from __future__ import annotations
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
-from partyshare.state import OWNER_VIEW, PARTICIPANT_VIEW
+from partyshare.callbacks import (
+    CycleStatus,
+    EventListingTab,
+    EventNav,
+    Invite,
+    Manage,
+    ManageCancel,
+    ManageEdit,
+    ManageNotify,
+    ManageRemove,
+    Summary,
+)
+from partyshare.state import (
+    CANCELED_LISTING,
+    OWNER_VIEW,
+    PARTICIPANT_VIEW,
+    PAST_LISTING,
+    UPCOMING_LISTING,
+)
+
+LISTING_TABS = (
+    (UPCOMING_LISTING, "Предстоящие"),
+    (PAST_LISTING, "Прошедшие"),
+    (CANCELED_LISTING, "Отменённые"),
+)
 
 
 def _tabs_row(active_view: str) -> list[InlineKeyboardButton]:
@@ -18,32 +42,46 @@ def _tabs_row(active_view: str) -> list[InlineKeyboardButton]:
     ]
 
 
+def _listing_row(active_listing: str) -> list[InlineKeyboardButton]:
+    return [
+        InlineKeyboardButton(
+            text=f"· {label}" if listing == active_listing else label,
+            callback_data=EventListingTab(listing=listing).pack(),
+        )
+        for listing, label in LISTING_TABS
+    ]
+
+
 def build_events_keyboard(
     active_view: str,
     event_id: int | None,
     *,
+    listing: str = UPCOMING_LISTING,
     status_label: str | None = None,
     has_prev: bool = False,
     has_next: bool = False,
 ) -> InlineKeyboardMarkup:
-    rows: list[list[InlineKeyboardButton]] = [_tabs_row(active_view)]
+    rows: list[list[InlineKeyboardButton]] = [_tabs_row(active_view), _listing_row(listing)]
 
     if event_id is not None:
-        if active_view == OWNER_VIEW:
-            rows.append([InlineKeyboardButton(text="Управлять", callback_data=f"manage:{event_id}")])
+        if listing != UPCOMING_LISTING:
+            # прошедшие и отменённые события только просматривают
+            rows.append([InlineKeyboardButton(text="Сводка", callback_data=Summary(event_id=event_id).pack())])
+        elif active_view == OWNER_VIEW:
+            rows.append([InlineKeyboardButton(text="Управлять", callback_data=Manage(event_id=event_id).pack())])
             rows.append(
                 [
-                    InlineKeyboardButton(text="Сводка", callback_data=f"summary:{event_id}"),
-                    InlineKeyboardButton(text="Пригласить", callback_data=f"invite:{event_id}"),
+                    InlineKeyboardButton(text="Сводка", callback_data=Summary(event_id=event_id).pack()),
+                    InlineKeyboardButton(text="Пригласить", callback_data=Invite(event_id=event_id).pack()),
                 ]
             )
         else:
-            rows.append([InlineKeyboardButton(text="Сводка", callback_data=f"summary:{event_id}")])
+            rows.append([InlineKeyboardButton(text="Сводка", callback_data=Summary(event_id=event_id).pack())])
             rows.append(
                 [
                     InlineKeyboardButton(
                         text=f"Статус: {status_label}" if status_label else "Обновить статус",
-                        callback_data=f"cycle_status:{event_id}",
+                        callback_data=CycleStatus(event_id=event_id).pack(),
                     )
                 ]
             )
@@ -51,11 +89,11 @@ def build_events_keyboard(
         nav_row: list[InlineKeyboardButton] = []
         if has_prev:
             nav_row.append(
-                InlineKeyboardButton(text="« Пред", callback_data=f"event_nav:{active_view}:prev")
+                InlineKeyboardButton(text="« Пред", callback_data=EventNav(view=active_view, direction="prev").pack())
             )
         if has_next:
             nav_row.append(
-                InlineKeyboardButton(text="След »", callback_data=f"event_nav:{active_view}:next")
+                InlineKeyboardButton(text="След »", callback_data=EventNav(view=active_view, direction="next").pack())
             )
         if nav_row:
             rows.append(nav_row)
@@ -66,13 +104,13 @@ def build_events_keyboard(
 def manage_keyboard(event_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="Переименовать", callback_data=f"manage_edit:title:{event_id}")],
-            [InlineKeyboardButton(text="Изменить время", callback_data=f"manage_edit:time:{event_id}")],
-            [InlineKeyboardButton(text="Изменить место", callback_data=f"manage_edit:location:{event_id}")],
-            [InlineKeyboardButton(text="Изменить заметки", callback_data=f"manage_edit:notes:{event_id}")],
-            [InlineKeyboardButton(text="Удалить участника", callback_data=f"manage_remove:{event_id}")],
-            [InlineKeyboardButton(text="Отменить событие", callback_data=f"manage_cancel:{event_id}")],
+            [InlineKeyboardButton(text="Переименовать", callback_data=ManageEdit(field="title", event_id=event_id).pack())],
+            [InlineKeyboardButton(text="Изменить время", callback_data=ManageEdit(field="time", event_id=event_id).pack())],
+            [InlineKeyboardButton(text="Изменить место", callback_data=ManageEdit(field="location", event_id=event_id).pack())],
+            [InlineKeyboardButton(text="Изменить заметки", callback_data=ManageEdit(field="notes", event_id=event_id).pack())],
+            [InlineKeyboardButton(text="Оповестить участников", callback_data=ManageNotify(event_id=event_id).pack())],
+            [InlineKeyboardButton(text="Удалить участника", callback_data=ManageRemove(event_id=event_id).pack())],
+            [InlineKeyboardButton(text="Отменить событие", callback_data=ManageCancel(event_id=event_id).pack())],
             [InlineKeyboardButton(text="Назад", callback_data="manage_back")],
         ]
     )
-
@@ -0,0 +1,120 @@
+"""Выбор лидера для singleton-задач планировщика через advisory-блокировку Postgres."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Optional, Protocol
+
+import asyncpg
+
+from partyshare.logging import get_logger
+from partyshare.metrics import registry
+
+leader_gauge = registry.gauge(
+    "partyshare_scheduler_leader",
+    "1, если процесс держит advisory-блокировку и запускает singleton-задачи",
+)
+leader_transitions = registry.counter(
+    "partyshare_scheduler_leader_transitions_total",
+    "Число смен статуса лидерства",
+)
+
+
+class DedicatedConnectionFactory(Protocol):
+    async def connect_dedicated(self) -> Any: ...
+
+
+class LeaderElector:
+    """Держит сессионную ``pg_try_advisory_lock`` на отдельном соединении.
+
+    Блокировка живёт столько же, сколько соединение: если лидер падает или
+    теряет связь с БД, Postgres снимает её сам, и один из остальных процессов
+    забирает лидерство на следующей попытке.
+    """
+
+    def __init__(
+        self,
+        db: DedicatedConnectionFactory,
+        lock_key: int,
+        *,
+        check_interval: float = 5.0,
+    ) -> None:
+        self._db = db
+        self._lock_key = lock_key
+        self._check_interval = check_interval
+        self._conn: Any = None
+        self._is_leader = False
+        self._task: Optional[asyncio.Task[None]] = None
+        self._log = get_logger(__name__)
+        leader_gauge.set(0)
+
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="leader-elector")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None and not self._conn.is_closed():
+            if self._is_leader:
+                try:
+                    await self._conn.execute("SELECT pg_advisory_unlock($1)", self._lock_key)
+                except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                    pass
+            await self._conn.close()
+        self._conn = None
+        self._set_leader(False)
+
+    async def step(self) -> bool:
+        """Одна итерация: (пере)подключиться, захватить блокировку или проверить соединение."""
+        try:
+            if self._conn is None or self._conn.is_closed():
+                self._set_leader(False)
+                self._conn = await self._db.connect_dedicated()
+                self._conn.add_termination_listener(self._on_connection_lost)
+            if self._is_leader:
+                await self._conn.fetchval("SELECT 1", timeout=self._check_interval)
+            else:
+                acquired = await self._conn.fetchval(
+                    "SELECT pg_try_advisory_lock($1)",
+                    self._lock_key,
+                    timeout=self._check_interval,
+                )
+                self._set_leader(bool(acquired))
+        except (OSError, TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+            self._log.warning("leader.connection.error", error=str(exc))
+            await self._drop_connection()
+        return self._is_leader
+
+    async def _run(self) -> None:
+        while True:
+            await self.step()
+            await asyncio.sleep(self._check_interval)
+
+    def _on_connection_lost(self, connection: Any) -> None:
+        if connection is self._conn:
+            self._conn = None
+            self._set_leader(False)
+
+    async def _drop_connection(self) -> None:
+        conn, self._conn = self._conn, None
+        self._set_leader(False)
+        if conn is not None:
+            conn.terminate()
+
+    def _set_leader(self, value: bool) -> None:
+        if value == self._is_leader:
+            return
+        self._is_leader = value
+        leader_gauge.set(1 if value else 0)
+        leader_transitions.inc()
+        self._log.info("leader.acquired" if value else "leader.lost", lock_key=self._lock_key)
@@ -0,0 +1,14 @@
+from partyshare.middlewares.early_ack import EARLY_ACK, EarlyAckMiddleware, answer_once
+from partyshare.middlewares.ordering import OrderingMiddleware
+from partyshare.middlewares.state import StateMiddleware
+from partyshare.middlewares.throttle import DEFAULT_RATE_LIMITS, ThrottleMiddleware
+
+__all__ = [
+    "DEFAULT_RATE_LIMITS",
+    "EARLY_ACK",
+    "EarlyAckMiddleware",
+    "OrderingMiddleware",
+    "StateMiddleware",
+    "ThrottleMiddleware",
+    "answer_once",
+]
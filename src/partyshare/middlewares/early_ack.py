@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, TelegramObject
+
+from partyshare.logging import get_logger
+from partyshare.metrics import registry
+from partyshare.services.authz import AuthorizationError
+
+EARLY_ACK = "early_ack"
+
+callback_ack_seconds = registry.histogram(
+    "partyshare_callback_ack_seconds",
+    "Время от получения callback до ответа Telegram (спиннер пропал)",
+)
+callback_done_seconds = registry.histogram(
+    "partyshare_callback_done_seconds",
+    "Время от получения callback до окончания обработки (итоговое сообщение)",
+)
+callback_errors = registry.counter("partyshare_callback_errors_total", "Ошибки фоновой обработки callback")
+
+# id callback-запросов, на которые уже ответили заранее
+_acked: set[str] = set()
+
+
+async def answer_once(callback: CallbackQuery, text: Optional[str] = None, show_alert: bool = False) -> None:
+    """``callback.answer`` для обработчиков с ранним ответом.
+
+    Если на запрос уже ответил ``EarlyAckMiddleware``, повторно ответить
+    Telegram не даст, поэтому текст уходит обычным сообщением.
+    """
+    if callback.id not in _acked:
+        await callback.answer(text, show_alert=show_alert)
+    elif text and callback.message and callback.bot:
+        await callback.bot.send_message(callback.message.chat.id, text)
+
+
+class EarlyAckMiddleware(BaseMiddleware):
+    """Сразу отвечает на callback обработчиков с флагом ``early_ack``.
+
+    Флаг берётся из маршрута таблицы callback-ов (``callbacks.exact(...,
+    early_ack=True)``), а для обычных обработчиков — из флагов aiogram.
+
+    Сам обработчик выполняется в отдельной задаче с ограничением
+    параллельности и ожидается через ``asyncio.shield``, так что очередь
+    апдейтов пользователя сохраняет порядок, а отмена апдейта не обрывает
+    начатую работу. Отказ в доступе (``AuthorizationError``) пользователь
+    получает текстом ошибки; остальные ошибки логируются, а пользователю
+    уходит общее сообщение.
+    """
+
+    def __init__(self, *, max_concurrency: int = 16) -> None:
+        self._limit = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task[Any]] = set()
+        self._log = get_logger(__name__)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, CallbackQuery):
+            return await handler(event, data)
+        route = data.get("callback_route")
+        if route is not None:
+            early_ack, name = route.early_ack, route.name
+        else:
+            early_ack, name = bool(get_flag(data, EARLY_ACK)), data["handler"].callback.__name__
+        if not early_ack:
+            return await handler(event, data)
+
+        received_at = data.get("update_received_at", time.monotonic())
+        try:
+            await event.answer()
+        except TelegramBadRequest as exc:
+            # Запрос устарел (бот долго стоял в очереди) — работу всё равно делаем
+            self._log.warning("callback.ack.failed", handler=name, error=str(exc))
+        else:
+            _acked.add(event.id)
+        callback_ack_seconds.observe(time.monotonic() - received_at, handler=name)
+
+        task = asyncio.create_task(self._run(handler, event, data, name, received_at))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return await asyncio.shield(task)
+
+    async def _run(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: dict[str, Any],
+        name: str,
+        received_at: float,
+    ) -> Any:
+        try:
+            async with self._limit:
+                return await handler(event, data)
+        except AuthorizationError as exc:
+            # ожидаемый отказ, а не сбой: ни метрики ошибок, ни трассировки
+            self._log.info("callback.work.denied", handler=name, data=event.data)
+            await self._notify(event, str(exc))
+            return None
+        except Exception:
+            callback_errors.inc(handler=name)
+            self._log.exception("callback.work.error", handler=name, data=event.data)
+            await self._notify(event, "⚠️ Не удалось выполнить действие, попробуйте ещё раз.")
+            return None
+        finally:
+            _acked.discard(event.id)
+            callback_done_seconds.observe(time.monotonic() - received_at, handler=name)
+
+    @staticmethod
+    async def _notify(event: CallbackQuery, text: str) -> None:
+        # на callback уже ответили, поэтому текст уходит обычным сообщением
+        if event.message and event.bot:
+            await event.bot.send_message(event.message.chat.id, text)
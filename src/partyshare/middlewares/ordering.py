@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from partyshare.metrics import registry
+from partyshare.utils.locks import KeyedLock
+
+# Действия владельца, которые меняют событие: их выполняем по одному на событие
+OWNER_EVENT_ACTIONS = frozenset(
+    {"manage", "manage_edit", "manage_notify", "manage_cancel", "manage_remove", "owner"}
+)
+
+updates_waiting = registry.gauge("partyshare_updates_waiting", "Апдейты в очереди на выполнение")
+updates_running = registry.gauge("partyshare_updates_running", "Апдейты в обработке")
+update_wait_seconds = registry.histogram(
+    "partyshare_update_wait_seconds",
+    "Ожидание очереди пользователя/события и общего лимита",
+)
+
+
+def owner_event_id(event: TelegramObject) -> Optional[int]:
+    """id события для callback-действий владельца, иначе ``None``."""
+    callback = getattr(event, "callback_query", None)
+    data = getattr(callback, "data", None)
+    if not data or ":" not in data:
+        return None
+    action, _, tail = data.partition(":")
+    if action not in OWNER_EVENT_ACTIONS:
+        return None
+    raw_event_id = tail.rpartition(":")[2]
+    return int(raw_event_id) if raw_event_id.isdigit() else None
+
+
+class OrderingMiddleware(BaseMiddleware):
+    """Апдейты одного пользователя выполняются строго по очереди, разных — параллельно.
+
+    Действия владельца над событием дополнительно упорядочены по событию
+    (блокировка события берётся после блокировки пользователя, поэтому
+    взаимных блокировок нет). Одновременно выполняется не больше
+    ``max_concurrency`` апдейтов.
+    """
+
+    def __init__(self, *, max_concurrency: int = 64) -> None:
+        self._users = KeyedLock()
+        self._events = KeyedLock()
+        self._limit = asyncio.Semaphore(max_concurrency)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        started = time.monotonic()
+        data["update_received_at"] = started
+        updates_waiting.inc()
+        waiting = True
+        try:
+            async with AsyncExitStack() as stack:
+                user = data.get("event_from_user")
+                if user is not None:
+                    await stack.enter_async_context(self._users.hold(user.id))
+                event_id = owner_event_id(event)
+                if event_id is not None:
+                    await stack.enter_async_context(self._events.hold(event_id))
+                await stack.enter_async_context(self._limit)
+
+                updates_waiting.dec()
+                waiting = False
+                update_wait_seconds.observe(time.monotonic() - started)
+                updates_running.inc()
+                try:
+                    return await handler(event, data)
+                finally:
+                    updates_running.dec()
+        finally:
+            if waiting:
+                updates_waiting.dec()
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from partyshare.state import UserStateManager
+
+
+class StateMiddleware(BaseMiddleware):
+    """Подгружает состояние пользователя до обработчика и сохраняет после."""
+
+    def __init__(self, manager: UserStateManager) -> None:
+        self._manager = manager
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        storage = self._manager.storage
+        await storage.load(user.id)
+        try:
+            return await handler(event, data)
+        finally:
+            await storage.flush(user.id)
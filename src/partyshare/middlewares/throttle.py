@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import TelegramObject, Update
+
+from partyshare.logging import get_logger
+from partyshare.metrics import registry
+from partyshare.utils.ratelimit import KeyedTokenBucket
+
+# Класс действия -> (токенов в секунду, размер пачки)
+DEFAULT_RATE_LIMITS: dict[str, tuple[float, int]] = {
+    "nav": (2.0, 8),
+    "status": (2.0, 8),
+    "callback": (1.0, 6),
+    "command": (0.5, 5),
+    "message": (1.0, 10),
+    "inline": (2.0, 10),
+}
+
+NAV_CALLBACKS = (
+    "event_nav:",
+    "myevents_owner",
+    "myevents_participant",
+    "myevents_listing:",
+    "menu:myevents",
+)
+
+CALLBACK_NOTICE = "⏳ Слишком часто, подождите пару секунд"
+MESSAGE_NOTICE = "⏳ Слишком много сообщений подряд, подождите немного"
+
+updates_throttled = registry.counter(
+    "partyshare_updates_throttled_total", "Апдейты, отклонённые ограничением частоты"
+)
+
+
+def rate_class(update: Update) -> Optional[str]:
+    """Класс действия для ограничения частоты; ``None`` — не ограничивается."""
+    if update.callback_query is not None:
+        data = update.callback_query.data or ""
+        if data.startswith(NAV_CALLBACKS):
+            return "nav"
+        if data.startswith("cycle_status:"):
+            return "status"
+        return "callback"
+    if update.message is not None:
+        text = update.message.text or ""
+        return "command" if text.startswith("/") else "message"
+    if update.inline_query is not None:
+        return "inline"
+    return None
+
+
+class ThrottleMiddleware(BaseMiddleware):
+    """Ограничивает частоту действий пользователя отдельно по каждому классу.
+
+    Лишний апдейт сразу получает короткий ответ и до обработчиков (и БД) не
+    доходит. Подключается как внешний middleware апдейтов
+    (``dp.update.outer_middleware``) и получает ``Update`` целиком.
+
+    Корзины живут в памяти процесса; при ``WORKER_PROCESSES > 1`` все апдейты
+    пользователя попадают в один воркер, поэтому лимит считается целиком, а
+    не делится между процессами. Это верно в пределах одного экземпляра бота
+    (polling или вебхук): если несколько экземпляров принимают вебхук за
+    балансировщиком, каждый считает свои корзины, и пользователь получает
+    лимит, умноженный на число экземпляров.
+    """
+
+    def __init__(
+        self,
+        limits: Mapping[str, tuple[float, int]] = DEFAULT_RATE_LIMITS,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._buckets = {
+            kind: KeyedTokenBucket(rate, burst, clock=clock) for kind, (rate, burst) in limits.items()
+        }
+        # (класс, пользователь), кому уже написали о лимите сообщением
+        self._warned: set[tuple[str, int]] = set()
+        self._log = get_logger(__name__)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if not isinstance(event, Update) or user is None:
+            return await handler(event, data)
+        kind = rate_class(event)
+        bucket = self._buckets.get(kind) if kind is not None else None
+        if kind is None or bucket is None:
+            return await handler(event, data)
+
+        if bucket.take(user.id):
+            if self._warned:
+                self._warned.discard((kind, user.id))
+            return await handler(event, data)
+
+        updates_throttled.inc(kind=kind)
+        try:
+            await self._reject(data["bot"], event, kind, user.id)
+        except TelegramAPIError as exc:
+            self._log.warning("throttle.notice.failed", kind=kind, error=str(exc))
+        return None
+
+    async def _reject(self, bot: Bot, update: Update, kind: str, user_id: int) -> None:
+        if update.callback_query is not None:
+            # Ответ на callback нужен в любом случае, иначе у кнопки висит спиннер
+            await bot.answer_callback_query(update.callback_query.id, CALLBACK_NOTICE)
+        elif update.inline_query is not None:
+            await bot.answer_inline_query(update.inline_query.id, results=[], cache_time=1, is_personal=True)
+        elif update.message is not None and (kind, user_id) not in self._warned:
+            # О лимите на сообщения пишем один раз, а не в ответ на каждое
+            if len(self._warned) >= 10_000:
+                self._warned.clear()
+            self._warned.add((kind, user_id))
+            await bot.send_message(update.message.chat.id, MESSAGE_NOTICE)
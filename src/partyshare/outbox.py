@@ -0,0 +1,271 @@
+"""Очередь исходящих сообщений Telegram в Postgres и пул воркеров для её разбора."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from enum import IntEnum
+from typing import Any, Iterable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+)
+from aiogram.types import InlineKeyboardMarkup
+
+from partyshare.db.repo import PartyShareRepository
+from partyshare.logging import get_logger
+from partyshare.metrics import registry
+from partyshare.utils.ratelimit import AsyncRateLimiter
+
+SEND_MESSAGE = "send_message"
+EDIT_MESSAGE_TEXT = "edit_message_text"
+
+outbox_delivered = registry.counter("partyshare_outbox_delivered_total", "Доставленные сообщения")
+outbox_retried = registry.counter("partyshare_outbox_retried_total", "Отложенные повторные попытки")
+outbox_dead = registry.counter("partyshare_outbox_dead_total", "Сообщения, ушедшие в dead letter")
+outbox_lag = registry.histogram(
+    "partyshare_outbox_delivery_lag_seconds",
+    "Время от постановки в очередь до доставки",
+)
+
+
+class Priority(IntEnum):
+    """Меньшее значение разбирается раньше."""
+
+    INTERACTIVE = 0
+    NORMAL = 10
+    BULK = 20
+
+
+@dataclass(slots=True)
+class OutboxMessage:
+    chat_id: int
+    text: str
+    priority: Priority = Priority.NORMAL
+    idempotency_key: Optional[str] = None
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+    method: str = SEND_MESSAGE
+    message_id: Optional[int] = None
+    batch_key: Optional[str] = None
+
+    def payload(self) -> str:
+        data: dict[str, Any] = {"text": self.text}
+        if self.reply_markup is not None:
+            data["reply_markup"] = self.reply_markup.model_dump(exclude_none=True)
+        if self.message_id is not None:
+            data["message_id"] = self.message_id
+        return json.dumps(data, ensure_ascii=False)
+
+
+class Outbox:
+    def __init__(self, repo: PartyShareRepository) -> None:
+        self._repo = repo
+        self.wakeup = asyncio.Event()
+
+    async def enqueue(self, message: OutboxMessage) -> bool:
+        """Возвращает ``False``, если сообщение с таким ключом уже было в очереди."""
+        outbox_id = await self._repo.enqueue_outbox(
+            message.chat_id,
+            message.method,
+            message.payload(),
+            int(message.priority),
+            message.idempotency_key,
+            message.batch_key,
+        )
+        self.wakeup.set()
+        return outbox_id is not None
+
+    async def enqueue_many(self, messages: Iterable[OutboxMessage]) -> int:
+        batch = list(messages)
+        if not batch:
+            return 0
+        inserted = await self._repo.enqueue_outbox_many(
+            [m.chat_id for m in batch],
+            [m.method for m in batch],
+            [m.payload() for m in batch],
+            [int(m.priority) for m in batch],
+            [m.idempotency_key for m in batch],
+            [m.batch_key for m in batch],
+        )
+        self.wakeup.set()
+        return inserted
+
+    async def send(
+        self,
+        chat_id: int,
+        text: str,
+        *,
+        priority: Priority = Priority.NORMAL,
+        idempotency_key: Optional[str] = None,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+    ) -> bool:
+        return await self.enqueue(
+            OutboxMessage(
+                chat_id=chat_id,
+                text=text,
+                priority=priority,
+                idempotency_key=idempotency_key,
+                reply_markup=reply_markup,
+            )
+        )
+
+
+class OutboxWorker:
+    """Пул воркеров, доставляющих сообщения из очереди.
+
+    Порядок — по приоритету, затем по времени постановки. Перед каждой
+    отправкой воркер продлевает аренду сообщения и пропускает его, если
+    аренду уже перехватили. ``retry_after`` от Telegram приостанавливает весь
+    пул, а остаток захваченной пачки возвращается в очередь до конца паузы,
+    чтобы его не забрали и не отправили повторно. Сетевые ошибки повторяются с
+    экспоненциальной задержкой, а после ``max_attempts`` или при ошибке,
+    которую повтор не исправит (бот заблокирован, чат не найден), сообщение
+    уходит в dead letter.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        repo: PartyShareRepository,
+        outbox: Outbox,
+        *,
+        concurrency: int = 4,
+        batch_size: int = 10,
+        poll_interval: float = 1.0,
+        max_attempts: int = 5,
+        lease_seconds: float = 60.0,
+        rate_limit: float = 25.0,
+    ) -> None:
+        self._bot = bot
+        self._repo = repo
+        self._outbox = outbox
+        self._concurrency = concurrency
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._max_attempts = max_attempts
+        self._lease_seconds = lease_seconds
+        self._limiter = AsyncRateLimiter(rate_limit)
+        self._tasks: list[asyncio.Task[None]] = []
+        self._log = get_logger(__name__)
+
+    async def start(self) -> None:
+        for idx in range(self._concurrency):
+            self._tasks.append(asyncio.create_task(self._run(), name=f"outbox-worker-{idx}"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def process_batch(self) -> int:
+        rows = await self._repo.claim_outbox(self._batch_size, self._lease_seconds)
+        for idx, row in enumerate(rows):
+            retry_after = await self._deliver(row)
+            if retry_after is not None:
+                rest = rows[idx + 1 :]
+                if rest:
+                    await self._repo.release_outbox(
+                        [r["id"] for r in rest], [r["attempts"] for r in rest], retry_after
+                    )
+                break
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await self.process_batch()
+            except Exception:
+                self._log.exception("outbox.batch.error")
+                processed = 0
+            if processed:
+                continue
+            self._outbox.wakeup.clear()
+            try:
+                await asyncio.wait_for(self._outbox.wakeup.wait(), self._poll_interval)
+            except TimeoutError:
+                pass
+
+    async def _deliver(self, row: Any) -> Optional[float]:
+        """Отправляет сообщение; возвращает ``retry_after``, если Telegram попросил паузу."""
+        await self._limiter.acquire()
+        # ожидание в лимитере могло пережить аренду
+        if not await self._repo.renew_outbox_lease(row["id"], row["attempts"], self._lease_seconds):
+            self._log.info("outbox.lease.lost", outbox_id=row["id"])
+            return None
+        try:
+            await self._call(row)
+        except TelegramRetryAfter as exc:
+            self._limiter.pause(exc.retry_after)
+            outbox_retried.inc(reason="retry_after")
+            await self._repo.retry_outbox(row["id"], row["attempts"], float(exc.retry_after), str(exc))
+            return float(exc.retry_after)
+        except TelegramBadRequest as exc:
+            if "message is not modified" in str(exc):
+                await self._mark_sent(row)
+            else:
+                await self._dead_letter(row, exc)
+        except (TelegramForbiddenError, TelegramNotFound) as exc:
+            await self._dead_letter(row, exc)
+        except Exception as exc:
+            if row["attempts"] >= self._max_attempts:
+                await self._dead_letter(row, exc)
+            else:
+                outbox_retried.inc(reason="error")
+                delay = float(2 ** row["attempts"])
+                self._log.warning("outbox.retry", outbox_id=row["id"], delay=delay, error=str(exc))
+                await self._repo.retry_outbox(row["id"], row["attempts"], delay, str(exc))
+        else:
+            await self._mark_sent(row)
+        return None
+
+    async def _call(self, row: Any) -> None:
+        payload = row["payload"]
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        markup = payload.get("reply_markup")
+        reply_markup = InlineKeyboardMarkup.model_validate(markup) if markup else None
+        if row["method"] == EDIT_MESSAGE_TEXT:
+            await self._bot.edit_message_text(
+                text=payload["text"],
+                chat_id=row["chat_id"],
+                message_id=payload["message_id"],
+                reply_markup=reply_markup,
+            )
+        else:
+            await self._bot.send_message(row["chat_id"], payload["text"], reply_markup=reply_markup)
+
+    async def _mark_sent(self, row: Any) -> None:
+        if not await self._repo.mark_outbox_sent(row["id"], row["attempts"]):
+            # аренда истекла во время отправки: строкой уже владеет другой воркер
+            self._log.info("outbox.lease.lost", outbox_id=row["id"])
+            return
+        outbox_delivered.inc(priority=row["priority"])
+        created_at = row["created_at"]
+        if created_at is not None:
+            outbox_lag.observe((datetime.now(timezone.utc) - created_at).total_seconds())
+
+    async def _dead_letter(self, row: Any, exc: Exception) -> None:
+        outbox_dead.inc()
+        self._log.warning("outbox.dead", outbox_id=row["id"], chat_id=row["chat_id"], error=str(exc))
+        await self._repo.dead_letter_outbox(row["id"], row["attempts"], str(exc))
+
+
+_global_outbox: Outbox | None = None
+
+
+def set_global_outbox(outbox: Outbox) -> None:
+    global _global_outbox
+    _global_outbox = outbox
+
+
+def get_global_outbox() -> Outbox:
+    if _global_outbox is None:
+        raise RuntimeError("Очередь исходящих сообщений не инициализирована")
+    return _global_outbox
@@ -1,43 +1,353 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from typing import Any, Awaitable, Callable, Optional
 
-from aiogram import Bot
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
 from partyshare.config import get_settings
 from partyshare.db.repo import PartyShareRepository
+from partyshare.leader import LeaderElector
 from partyshare.logging import get_logger
+from partyshare.metrics import registry
+from partyshare.outbox import Outbox, OutboxMessage, Priority
+from partyshare.services.digest import iter_digests
 
+Job = Callable[..., Awaitable[None]]
 
-async def setup_scheduler(bot: Bot, repo: PartyShareRepository) -> AsyncIOScheduler:
+reminder_backlog = registry.gauge(
+    "partyshare_reminder_backlog",
+    "Просроченные напоминания, ожидающие отправки",
+)
+reminder_drain_rate = registry.gauge(
+    "partyshare_reminder_drain_rate",
+    "Скорость разбора напоминаний за последний запуск, шт/с",
+)
+reminder_catchup_gauge = registry.gauge(
+    "partyshare_reminder_catchup",
+    "1, пока задача напоминаний догоняет накопившуюся очередь",
+)
+reminders_sent = registry.counter("partyshare_reminders_sent_total", "Отправленные напоминания")
+events_archived = registry.counter(
+    "partyshare_events_archived_total",
+    "События, перенесённые в архивные таблицы",
+)
+retention_deleted = registry.counter(
+    "partyshare_retention_deleted_total",
+    "Строки, удалённые очисткой по сроку хранения",
+)
+reminders_dropped = registry.counter(
+    "partyshare_reminders_dropped_total",
+    "Напоминания о начавшихся или отменённых событиях, снятые без отправки",
+)
+
+
+@dataclass(slots=True)
+class CatchUpState:
+    active: bool = False
+    started_at: float = 0.0
+    drained: int = 0
+
+
+_catchup = CatchUpState()
+
+
+async def setup_scheduler(
+    repo: PartyShareRepository,
+    outbox: Outbox,
+    leader: Optional[LeaderElector] = None,
+) -> AsyncIOScheduler:
     settings = get_settings()
 
     scheduler = AsyncIOScheduler(timezone=settings.tz)
-    scheduler.add_job(
+    add_singleton_job(
+        scheduler,
+        leader,
         _reminder_job,
         IntervalTrigger(minutes=1),
-        kwargs={"bot": bot, "repo": repo},
+        kwargs={
+            "repo": repo,
+            "outbox": outbox,
+            "batch_size": settings.reminder_batch_size,
+        },
+        max_instances=1,
+        coalesce=True,
+    )
+    add_singleton_job(
+        scheduler,
+        leader,
+        _digest_job,
+        CronTrigger(hour=settings.digest_hour, timezone=settings.tz),
+        kwargs={"repo": repo, "outbox": outbox, "batch_size": settings.digest_batch_size},
+        max_instances=1,
+        coalesce=True,
+    )
+    add_singleton_job(
+        scheduler,
+        leader,
+        _archive_job,
+        CronTrigger(hour=4, timezone=settings.tz),
+        kwargs={
+            "repo": repo,
+            # долги из дайджеста должны оставаться в горячих таблицах
+            "after_days": max(settings.archive_after_days, settings.digest_debt_days + 1),
+            "batch_size": settings.archive_batch_size,
+        },
+        max_instances=1,
+        coalesce=True,
     )
+    add_singleton_job(
+        scheduler,
+        leader,
+        _retention_job,
+        IntervalTrigger(hours=1),
+        kwargs={
+            "repo": repo,
+            "link_days": settings.retention_link_days,
+            "reminder_days": settings.retention_reminder_days,
+            "canceled_days": settings.retention_canceled_days,
+            "outbox_days": settings.retention_outbox_days,
+            "batch_size": settings.retention_batch_size,
+            "pause": settings.retention_pause,
+        },
+        max_instances=1,
+        coalesce=True,
+    )
+    if settings.state_backend != "memory":
+        add_singleton_job(
+            scheduler,
+            leader,
+            _purge_state_job,
+            IntervalTrigger(hours=1),
+            kwargs={"repo": repo, "ttl": settings.state_ttl},
+            max_instances=1,
+            coalesce=True,
+        )
     scheduler.start()
     return scheduler
 
 
-async def _reminder_job(bot: Bot, repo: PartyShareRepository) -> None:
+def add_singleton_job(
+    scheduler: AsyncIOScheduler,
+    leader: Optional[LeaderElector],
+    job: Job,
+    trigger: BaseTrigger,
+    **job_kwargs: Any,
+) -> None:
+    """Регистрирует задачу, которая выполняется только в процессе-лидере.
+
+    Без ``leader`` (один процесс) задача выполняется всегда.
+    """
+    scheduler.add_job(
+        _only_on_leader(job, leader),
+        trigger,
+        id=job.__name__,
+        name=job.__name__,
+        **job_kwargs,
+    )
+
+
+def _only_on_leader(job: Job, leader: Optional[LeaderElector]) -> Job:
+    @wraps(job)
+    async def runner(*args: Any, **kwargs: Any) -> None:
+        if leader is not None and not leader.is_leader:
+            get_logger(__name__).debug("scheduler.job.skip_not_leader", job=job.__name__)
+            return
+        await job(*args, **kwargs)
+
+    return runner
+
+
+async def _reminder_job(
+    repo: PartyShareRepository,
+    outbox: Outbox,
+    batch_size: int = 50,
+) -> None:
+    """Ставит в очередь отправки не больше ``batch_size`` напоминаний за запуск.
+
+    После простоя очередь разбирается порциями по минутным тикам (режим
+    догоняющей обработки), а напоминания о событиях, которые уже начались,
+    снимаются без отправки. Темп доставки задаёт воркер исходящей очереди.
+    """
     log = get_logger(__name__)
     now = datetime.now(timezone.utc)
-    rows = await repo.fetch_pending_reminders(now)
+
+    stale = await repo.drop_stale_reminders(now)
+    if stale:
+        reminders_dropped.inc(len(stale))
+        log.warning(
+            "reminder.drop_stale",
+            count=len(stale),
+            event_ids=sorted({row["event_id"] for row in stale}),
+        )
+
+    backlog = await repo.count_pending_reminders(now)
+    reminder_backlog.set(backlog)
+    if backlog > batch_size and not _catchup.active:
+        _catchup.active = True
+        _catchup.started_at = time.monotonic()
+        _catchup.drained = 0
+        reminder_catchup_gauge.set(1)
+        log.warning("reminder.catchup.start", backlog=backlog, batch_size=batch_size)
+
+    if backlog == 0:
+        _finish_catchup()
+        return
+
+    started = time.monotonic()
+    rows = await repo.fetch_pending_reminders(now, limit=batch_size)
 
     for row in rows:
         log.info("reminder.send", reminder_id=row["id"])
         participants = await repo.get_event_participants(row["event_id"])
-        for participant in participants:
-            tg_id = participant["tg_id"]
-            if tg_id:
-                await bot.send_message(
-                    tg_id,
-                    f"Напоминание о событии #{row['event_id']}: {row['title']} начинается {row['starts_at']}",
-                )
+        await outbox.enqueue_many(
+            OutboxMessage(
+                chat_id=participant["tg_id"],
+                text=f"Напоминание о событии #{row['event_id']}: {row['title']} начинается {row['starts_at']}",
+                priority=Priority.BULK,
+                idempotency_key=f"reminder:{row['id']}:{participant['tg_id']}",
+            )
+            for participant in participants
+            if participant["tg_id"]
+        )
         await repo.mark_reminder_sent(row["id"])
+        reminders_sent.inc()
 
+    elapsed = time.monotonic() - started
+    rate = len(rows) / elapsed if elapsed > 0 else float(len(rows))
+    remaining = max(backlog - len(rows), 0)
+    reminder_drain_rate.set(rate)
+    reminder_backlog.set(remaining)
+    log.info(
+        "reminder.batch",
+        processed=len(rows),
+        backlog=remaining,
+        drain_rate=round(rate, 2),
+        catchup=_catchup.active,
+    )
+
+    if _catchup.active:
+        _catchup.drained += len(rows)
+        if remaining == 0:
+            _finish_catchup()
+
+
+async def _digest_job(repo: PartyShareRepository, outbox: Outbox, batch_size: int = 200) -> None:
+    """Ежедневный дайджест для всех подписчиков за один проход курсора.
+
+    Строки приходят одним запросом, сгруппированными по ``tg_id``; готовые
+    дайджесты ставятся в исходящую очередь порциями по ``batch_size``.
+    """
+    settings = get_settings()
+    log = get_logger(__name__)
+    started = time.monotonic()
+    now = datetime.now(timezone.utc)
+    day = now.astimezone(settings.zoneinfo).date().isoformat()
+
+    rows = repo.iter_digest_rows(
+        now,
+        now + timedelta(days=settings.digest_days),
+        now - timedelta(days=settings.digest_debt_days),
+    )
+    batch: list[OutboxMessage] = []
+    users = 0
+    async for tg_id, text in iter_digests(rows, settings.zoneinfo):
+        batch.append(
+            OutboxMessage(
+                chat_id=tg_id,
+                text=text,
+                priority=Priority.BULK,
+                idempotency_key=f"digest:{day}:{tg_id}",
+            )
+        )
+        if len(batch) >= batch_size:
+            await outbox.enqueue_many(batch)
+            users += len(batch)
+            batch = []
+    if batch:
+        await outbox.enqueue_many(batch)
+        users += len(batch)
+
+    log.info("digest.enqueued", users=users, duration_s=round(time.monotonic() - started, 2))
+
+
+async def _archive_job(repo: PartyShareRepository, after_days: int, batch_size: int) -> None:
+    """Переносит прошедшие события в архив порциями, каждая — отдельной транзакцией."""
+    started = time.monotonic()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=after_days)
+    total = 0
+    while True:
+        moved = await repo.archive_events(cutoff, batch_size)
+        total += moved
+        events_archived.inc(moved)
+        if moved < batch_size:
+            break
+    if total:
+        get_logger(__name__).info(
+            "archive.done", events=total, duration_s=round(time.monotonic() - started, 2)
+        )
+
+
+async def _retention_job(
+    repo: PartyShareRepository,
+    link_days: int,
+    reminder_days: int,
+    canceled_days: int,
+    outbox_days: int,
+    batch_size: int,
+    pause: float,
+) -> None:
+    """Удаляет устаревшие строки порциями по ``batch_size`` с паузой между ними.
+
+    Короткие транзакции и паузы не дают очистке надолго держать блокировки
+    и выбрасывать в WAL всё разом.
+    """
+    started = time.monotonic()
+    now = datetime.now(timezone.utc)
+    targets = {
+        "invite_links": (repo.purge_expired_invite_links, now - timedelta(days=link_days)),
+        "reminders": (repo.purge_sent_reminders, now - timedelta(days=reminder_days)),
+        "canceled_events": (repo.purge_canceled_events, now - timedelta(days=canceled_days)),
+        "outbox": (repo.purge_sent_outbox, now - timedelta(days=outbox_days)),
+    }
+    removed: dict[str, int] = {}
+    for kind, (purge, cutoff) in targets.items():
+        total = 0
+        while True:
+            deleted = await purge(cutoff, batch_size)
+            total += deleted
+            retention_deleted.inc(deleted, kind=kind)
+            if deleted < batch_size:
+                break
+            await asyncio.sleep(pause)
+        removed[kind] = total
+    get_logger(__name__).info(
+        "retention.done", duration_s=round(time.monotonic() - started, 2), **removed
+    )
+
+
+async def _purge_state_job(repo: PartyShareRepository, ttl: float) -> None:
+    removed = await repo.purge_user_state(ttl)
+    if removed:
+        get_logger(__name__).info("state.purge", removed=removed)
+
+
+def _finish_catchup() -> None:
+    if not _catchup.active:
+        return
+    duration = time.monotonic() - _catchup.started_at
+    get_logger(__name__).info(
+        "reminder.catchup.done",
+        drained=_catchup.drained,
+        duration_s=round(duration, 1),
+        avg_rate=round(_catchup.drained / duration, 2) if duration > 0 else None,
+    )
+    _catchup.active = False
+    reminder_catchup_gauge.set(0)
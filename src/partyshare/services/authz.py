@@ -24,9 +24,13 @@ async def assert_event_owner(repo: Repository, user_id: int, event_id: int) -> N
         raise AuthorizationError("Только владелец события может выполнять это действие.")
 
 
-async def assert_event_participant(repo: Repository, user_id: int, event_id: int) -> None:
+async def assert_event_participant(
+    repo: Repository, user_id: int, event_id: int, *, include_archived: bool = False
+) -> None:
+    """``include_archived`` — только для чтения истории: в архивное событие писать нельзя."""
+    table = "all_event_participants" if include_archived else "event_participants"
     participant_id = await repo.fetchval(
-        "SELECT user_id FROM event_participants WHERE event_id = $1 AND user_id = $2",
+        f"SELECT user_id FROM {table} WHERE event_id = $1 AND user_id = $2",
         event_id,
         user_id,
     )
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Sequence
+from zoneinfo import ZoneInfo
+
+from partyshare.db.models import ParticipantStatus
+from partyshare.services.events import humanize_status
+
+
+def render_digest(rows: Sequence[Any], tz: ZoneInfo) -> str:
+    events = [row for row in rows if row["kind"] == "event"]
+    debts = [row for row in rows if row["kind"] == "debt"]
+
+    lines = ["☀️ <b>Дайджест PartyShare</b>"]
+    if events:
+        lines.append("\n📅 <b>Ближайшие события:</b>")
+        for row in events:
+            when = row["starts_at"].astimezone(tz).strftime("%d.%m %H:%M")
+            line = f"• {when} — {row['title']}"
+            if row["status"]:
+                line += f" ({humanize_status(ParticipantStatus(row['status']))})"
+            lines.append(line)
+    if debts:
+        lines.append("\n💰 <b>Незакрытые расчёты:</b>")
+        for row in debts:
+            amount = abs(row["balance_cents"]) / 100
+            if row["balance_cents"] < 0:
+                lines.append(f"• {row['title']}: ты должен {amount:.2f} EUR")
+            else:
+                lines.append(f"• {row['title']}: тебе должны {amount:.2f} EUR")
+    return "\n".join(lines)
+
+
+async def iter_digests(rows: AsyncIterator[Any], tz: ZoneInfo) -> AsyncIterator[tuple[int, str]]:
+    """Собирает дайджесты из потока строк, упорядоченного по ``tg_id``.
+
+    В памяти держатся только строки одного пользователя.
+    """
+    current_tg_id: int | None = None
+    group: list[Any] = []
+    async for row in rows:
+        if current_tg_id is not None and row["tg_id"] != current_tg_id:
+            yield current_tg_id, render_digest(group, tz)
+            group = []
+        current_tg_id = row["tg_id"]
+        group.append(row)
+    if current_tg_id is not None:
+        yield current_tg_id, render_digest(group, tz)
@@ -0,0 +1,86 @@
+"""Разбор многострочных /addexpense и /additem: одна строка — одна запись."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Generic, TypeVar
+
+from partyshare.db.models import ExpenseEntry
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class ItemEntry:
+    label: str
+    amount_cents: int
+    usernames: list[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Batch(Generic[T]):
+    target_id: int | None
+    entries: list[T] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+def parse_amount(text: str) -> int:
+    """Сумма в центах; принимает и точку, и запятую."""
+    try:
+        value = Decimal(text.replace(",", "."))
+    except InvalidOperation:
+        raise ValueError("некорректная сумма") from None
+    if not value.is_finite() or value <= 0:
+        raise ValueError("некорректная сумма")
+    return int((value * 100).quantize(Decimal(1)))
+
+
+def parse_expense(fields: list[str]) -> ExpenseEntry:
+    if len(fields) < 2 or not fields[0]:
+        raise ValueError("ожидается «название | сумма [валюта] | shared|items»")
+    amount_currency = fields[1].split()
+    if not amount_currency:
+        raise ValueError("укажите сумму")
+    amount_cents = parse_amount(amount_currency[0])
+    currency = amount_currency[1].upper() if len(amount_currency) > 1 else "EUR"
+    if len(currency) != 3:
+        raise ValueError("валюта — трёхбуквенный код")
+    mode = fields[2].lower() if len(fields) > 2 and fields[2] else "shared"
+    if mode not in {"shared", "items"}:
+        raise ValueError("режим — shared или items")
+    return ExpenseEntry(fields[0], amount_cents, currency, mode == "shared")
+
+
+def parse_item(fields: list[str]) -> ItemEntry:
+    if len(fields) < 2:
+        raise ValueError("ожидается «название | сумма | @u1 @u2»")
+    usernames = fields[2].split() if len(fields) > 2 else []
+    return ItemEntry(fields[0], parse_amount(fields[1]), usernames)
+
+
+def parse_batch(text: str, parse_line: Callable[[list[str]], T]) -> Batch[T]:
+    """Разбирает текст команды без самой команды.
+
+    Первая строка — ``<id>``, за которым через ``|`` может сразу идти первая
+    запись (старый однострочный формат); каждая следующая непустая строка —
+    ещё одна запись. Ошибки собираются по всем строкам сразу.
+    """
+    lines = [line.strip() for line in text.strip().splitlines()]
+    if not lines or not lines[0]:
+        return Batch(None)
+    head, _, first = lines[0].partition("|")
+    try:
+        target_id = int(head.strip())
+    except ValueError:
+        return Batch(None)
+
+    batch: Batch[T] = Batch(target_id)
+    rows = [(1, first)] if first.strip() else []
+    rows += [(number, line) for number, line in enumerate(lines[1:], start=2) if line]
+    for number, line in rows:
+        try:
+            batch.entries.append(parse_line([part.strip() for part in line.split("|")]))
+        except ValueError as exc:
+            batch.errors.append(f"Строка {number}: {exc}")
+    return batch
@@ -0,0 +1,64 @@
+"""Строки CSV-выгрузок /export и /export_all."""
+
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Mapping
+from zoneinfo import ZoneInfo
+
+LEDGER_HEADER = [
+    "event_id",
+    "event",
+    "expense_id",
+    "created_at",
+    "expense",
+    "payer",
+    "currency",
+    "expense_amount",
+    "split",
+    "item_id",
+    "item",
+    "item_amount",
+    "consumers",
+]
+
+BALANCE_HEADER = ["event_id", "event", "user", "balance"]
+
+
+def format_cents(cents: int | None) -> str:
+    if cents is None:
+        return ""
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+def ledger_row(row: Mapping[str, Any], tz: ZoneInfo) -> list[Any]:
+    created_at = row["created_at"]
+    return [
+        row["event_id"],
+        row["event_title"],
+        row["expense_id"],
+        created_at.astimezone(tz).strftime("%Y-%m-%d %H:%M") if created_at else "",
+        row["expense_title"],
+        row["payer"] or "",
+        row["currency"],
+        format_cents(row["amount_cents"]),
+        "shared" if row["is_shared"] else "items",
+        row["item_id"] or "",
+        row["item_label"] or "",
+        format_cents(row["item_amount_cents"]),
+        row["consumers"] or "",
+    ]
+
+
+def balance_row(row: Mapping[str, Any]) -> list[Any]:
+    return [row["event_id"], row["event_title"], row["user_name"] or "", format_cents(row["balance_cents"])]
+
+
+async def ledger_rows(rows: AsyncIterator[Mapping[str, Any]], tz: ZoneInfo) -> AsyncIterator[list[Any]]:
+    async for row in rows:
+        yield ledger_row(row, tz)
+
+
+async def balance_rows(rows: AsyncIterator[Mapping[str, Any]]) -> AsyncIterator[list[Any]]:
+    async for row in rows:
+        yield balance_row(row)
@@ -0,0 +1,33 @@
+"""Поиск событий по названию и его повторение в памяти."""
+
+from __future__ import annotations
+
+import re
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def trigrams(text: str) -> set[str]:
+    """Триграммы строки так же, как их строит ``pg_trgm``: по словам, с пробелами по краям."""
+    result: set[str] = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(a: str, b: str) -> float:
+    """Аналог ``similarity()`` из ``pg_trgm``: доля общих триграмм."""
+    left, right = trigrams(a), trigrams(b)
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def title_matches(query: str, title: str) -> bool:
+    """То же условие, что ``title ILIKE '%query%'`` в поиске событий."""
+    return normalize_query(query) in title.lower()
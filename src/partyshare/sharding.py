@@ -0,0 +1,200 @@
+"""Обработка апдейтов в нескольких процессах с разбиением по пользователю.
+
+Супервизор получает сырые апдейты (long polling или вебхук) и раскладывает
+их по очередям воркер-процессов по ``from_user.id % N``. Все апдейты одного
+пользователя попадают в один процесс в порядке получения, поэтому
+состояние диалога в памяти воркера остаётся согласованным.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import multiprocessing as mp
+import queue as queue_lib
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+from typing import Any, Callable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError
+
+from partyshare.logging import get_logger
+from partyshare.metrics import registry
+from partyshare.webhook import UpdateHandler
+
+RawUpdate = dict[str, Any]
+WorkerTarget = Callable[..., None]
+
+shard_routed = registry.counter("partyshare_shard_updates_total", "Апдейты, переданные воркерам")
+shard_restarts = registry.counter("partyshare_shard_restarts_total", "Перезапуски упавших воркеров")
+
+
+def update_user_id(data: RawUpdate) -> Optional[int]:
+    """Telegram id автора апдейта, а если его нет — id чата."""
+    for key, value in data.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        user = value.get("from") or value.get("user")
+        if user:
+            return int(user["id"])
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat:
+            return int(chat["id"])
+    return None
+
+
+def shard_for(data: RawUpdate, shards: int) -> int:
+    user_id = update_user_id(data)
+    key = user_id if user_id is not None else int(data["update_id"])
+    return key % shards
+
+
+class ShardSupervisor:
+    """Запускает воркер-процессы и раздаёт им апдейты.
+
+    ``target(index, queue, *args)`` выполняется в отдельном процессе и должен
+    читать апдейты из ``queue`` до ``None`` (см. ``serve_queue``). Упавший
+    воркер перезапускается с той же очередью, так что его апдейты не теряются.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        target: WorkerTarget,
+        *,
+        args: tuple[Any, ...] = (),
+        queue_size: int = 10_000,
+    ) -> None:
+        self._ctx = mp.get_context("spawn")
+        self._workers = workers
+        self._target = target
+        self._args = args
+        self._queues: list[Queue[Optional[RawUpdate]]] = [
+            self._ctx.Queue(queue_size) for _ in range(workers)
+        ]
+        self._processes: list[Optional[BaseProcess]] = [None] * workers
+        self._stopping = False
+        self._log = get_logger(__name__)
+
+    def start(self) -> None:
+        for index in range(self._workers):
+            self._spawn(index)
+
+    async def feed(self, data: RawUpdate) -> None:
+        index = shard_for(data, self._workers)
+        queue = self._queues[index]
+        try:
+            queue.put_nowait(data)
+        except queue_lib.Full:
+            # Воркер не успевает: ждём места, не блокируя цикл событий
+            await asyncio.to_thread(queue.put, data)
+        shard_routed.inc(shard=index)
+
+    async def watch(self, interval: float = 5.0) -> None:
+        while not self._stopping:
+            await asyncio.sleep(interval)
+            for index, process in enumerate(self._processes):
+                if process is not None and not process.is_alive() and not self._stopping:
+                    self._log.error("shard.worker.died", shard=index, exitcode=process.exitcode)
+                    shard_restarts.inc(shard=index)
+                    self._spawn(index)
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Просит воркеры дообработать очередь и завершиться."""
+        self._stopping = True
+        for queue in self._queues:
+            queue.put(None)
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                self._log.warning("shard.worker.kill", shard=index)
+                process.terminate()
+                process.join()
+
+    def _spawn(self, index: int) -> None:
+        process = self._ctx.Process(
+            target=self._target,
+            args=(index, self._queues[index], *self._args),
+            name=f"partyshare-shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+        self._log.info("shard.worker.start", shard=index, pid=process.pid)
+
+
+async def serve_queue(queue: Queue[Optional[RawUpdate]], handler: UpdateHandler) -> int:
+    """Цикл воркера: читает апдейты из очереди до ``None``. Возвращает их число.
+
+    Апдейты разных пользователей обрабатываются параллельно, а одного
+    пользователя — строго по очереди: задача следующего апдейта ждёт
+    завершения предыдущей.
+    """
+    loop = asyncio.get_running_loop()
+    log = get_logger(__name__)
+    tasks: set[asyncio.Task[None]] = set()
+    # пользователь -> задача его последнего апдейта
+    tails: dict[int, asyncio.Task[None]] = {}
+    handled = 0
+
+    async def process(data: RawUpdate, previous: Optional[asyncio.Task[None]]) -> None:
+        if previous is not None:
+            await asyncio.wait({previous})
+        try:
+            await handler(data)
+        except Exception:
+            log.exception("shard.update.error", update_id=data.get("update_id"))
+
+    def forget(user_id: int, task: asyncio.Task[None]) -> None:
+        if tails.get(user_id) is task:
+            del tails[user_id]
+
+    while True:
+        data = await loop.run_in_executor(None, queue.get)
+        if data is None:
+            break
+        handled += 1
+        user_id = update_user_id(data)
+        previous = tails.get(user_id) if user_id is not None else None
+        task = asyncio.create_task(process(data, previous))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        if user_id is not None:
+            tails[user_id] = task
+            task.add_done_callback(functools.partial(forget, user_id))
+    if tasks:
+        await asyncio.gather(*tasks)
+    return handled
+
+
+async def poll_updates(
+    bot: Bot,
+    handler: UpdateHandler,
+    stop: asyncio.Event,
+    *,
+    allowed_updates: Optional[list[str]] = None,
+    timeout: int = 30,
+) -> None:
+    """Long polling без разбора апдейтов диспетчером: каждый передаётся ``handler``."""
+    log = get_logger(__name__)
+    offset: Optional[int] = None
+    backoff = 1.0
+    while not stop.is_set():
+        try:
+            updates = await bot.get_updates(
+                offset=offset,
+                timeout=timeout,
+                allowed_updates=allowed_updates,
+            )
+        except TelegramNetworkError as exc:
+            log.warning("shard.polling.error", error=str(exc), retry_in=backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+            continue
+        backoff = 1.0
+        for update in updates:
+            offset = update.update_id + 1
+            await handler(update.model_dump(mode="json", by_alias=True, exclude_none=True))
@@ -2,101 +2,466 @@
 
 from __future__ import annotations
 
-from typing import Optional, Tuple
+import json
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional, Tuple
+
 
 OWNER_VIEW = "owner"
 PARTICIPANT_VIEW = "participant"
 
+UPCOMING_LISTING = "upcoming"
+PAST_LISTING = "past"
+CANCELED_LISTING = "canceled"
+
+# Шаги мастера создания события, вкладки и срезы «Моих событий» хранятся
+# как индексы в этих кортежах: 0 — значение не задано.
+EVENT_STEPS = ("title", "datetime", "location", "notes")
+VIEWS = (OWNER_VIEW, PARTICIPANT_VIEW)
+LISTINGS = (UPCOMING_LISTING, PAST_LISTING, CANCELED_LISTING)
+
+CREATING_EVENT = 1
+ADDING_EXPENSE = 2
+
+
+def _encode(values: tuple[str, ...], value: str) -> int:
+    try:
+        return values.index(value) + 1
+    except ValueError:
+        raise ValueError(f"Неизвестное значение: {value}") from None
+
+
+class UserSession:
+    """Всё состояние диалога одного пользователя в одном компактном объекте."""
+
+    __slots__ = (
+        "expires_at",
+        "flags",
+        "step",
+        "view",
+        "current_event",
+        "owner_event",
+        "participant_event",
+        "pending_event",
+        "pending_field",
+        "event_data",
+        "listing",
+    )
 
-class UserStateManager:
     def __init__(self) -> None:
-        self._current_event: dict[int, int] = {}
-        self._active_view: dict[int, str] = {}
-        self._view_events: dict[int, dict[str, int]] = {}
-        self._pending_edit: dict[int, tuple[int, str]] = {}
-        self._creating_event: dict[int, bool] = {}
-        self._adding_expense: dict[int, bool] = {}
-        self._event_data: dict[int, dict[str, str]] = {}  # Временные данные события
-        self._event_step: dict[int, str] = {}  # Текущий шаг создания события
+        self.expires_at = 0.0
+        self.flags = 0
+        self.step = 0
+        self.view = 0
+        self.current_event: Optional[int] = None
+        self.owner_event: Optional[int] = None
+        self.participant_event: Optional[int] = None
+        self.pending_event: Optional[int] = None
+        self.pending_field: Optional[str] = None
+        self.event_data: Optional[dict[str, str]] = None
+        self.listing = 0
+
+    def is_empty(self) -> bool:
+        return (
+            not self.flags
+            and not self.step
+            and not self.view
+            and self.current_event is None
+            and self.owner_event is None
+            and self.participant_event is None
+            and self.pending_event is None
+            and not self.event_data
+            and not self.listing
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        data = {field: getattr(self, field) for field in _SESSION_FIELDS}
+        return {key: value for key, value in data.items() if value}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "UserSession":
+        session = cls()
+        for key, value in data.items():
+            if key in _SESSION_FIELDS:
+                setattr(session, key, value)
+        return session
+
+
+# Сохраняемые поля сессии; ``expires_at`` — служебное поле кэша в памяти.
+_SESSION_FIELDS = UserSession.__slots__[1:]
+
+# Примерный объём одной сессии в памяти вместе с float срока жизни и
+# записью в словаре; используется для пересчёта ``max_bytes`` в записи.
+SESSION_BYTES = sys.getsizeof(UserSession()) + sys.getsizeof(0.0) + 48
+
+
+class StateStorage(ABC):
+    """Хранилище состояния пользователя: одна ``UserSession`` на ``user_id``.
+
+    ``get``/``put``/``delete`` синхронные, чтобы обработчики работали с
+    ``state`` как раньше. Асинхронные ``load``/``flush`` вызываются
+    ``StateMiddleware`` до и после обработки апдейта: бэкенды с внешним
+    хранилищем подгружают и сохраняют в них запись пользователя.
+    """
+
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[UserSession]: ...
+
+    @abstractmethod
+    def put(self, user_id: int, session: UserSession) -> None: ...
+
+    @abstractmethod
+    def delete(self, user_id: int) -> None: ...
+
+    async def load(self, user_id: int) -> None:
+        return None
+
+    async def flush(self, user_id: int) -> None:
+        return None
+
+
+class MemoryStateStorage(StateStorage):
+    """Состояние в памяти процесса: одна карта ``user_id -> UserSession``.
+
+    Записи живут ``ttl`` секунд с последнего обращения. Порядок в словаре —
+    приблизительный LRU: запись переставляется в конец не чаще, чем раз в
+    ``ttl / 16``, поэтому частые чтения обходятся без перестановок. При
+    переполнении вытесняются записи из начала словаря. ``max_bytes``
+    пересчитывается в число записей: сессии фиксированного размера, а
+    черновик события живёт только во время мастера создания.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float = 24 * 3600,
+        max_entries: int = 100_000,
+        max_bytes: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_bytes is not None:
+            max_entries = min(max_entries, max(max_bytes // SESSION_BYTES, 1))
+        self._sessions: dict[int, UserSession] = {}
+        self._ttl = ttl
+        self._refresh_after = ttl - ttl / 16
+        self._max_entries = max_entries
+        self._clock = clock
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, user_id: int) -> Optional[UserSession]:
+        session = self._sessions.get(user_id)
+        if session is None:
+            return None
+        now = self._clock()
+        left = session.expires_at - now
+        if left <= 0:
+            del self._sessions[user_id]
+            return None
+        if left < self._refresh_after:
+            self._touch(user_id, session, now)
+        return session
+
+    def put(self, user_id: int, session: UserSession) -> None:
+        if self._sessions.get(user_id) is not session:
+            self._sessions.pop(user_id, None)
+        self._touch(user_id, session, self._clock())
+        self._evict()
+
+    def delete(self, user_id: int) -> None:
+        self._sessions.pop(user_id, None)
+
+    def _touch(self, user_id: int, session: UserSession, now: float) -> None:
+        self._sessions.pop(user_id, None)
+        self._sessions[user_id] = session
+        session.expires_at = now + self._ttl
+
+    def _evict(self) -> None:
+        now = self._clock()
+        sessions = self._sessions
+        while sessions:
+            user_id = next(iter(sessions))
+            if len(sessions) <= self._max_entries and sessions[user_id].expires_at > now:
+                break
+            del sessions[user_id]
+            self.evictions += 1
+
+
+def encode_session(session: UserSession) -> str:
+    return json.dumps(session.to_dict(), ensure_ascii=False)
+
+
+def decode_session(raw: str) -> UserSession:
+    return UserSession.from_dict(json.loads(raw))
+
+
+class PostgresStateStorage(StateStorage):
+    """Состояние в UNLOGGED-таблице ``user_state``, общее для всех воркеров.
+
+    Запись живёт в памяти только на время обработки одного апдейта: ``load``
+    читает её из БД, ``flush`` сохраняет изменения и забывает её.
+    """
+
+    def __init__(self, repo: Any, *, ttl: float = 24 * 3600) -> None:
+        self._repo = repo
+        self._ttl = ttl
+        self._records: dict[int, Optional[UserSession]] = {}
+        self._refs: dict[int, int] = {}
+        self._dirty: set[int] = set()
+
+    def get(self, user_id: int) -> Optional[UserSession]:
+        return self._records.get(user_id)
+
+    def put(self, user_id: int, session: UserSession) -> None:
+        self._records[user_id] = session
+        self._dirty.add(user_id)
+
+    def delete(self, user_id: int) -> None:
+        self._records[user_id] = None
+        self._dirty.add(user_id)
+
+    async def load(self, user_id: int, *, known: Optional[UserSession] = None) -> None:
+        """``known`` — запись, уже известная вызывающему (например, из локального кэша)."""
+        self._refs[user_id] = self._refs.get(user_id, 0) + 1
+        if user_id in self._records:
+            return
+        if known is not None:
+            self._records[user_id] = known
+            return
+        raw = await self._repo.load_user_state(user_id, self._ttl)
+        self._records[user_id] = decode_session(raw) if raw else None
+
+    async def flush(self, user_id: int) -> None:
+        try:
+            await self._write(user_id)
+        finally:
+            refs = self._refs.get(user_id, 1) - 1
+            if refs <= 0:
+                self._refs.pop(user_id, None)
+                self._records.pop(user_id, None)
+            else:
+                self._refs[user_id] = refs
+
+    async def _write(self, user_id: int) -> None:
+        if user_id not in self._dirty:
+            return
+        self._dirty.discard(user_id)
+        session = self._records.get(user_id)
+        if session is not None:
+            await self._repo.save_user_state(user_id, encode_session(session))
+        else:
+            await self._repo.delete_user_state(user_id)
+
+
+class HybridStateStorage(StateStorage):
+    """Локальный кэш в памяти с записью в Postgres после каждого апдейта.
+
+    Чтения обслуживаются из памяти; в БД обращаемся только при промахе
+    (первый апдейт пользователя в этом процессе или после вытеснения).
+    """
+
+    def __init__(self, memory: MemoryStateStorage, postgres: PostgresStateStorage) -> None:
+        self._memory = memory
+        self._postgres = postgres
+
+    def get(self, user_id: int) -> Optional[UserSession]:
+        return self._memory.get(user_id)
+
+    def put(self, user_id: int, session: UserSession) -> None:
+        self._memory.put(user_id, session)
+        self._postgres.put(user_id, session)
+
+    def delete(self, user_id: int) -> None:
+        self._memory.delete(user_id)
+        self._postgres.delete(user_id)
+
+    async def load(self, user_id: int) -> None:
+        await self._postgres.load(user_id, known=self._memory.get(user_id))
+        session = self._postgres.get(user_id)
+        if session is not None:
+            self._memory.put(user_id, session)
+
+    async def flush(self, user_id: int) -> None:
+        await self._postgres.flush(user_id)
+
+
+def create_storage(
+    backend: str,
+    repo: Any = None,
+    *,
+    ttl: float = 24 * 3600,
+    max_entries: int = 100_000,
+    max_bytes: Optional[int] = None,
+) -> StateStorage:
+    if backend == "memory":
+        return MemoryStateStorage(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
+    if backend == "postgres":
+        return PostgresStateStorage(repo, ttl=ttl)
+    if backend == "hybrid":
+        return HybridStateStorage(
+            MemoryStateStorage(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes),
+            PostgresStateStorage(repo, ttl=ttl),
+        )
+    raise ValueError(f"Неизвестный бэкенд состояния: {backend}")
+
+
+class UserStateManager:
+    def __init__(self, storage: Optional[StateStorage] = None) -> None:
+        self.storage: StateStorage = storage if storage is not None else MemoryStateStorage()
+
+    def use_storage(self, storage: StateStorage) -> None:
+        self.storage = storage
+
+    def session(self, user_id: int) -> Optional[UserSession]:
+        return self.storage.get(user_id)
+
+    def _edit(self, user_id: int) -> UserSession:
+        session = self.storage.get(user_id)
+        return session if session is not None else UserSession()
+
+    def _save(self, user_id: int, session: UserSession) -> None:
+        if session.is_empty():
+            self.storage.delete(user_id)
+        else:
+            self.storage.put(user_id, session)
 
     def set_current_event(self, user_id: int, event_id: int) -> None:
-        self._current_event[user_id] = event_id
+        session = self._edit(user_id)
+        session.current_event = event_id
+        self._save(user_id, session)
 
     def get_current_event(self, user_id: int) -> Optional[int]:
-        return self._current_event.get(user_id)
+        session = self.storage.get(user_id)
+        return session.current_event if session else None
 
     def clear_current_event(self, user_id: int) -> None:
-        self._current_event.pop(user_id, None)
+        session = self.storage.get(user_id)
+        if session and session.current_event is not None:
+            session.current_event = None
+            self._save(user_id, session)
 
     def set_view(self, user_id: int, view: str) -> None:
-        self._active_view[user_id] = view
+        session = self._edit(user_id)
+        session.view = _encode(VIEWS, view)
+        self._save(user_id, session)
 
     def get_view(self, user_id: int) -> Optional[str]:
-        return self._active_view.get(user_id)
+        session = self.storage.get(user_id)
+        return VIEWS[session.view - 1] if session and session.view else None
+
+    def set_listing(self, user_id: int, listing: str) -> None:
+        session = self._edit(user_id)
+        session.listing = _encode(LISTINGS, listing)
+        self._save(user_id, session)
+
+    def get_listing(self, user_id: int) -> Optional[str]:
+        session = self.storage.get(user_id)
+        return LISTINGS[session.listing - 1] if session and session.listing else None
 
     def set_view_event(self, user_id: int, view: str, event_id: int) -> None:
-        self._view_events.setdefault(user_id, {})[view] = event_id
-        self.set_view(user_id, view)
-        self.set_current_event(user_id, event_id)
+        session = self._edit(user_id)
+        session.view = _encode(VIEWS, view)
+        if view == OWNER_VIEW:
+            session.owner_event = event_id
+        else:
+            session.participant_event = event_id
+        session.current_event = event_id
+        self._save(user_id, session)
 
     def get_view_event(self, user_id: int, view: str) -> Optional[int]:
-        return self._view_events.get(user_id, {}).get(view)
+        session = self.storage.get(user_id)
+        if not session:
+            return None
+        if view == OWNER_VIEW:
+            return session.owner_event
+        if view == PARTICIPANT_VIEW:
+            return session.participant_event
+        return None
 
     def set_pending_edit(self, user_id: int, event_id: int, field: str) -> None:
-        self._pending_edit[user_id] = (event_id, field)
+        session = self._edit(user_id)
+        session.pending_event = event_id
+        session.pending_field = sys.intern(field)
+        self._save(user_id, session)
 
     def pop_pending_edit(self, user_id: int) -> Optional[Tuple[int, str]]:
-        return self._pending_edit.pop(user_id, None)
+        pending = self.get_pending_edit(user_id)
+        if pending is not None:
+            session = self._edit(user_id)
+            session.pending_event = session.pending_field = None
+            self._save(user_id, session)
+        return pending
 
     def get_pending_edit(self, user_id: int) -> Optional[Tuple[int, str]]:
-        return self._pending_edit.get(user_id)
+        session = self.storage.get(user_id)
+        if not session or session.pending_event is None or session.pending_field is None:
+            return None
+        return session.pending_event, session.pending_field
+
+    def _set_flag(self, user_id: int, flag: int, enabled: bool) -> None:
+        session = self.storage.get(user_id)
+        if session is None and not enabled:
+            return
+        session = session or UserSession()
+        session.flags = session.flags | flag if enabled else session.flags & ~flag
+        self._save(user_id, session)
+
+    def _has_flag(self, user_id: int, flag: int) -> bool:
+        session = self.storage.get(user_id)
+        return bool(session and session.flags & flag)
 
     def set_creating_event(self, user_id: int) -> None:
-        self._creating_event[user_id] = True
+        self._set_flag(user_id, CREATING_EVENT, True)
 
     def is_creating_event(self, user_id: int) -> bool:
-        return self._creating_event.get(user_id, False)
+        return self._has_flag(user_id, CREATING_EVENT)
 
     def clear_creating_event(self, user_id: int) -> None:
-        self._creating_event.pop(user_id, None)
+        self._set_flag(user_id, CREATING_EVENT, False)
 
     def set_adding_expense(self, user_id: int) -> None:
-        self._adding_expense[user_id] = True
+        self._set_flag(user_id, ADDING_EXPENSE, True)
 
     def is_adding_expense(self, user_id: int) -> bool:
-        return self._adding_expense.get(user_id, False)
+        return self._has_flag(user_id, ADDING_EXPENSE)
 
     def clear_adding_expense(self, user_id: int) -> None:
-        self._adding_expense.pop(user_id, None)
+        self._set_flag(user_id, ADDING_EXPENSE, False)
 
     def set_event_step(self, user_id: int, step: str) -> None:
-        self._event_step[user_id] = step
+        session = self._edit(user_id)
+        session.step = _encode(EVENT_STEPS, step)
+        self._save(user_id, session)
 
     def get_event_step(self, user_id: int) -> Optional[str]:
-        return self._event_step.get(user_id)
+        session = self.storage.get(user_id)
+        return EVENT_STEPS[session.step - 1] if session and session.step else None
 
     def set_event_data(self, user_id: int, key: str, value: str) -> None:
-        if user_id not in self._event_data:
-            self._event_data[user_id] = {}
-        self._event_data[user_id][key] = value
+        session = self._edit(user_id)
+        if session.event_data is None:
+            session.event_data = {}
+        session.event_data[key] = value
+        self._save(user_id, session)
 
     def get_event_data(self, user_id: int) -> dict[str, str]:
-        return self._event_data.get(user_id, {})
+        session = self.storage.get(user_id)
+        return dict(session.event_data) if session and session.event_data else {}
 
     def clear_event_data(self, user_id: int) -> None:
-        self._event_data.pop(user_id, None)
-        self._event_step.pop(user_id, None)
+        session = self.storage.get(user_id)
+        if session is None:
+            return
+        session.event_data = None
+        session.step = 0
+        self._save(user_id, session)
 
     def clear_user(self, user_id: int) -> None:
-        self._current_event.pop(user_id, None)
-        self._active_view.pop(user_id, None)
-        self._view_events.pop(user_id, None)
-        self._pending_edit.pop(user_id, None)
-        self._creating_event.pop(user_id, None)
-        self._adding_expense.pop(user_id, None)
-        self._event_data.pop(user_id, None)
-        self._event_step.pop(user_id, None)
+        self.storage.delete(user_id)
 
 
 state = UserStateManager()
-
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """LRU-кэш с временем жизни записей и ограничением по числу записей.
+
+    Если задан ``max_bytes``, учитывается ещё и примерный объём значений,
+    посчитанный функцией ``sizeof``: при превышении вытесняются самые давно
+    использованные записи.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float,
+        max_entries: int,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[V], int]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._clock = clock
+        self._data: OrderedDict[K, tuple[float, V, int]] = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key) is not None  # type: ignore[arg-type]
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: K) -> Optional[V]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at <= self._clock():
+            self.pop(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        self.pop(key)
+        size = self._sizeof(value) if self._sizeof else 0
+        self._data[key] = (self._clock() + (self._ttl if ttl is None else ttl), value, size)
+        self._bytes += size
+        self._evict()
+
+    def pop(self, key: K) -> Optional[V]:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return None
+        self._bytes -= entry[2]
+        return entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    def _evict(self) -> None:
+        now = self._clock()
+        while self._data:
+            key, (expires_at, _, _) = next(iter(self._data.items()))
+            over_limit = len(self._data) > self._max_entries or (
+                self._max_bytes is not None and self._bytes > self._max_bytes
+            )
+            if not over_limit and expires_at > now:
+                break
+            self.pop(key)
+            self.evictions += 1
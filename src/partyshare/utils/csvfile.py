@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import csv
+import io
+from typing import TYPE_CHECKING, Any, AsyncGenerator, AsyncIterator, Callable, Sequence
+
+from aiogram.types.input_file import DEFAULT_CHUNK_SIZE, InputFile
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+class CsvInputFile(InputFile):
+    """CSV-документ, который пишется прямо во время загрузки в Telegram.
+
+    ``rows`` вызывается при каждом чтении файла и должен возвращать новый
+    поток строк (например, серверный курсор), поэтому повторная отправка
+    тоже работает. В памяти — не больше одного чанка CSV.
+    """
+
+    def __init__(
+        self,
+        rows: Callable[[], AsyncIterator[Sequence[Any]]],
+        header: Sequence[str],
+        filename: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> None:
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self._rows = rows
+        self._header = header
+
+    async def read(self, bot: "Bot") -> AsyncGenerator[bytes, None]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # BOM — чтобы Excel открыл кириллицу в UTF-8
+        buffer.write("\ufeff")
+        writer.writerow(self._header)
+        async for row in self._rows():
+            writer.writerow(row)
+            if buffer.tell() >= self.chunk_size:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Callable, Hashable
+
+
+class AsyncRateLimiter:
+    """Равномерно пропускает не больше ``rate`` вызовов в секунду на процесс."""
+
+    def __init__(self, rate: float) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self._interval = 1.0 / rate
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Сдвигает следующий слот, например после ``retry_after`` от Telegram."""
+        self._next_at = max(self._next_at, time.monotonic() + seconds)
+
+
+class KeyedTokenBucket:
+    """Token bucket на ключ: в среднем ``rate`` действий в секунду, подряд — не больше ``burst``.
+
+    Запись о ключе удаляется, когда его корзина снова наполнилась, так что
+    память занимают только недавно активные ключи.
+    """
+
+    def __init__(self, rate: float, burst: int, *, clock: Callable[[], float] = time.monotonic) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self._rate = rate
+        self._burst = float(burst)
+        self._clock = clock
+        # ключ -> [токены, время обновления]
+        self._buckets: dict[Hashable, list[float]] = {}
+        self._prune_at = 1024
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: Hashable) -> bool:
+        """Забирает токен; ``False``, если корзина ключа пуста."""
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self._prune_at:
+                self._prune(now)
+            self._buckets[key] = [self._burst - 1, now]
+            return True
+        tokens = min(self._burst, bucket[0] + (now - bucket[1]) * self._rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def retry_after(self, key: Hashable) -> float:
+        """Через сколько секунд у ключа появится токен."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return 0.0
+        tokens = bucket[0] + (self._clock() - bucket[1]) * self._rate
+        return max(0.0, (1 - tokens) / self._rate)
+
+    def _prune(self, now: float) -> None:
+        refill = self._burst / self._rate
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < refill
+        }
+        self._prune_at = max(1024, 2 * len(self._buckets))
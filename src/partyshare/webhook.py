@@ -0,0 +1,174 @@
+"""Приём апдейтов Telegram через вебхук (aiohttp)."""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import signal
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from partyshare.config import Settings
+from partyshare.logging import get_logger
+from partyshare.metrics import metrics_handler, registry
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+UpdateHandler = Callable[[dict[str, Any]], Awaitable[None]]
+
+webhook_updates = registry.counter("partyshare_webhook_updates_total", "Принятые вебхуком апдейты")
+webhook_rejected = registry.counter("partyshare_webhook_rejected_total", "Отклонённые запросы вебхука")
+webhook_inflight = registry.gauge("partyshare_webhook_inflight", "Апдейты в обработке")
+webhook_handle_seconds = registry.histogram(
+    "partyshare_webhook_handle_seconds",
+    "Время обработки апдейта после ответа Telegram",
+)
+
+
+class WebhookServer:
+    """HTTP-приёмник апдейтов.
+
+    Запрос проверяется по секретному токену, Telegram сразу получает 200, а
+    сам апдейт обрабатывается в фоновой задаче. При остановке сервер
+    перестаёт принимать запросы и дожидается уже принятых апдейтов.
+    """
+
+    def __init__(
+        self,
+        handler: UpdateHandler,
+        *,
+        path: str,
+        secret: str,
+        drain_timeout: float = 30.0,
+    ) -> None:
+        self._handler = handler
+        self._path = path
+        self._secret = secret
+        self._drain_timeout = drain_timeout
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._accepting = True
+        self._log = get_logger(__name__)
+
+    @property
+    def inflight(self) -> int:
+        return len(self._tasks)
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self._path, self.handle)
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/metrics", metrics_handler)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self._secret):
+            webhook_rejected.inc(reason="secret")
+            return web.Response(status=401)
+        if not self._accepting:
+            webhook_rejected.inc(reason="shutdown")
+            return web.Response(status=503)
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or "update_id" not in data:
+            webhook_rejected.inc(reason="payload")
+            return web.Response(status=400)
+
+        webhook_updates.inc()
+        task = asyncio.create_task(self._process(data))
+        self._tasks.add(task)
+        webhook_inflight.set(len(self._tasks))
+        task.add_done_callback(self._task_done)
+        return web.json_response({})
+
+    async def healthz(self, request: web.Request) -> web.Response:
+        if not self._accepting:
+            return web.Response(status=503, text="stopping")
+        return web.Response(text="ok")
+
+    async def drain(self) -> None:
+        """Прекращает приём апдейтов и ждёт обработки уже принятых."""
+        self._accepting = False
+        if not self._tasks:
+            return
+        self._log.info("webhook.drain", inflight=len(self._tasks))
+        _, pending = await asyncio.wait(set(self._tasks), timeout=self._drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self._log.warning("webhook.drain.timeout", cancelled=len(pending))
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _process(self, data: dict[str, Any]) -> None:
+        started = time.monotonic()
+        try:
+            await self._handler(data)
+        except Exception:
+            self._log.exception("webhook.update.error", update_id=data["update_id"])
+        finally:
+            webhook_handle_seconds.observe(time.monotonic() - started)
+
+    def _task_done(self, task: asyncio.Task[None]) -> None:
+        self._tasks.discard(task)
+        webhook_inflight.set(len(self._tasks))
+
+
+def dispatcher_handler(bot: Bot, dp: Dispatcher) -> UpdateHandler:
+    """Обработчик, который разбирает апдейт и передаёт его диспетчеру в этом процессе."""
+
+    async def handle(data: dict[str, Any]) -> None:
+        await dp.feed_update(bot, Update.model_validate(data, context={"bot": bot}))
+
+    return handle
+
+
+def shutdown_event() -> asyncio.Event:
+    """Событие, которое выставляется по SIGTERM/SIGINT."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    return stop
+
+
+async def run_webhook(
+    bot: Bot,
+    handler: UpdateHandler,
+    settings: Settings,
+    *,
+    allowed_updates: list[str] | None = None,
+) -> None:
+    """Поднимает сервер, регистрирует вебхук и работает до SIGTERM/SIGINT."""
+    if not settings.webhook_url or not settings.webhook_secret:
+        raise RuntimeError("Для BOT_MODE=webhook нужны WEBHOOK_URL и WEBHOOK_SECRET")
+
+    log = get_logger(__name__)
+    server = WebhookServer(handler, path=settings.webhook_path, secret=settings.webhook_secret)
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, settings.webhook_host, settings.webhook_port).start()
+
+    stop = shutdown_event()
+    await bot.set_webhook(
+        settings.webhook_url.rstrip("/") + settings.webhook_path,
+        secret_token=settings.webhook_secret,
+        allowed_updates=allowed_updates,
+    )
+    log.info("webhook.start", host=settings.webhook_host, port=settings.webhook_port)
+    try:
+        await stop.wait()
+    finally:
+        # Сначала отвечаем 503 на новые запросы (Telegram повторит их позже),
+        # затем дожидаемся принятых апдейтов и только потом закрываем сокет.
+        await server.drain()
+        await runner.cleanup()
+        log.info("webhook.stop")
@@ -0,0 +1,54 @@
+import os
+import secrets
+from pathlib import Path
+from urllib.parse import quote
+
+import pytest
+
+from partyshare.db.repo import Database, PartyShareRepository
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+MIGRATIONS = Path(__file__).resolve().parents[1] / "src" / "partyshare" / "db" / "migrations"
+
+
+def run_in_schema(url: str, schema: str, *statements: str, migrate: bool = False) -> None:
+    """Выполняет ``statements`` и, если нужно, миграции alembic до head в ``schema``."""
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import create_engine, pool
+
+    engine = create_engine(url.replace("+asyncpg", ""), poolclass=pool.NullPool)
+    try:
+        with engine.begin() as connection:
+            for statement in statements:
+                connection.exec_driver_sql(statement)
+            if migrate:
+                connection.exec_driver_sql(f"SET search_path TO {schema}, public")
+                config = Config()
+                config.set_main_option("script_location", str(MIGRATIONS))
+                config.attributes["connection"] = connection
+                command.upgrade(config, "head")
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture
+async def pg_repo():
+    """Репозиторий над отдельной схемой, собранной миграциями; после теста схема удаляется.
+
+    Схема строится теми же миграциями, что и в продакшене, поэтому тесты
+    ловят расхождения между ними и запросами репозитория.
+    """
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL не задан")
+
+    schema = f"test_{secrets.token_hex(4)}"
+    run_in_schema(TEST_DATABASE_URL, schema, f"CREATE SCHEMA {schema}", migrate=True)
+    separator = "&" if "?" in TEST_DATABASE_URL else "?"
+    search_path = quote(f"{schema},public")
+    db = Database(f"{TEST_DATABASE_URL}{separator}search_path={search_path}")
+    try:
+        yield PartyShareRepository(db)
+    finally:
+        await db.close()
+        run_in_schema(TEST_DATABASE_URL, schema, f"DROP SCHEMA {schema} CASCADE")
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from partyshare.db.models import EventListing
+from partyshare.db.repo import PartyShareRepository
+from partyshare.scheduler import _archive_job, events_archived
+from partyshare.services.authz import AuthorizationError, assert_event_participant
+
+
+class BatchRepo:
+    def __init__(self, batches: list[int]) -> None:
+        self.batches = batches
+        self.calls: list = []
+
+    async def archive_events(self, started_before, batch_size):
+        self.calls.append((started_before, batch_size))
+        return self.batches.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_job_moves_batches_until_short_one():
+    repo = BatchRepo([200, 200, 37, 999])
+    before = events_archived.value()
+
+    await _archive_job(repo, after_days=90, batch_size=200)  # type: ignore[arg-type]
+
+    assert len(repo.calls) == 3
+    assert events_archived.value() == before + 437
+    cutoff = repo.calls[0][0]
+    assert abs(datetime.now(timezone.utc) - timedelta(days=90) - cutoff) < timedelta(seconds=5)
+
+
+class QueryDB:
+    def __init__(self) -> None:
+        self.queries: list[str] = []
+
+    async def fetchval(self, query: str, *args):
+        self.queries.append(query)
+        return None
+
+    async def fetchrow(self, query: str, *args):
+        self.queries.append(query)
+        return None
+
+
+@pytest.mark.asyncio
+async def test_participant_check_reads_archive_only_on_request():
+    db = QueryDB()
+    for include_archived in (False, True):
+        with pytest.raises(AuthorizationError):
+            await assert_event_participant(db, 1, 5, include_archived=include_archived)
+    assert "FROM event_participants" in db.queries[0]
+    assert "FROM all_event_participants" in db.queries[1]
+
+
+@pytest.mark.asyncio
+async def test_event_lookup_reads_archive_only_on_request():
+    db = QueryDB()
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+    assert await repo.get_event(5) is None
+    assert await repo.get_event(5, include_archived=True) is None
+    assert "FROM events WHERE" in db.queries[0]
+    assert "FROM all_events WHERE" in db.queries[1]
+
+
+ARCHIVED = ["events", "event_participants", "expenses", "expense_items", "expense_item_consumers", "reminders"]
+
+
+async def seed_event(repo: PartyShareRepository, owner: int, guest: int, starts_at: datetime) -> int:
+    event_id = await repo.db.fetchval(
+        "INSERT INTO events (owner_id, title, starts_at) VALUES ($1, 'Ужин', $2) RETURNING id", owner, starts_at
+    )
+    await repo.db.execute(
+        "INSERT INTO event_participants VALUES ($1, $2, 'going'), ($1, $3, 'going')", event_id, owner, guest
+    )
+    expense_id = await repo.db.fetchval(
+        "INSERT INTO expenses (event_id, payer_id, created_by, title, amount_cents, is_shared)"
+        " VALUES ($1, $2, $2, 'Чек', 1000, false) RETURNING id",
+        event_id,
+        owner,
+    )
+    item_id = await repo.db.fetchval(
+        "INSERT INTO expense_items (expense_id, label, amount_cents) VALUES ($1, 'Пицца', 1000) RETURNING id",
+        expense_id,
+    )
+    await repo.db.execute("INSERT INTO expense_item_consumers VALUES ($1, $2)", item_id, guest)
+    await repo.db.execute("INSERT INTO reminders (event_id, remind_at) VALUES ($1, $2)", event_id, starts_at)
+    await repo.db.execute("INSERT INTO event_invite_links (event_id, token) VALUES ($1, $2)", event_id, f"t{event_id}")
+    return event_id
+
+
+@pytest.mark.asyncio
+async def test_old_events_move_with_dependents(pg_repo):
+    owner = await pg_repo.ensure_user(1, "owner", "Owner")
+    guest = await pg_repo.ensure_user(2, "guest", "Guest")
+    now = datetime.now(timezone.utc)
+    old = [await seed_event(pg_repo, owner, guest, now - timedelta(days=200 + n)) for n in range(3)]
+    fresh = await seed_event(pg_repo, owner, guest, now - timedelta(days=1))
+
+    assert await pg_repo.archive_events(now - timedelta(days=90), 2) == 2
+    assert await pg_repo.archive_events(now - timedelta(days=90), 2) == 1
+    assert await pg_repo.archive_events(now - timedelta(days=90), 2) == 0
+
+    for table in ARCHIVED:
+        hot = await pg_repo.db.fetchval(f"SELECT count(*) FROM {table}")
+        cold = await pg_repo.db.fetchval(f"SELECT count(*) FROM {table}_archive")
+        per_event = 2 if table == "event_participants" else 1
+        assert (hot, cold) == (per_event, 3 * per_event), table
+    assert await pg_repo.db.fetchval("SELECT count(*) FROM event_invite_links") == 1
+    assert await pg_repo.get_event(old[0]) is None
+    assert (await pg_repo.get_event(fresh))["id"] == fresh
+
+    # история по архивному событию читается так же, как по горячему
+    expenses = await pg_repo.get_event_expenses(old[0])
+    items = await pg_repo.get_expense_items(expenses[0]["id"])
+    assert items[0]["consumers"] == [guest]
+    assert len(await pg_repo.list_event_participants_with_status(old[0])) == 2
+    balances = [row async for row in pg_repo.iter_event_balances(old[0])]
+    assert sorted(row["balance_cents"] for row in balances) == [-1000, 1000]
+    await assert_event_participant(pg_repo.db, guest, old[0], include_archived=True)
+
+
+@pytest.mark.asyncio
+async def test_archived_event_is_still_listed_and_viewable(pg_repo):
+    owner = await pg_repo.ensure_user(1, "owner", "Owner")
+    guest = await pg_repo.ensure_user(2, "guest", "Guest")
+    now = datetime.now(timezone.utc)
+    old = await seed_event(pg_repo, owner, guest, now - timedelta(days=200))
+    recent = await seed_event(pg_repo, owner, guest, now - timedelta(days=1))
+    assert await pg_repo.archive_events(now - timedelta(days=90), 10) == 1
+
+    past = await pg_repo.list_owner_events(owner, EventListing.PAST)
+    assert [row["id"] for row in past] == [recent, old]
+    joined = await pg_repo.list_participant_events(guest, EventListing.PAST)
+    assert [(row["id"], row["status"]) for row in joined] == [(recent, "going"), (old, "going")]
+    assert await pg_repo.list_owner_events(owner, EventListing.UPCOMING) == []
+
+    assert await pg_repo.get_event(old) is None
+    assert (await pg_repo.get_event(old, include_archived=True))["id"] == old
+    participants = await pg_repo.get_event_participants(old, include_archived=True)
+    assert sorted(row["user_id"] for row in participants) == [owner, guest]
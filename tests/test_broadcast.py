@@ -0,0 +1,86 @@
+import pytest
+
+from partyshare import broadcast
+from partyshare.broadcast import (
+    BroadcastProgress,
+    broadcast_to_participants,
+    format_progress,
+    unique_recipients,
+)
+
+
+class StubRepo:
+    def __init__(self, participants) -> None:
+        self.participants = participants
+        self.counts: dict[str, int] = {}
+
+    async def get_event_participants(self, event_id):
+        return self.participants
+
+    async def outbox_batch_progress(self, batch_key):
+        return self.counts
+
+
+class StubOutbox:
+    def __init__(self) -> None:
+        self.messages = []
+
+    async def enqueue_many(self, messages):
+        self.messages.extend(messages)
+        return len(self.messages)
+
+
+class SentMessage:
+    message_id = 99
+
+
+class StubBot:
+    def __init__(self) -> None:
+        self.sent: list[tuple[int, str]] = []
+        self.edits: list[str] = []
+
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+        return SentMessage()
+
+    async def edit_message_text(self, text, chat_id, message_id):
+        self.edits.append(text)
+
+
+def test_unique_recipients_dedupes_and_excludes_owner():
+    participants = [
+        {"user_id": 1, "tg_id": 100},
+        {"user_id": 2, "tg_id": 200},
+        {"user_id": 3, "tg_id": 200},
+        {"user_id": 4, "tg_id": None},
+    ]
+    assert unique_recipients(participants, exclude_user_ids=[1]) == [200]
+
+
+def test_format_progress():
+    assert "3 из 10" in format_progress(BroadcastProgress(total=10, sent=3))
+    done = format_progress(BroadcastProgress(total=2, sent=1, failed=1))
+    assert done.startswith("✅") and "не доставлено: 1" in done
+
+
+@pytest.mark.asyncio
+async def test_broadcast_enqueues_and_reports_in_one_message():
+    repo = StubRepo([{"user_id": 1, "tg_id": 100}, {"user_id": 2, "tg_id": 200}, {"user_id": 3, "tg_id": 300}])
+    outbox = StubOutbox()
+    bot = StubBot()
+
+    total = await broadcast_to_participants(
+        bot, repo, outbox, event_id=5, text="hi", progress_chat_id=100, exclude_user_ids=[1]
+    )
+
+    assert total == 2
+    assert [m.chat_id for m in outbox.messages] == [200, 300]
+    assert len({m.batch_key for m in outbox.messages}) == 1
+    assert len(bot.sent) == 1
+
+    repo.counts = {"sent": 2}
+    batch_key = outbox.messages[0].batch_key
+    await broadcast._track_progress(bot, repo, 100, 99, batch_key, BroadcastProgress(total=2), interval=0)
+    assert bot.edits == ["✅ Рассылка завершена: доставлено 2 из 2"]
+    for task in list(broadcast._progress_tasks):
+        task.cancel()
@@ -0,0 +1,162 @@
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.filters import Command
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import CallbackQuery, Message, Update
+
+from partyshare.callbacks import (
+    CallbackTable,
+    EventNav,
+    ManageEdit,
+    OwnerEvent,
+    check_duplicate_commands,
+)
+from partyshare.middlewares.early_ack import EarlyAckMiddleware
+
+
+class RecordingSession(BaseSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+def callback_update(data: str) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": 1,
+            "callback_query": {
+                "id": "cb1",
+                "chat_instance": "ci",
+                "data": data,
+                "from": {"id": 7, "is_bot": False, "first_name": "U"},
+                "message": {
+                    "message_id": 1,
+                    "date": 1,
+                    "chat": {"id": 7, "type": "private"},
+                    "text": "menu",
+                },
+            },
+        }
+    )
+
+
+def make_table():
+    table = CallbackTable()
+    calls: list = []
+
+    @table.exact("menu:main")
+    async def main_menu(callback: CallbackQuery) -> None:
+        calls.append(("main", None))
+
+    @table.prefix(OwnerEvent, early_ack=True)
+    async def owner(callback: CallbackQuery, data: OwnerEvent) -> None:
+        calls.append(("owner", data.event_id))
+
+    @table.prefix(ManageEdit)
+    async def manage_edit(callback: CallbackQuery, data: ManageEdit) -> None:
+        calls.append(("edit", (data.field, data.event_id)))
+
+    return table, calls
+
+
+def test_resolve_exact_and_prefix():
+    table, _ = make_table()
+
+    route, payload = table.resolve("menu:main")
+    assert route.name == "main_menu" and payload is None
+
+    route, payload = table.resolve(OwnerEvent(event_id=42).pack())
+    assert route.name == "owner" and route.early_ack
+    assert payload == OwnerEvent(event_id=42)
+
+    route, payload = table.resolve("manage_edit:title:5")
+    assert (payload.field, payload.event_id) == ("title", 5)
+
+
+@pytest.mark.parametrize("data", ["owner:abc", "owner", "manage_edit:title", "unknown:1", "menu:other"])
+def test_resolve_rejects_unknown_and_malformed(data):
+    table, _ = make_table()
+    assert table.resolve(data) is None
+
+
+def test_duplicate_registration_fails():
+    table, _ = make_table()
+
+    async def again(callback: CallbackQuery, data: OwnerEvent) -> None:
+        pass
+
+    with pytest.raises(RuntimeError, match="owner"):
+        table.prefix(OwnerEvent)(again)
+    with pytest.raises(RuntimeError, match="main_menu"):
+        table.exact("menu:main")(again)
+
+
+def test_event_nav_round_trip():
+    packed = EventNav(view="owner", direction="next").pack()
+    assert packed == "event_nav:owner:next"
+
+
+@pytest.mark.asyncio
+async def test_dispatch_through_router_with_early_ack():
+    table, calls = make_table()
+    session = RecordingSession()
+    bot = Bot("123:test", session=session)
+    router = Router()
+    table.attach(router)
+    dp = Dispatcher()
+    dp.include_router(router)
+    dp.callback_query.middleware(EarlyAckMiddleware(max_concurrency=2))
+
+    await dp.feed_update(bot, callback_update("owner:9"))
+    await dp.feed_update(bot, callback_update("manage_edit:notes:3"))
+
+    assert calls == [("owner", 9), ("edit", ("notes", 3))]
+    # early_ack взят из маршрута: на owner ответили заранее
+    assert [type(call) for call in session.calls] == [AnswerCallbackQuery]
+
+
+@pytest.mark.asyncio
+async def test_stale_button_is_answered():
+    table, calls = make_table()
+    session = RecordingSession()
+    bot = Bot("123:test", session=session)
+    router = Router()
+    table.attach(router)
+    dp = Dispatcher()
+    dp.include_router(router)
+
+    await dp.feed_update(bot, callback_update("owner:not-a-number"))
+
+    assert calls == []
+    assert len(session.calls) == 1
+    assert session.calls[0].text == "Кнопка устарела, откройте меню заново"
+
+
+def test_duplicate_commands_detected():
+    first, second = Router(), Router()
+
+    @first.message(Command("join"))
+    async def cmd_join(message: Message) -> None:
+        pass
+
+    @second.message(Command("join"))
+    async def cmd_join_again(message: Message) -> None:
+        pass
+
+    dp = Dispatcher()
+    dp.include_router(first)
+    check_duplicate_commands(dp)
+    dp.include_router(second)
+    with pytest.raises(RuntimeError, match="/join"):
+        check_duplicate_commands(dp)
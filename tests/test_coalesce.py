@@ -0,0 +1,274 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import AnswerCallbackQuery, EditMessageText
+from aiogram.types import CallbackQuery
+
+from partyshare.callbacks import CycleStatus
+from partyshare.coalesce import WriteCoalescer, status_writes
+from partyshare.config import get_settings
+from partyshare.db import repo as repo_module
+from partyshare.db.models import ParticipantStatus
+from partyshare.handlers import events as events_module
+from partyshare.handlers.events import build_myevents_view, cb_cycle_status
+from partyshare.state import PARTICIPANT_VIEW, state
+
+
+@pytest.mark.asyncio
+async def test_only_last_value_is_written():
+    written: list = []
+    coalescer = WriteCoalescer("test", window=0.05)
+
+    async def flush(value):
+        written.append(value)
+
+    for value in range(5):
+        coalescer.submit("k", value, flush)
+    assert coalescer.pending("k") == 4
+    assert written == []
+
+    await asyncio.sleep(0.1)
+    assert written == [4]
+    assert coalescer.pending("k") is None
+
+
+@pytest.mark.asyncio
+async def test_max_delay_bounds_the_window():
+    written: list = []
+    coalescer = WriteCoalescer("test", window=0.05, max_delay=0.12)
+
+    async def flush(value):
+        written.append(value)
+
+    for value in range(8):
+        coalescer.submit("k", value, flush)
+        await asyncio.sleep(0.03)
+    await asyncio.sleep(0.1)
+    # окно всё время продлевалось, но запись случилась не позже max_delay
+    assert len(written) >= 2
+    assert written[-1] == 7
+
+
+@pytest.mark.asyncio
+async def test_pending_visible_while_writing_and_errors_logged():
+    release = asyncio.Event()
+    calls: list = []
+    coalescer = WriteCoalescer("test", window=0)
+
+    async def slow(value):
+        calls.append(value)
+        await release.wait()
+        raise RuntimeError("db down")
+
+    coalescer.submit("k", "v", slow)
+    await asyncio.sleep(0)
+    assert calls == ["v"]
+    assert coalescer.pending("k") == "v"
+
+    release.set()
+    await coalescer.flush_all()
+    assert coalescer.pending("k") is None
+
+
+@pytest.mark.asyncio
+async def test_flush_all_writes_immediately():
+    written: list = []
+    coalescer = WriteCoalescer("test", window=60)
+
+    async def flush(value):
+        written.append(value)
+
+    coalescer.submit("a", 1, flush)
+    coalescer.submit("b", 2, flush)
+    await coalescer.flush_all()
+    assert sorted(written) == [1, 2]
+    assert len(coalescer) == 0
+
+
+@pytest.mark.asyncio
+async def test_next_write_waits_for_running_one():
+    release = asyncio.Event()
+    events: list = []
+    coalescer = WriteCoalescer("test", window=0)
+
+    async def flush(value):
+        events.append(("start", value))
+        if value == 1:
+            await release.wait()
+        events.append(("done", value))
+
+    coalescer.submit("k", 1, flush)
+    await asyncio.sleep(0)
+    coalescer.submit("k", 2, flush)
+    await asyncio.sleep(0.01)
+    assert events == [("start", 1)]
+    assert coalescer.pending("k") == 2
+
+    release.set()
+    await coalescer.flush_all()
+    assert events == [("start", 1), ("done", 1), ("start", 2), ("done", 2)]
+
+
+@pytest.mark.asyncio
+async def test_discard_drops_pending_and_waits_for_running_write():
+    release = asyncio.Event()
+    written: list = []
+    coalescer = WriteCoalescer("test", window=60)
+
+    async def flush(value):
+        await release.wait()
+        written.append(value)
+
+    coalescer.submit("k", 1, flush)
+    await coalescer.discard("k")
+    assert coalescer.pending("k") is None
+
+    coalescer.configure(window=0)
+    coalescer.submit("k", 2, flush)
+    await asyncio.sleep(0)
+    asyncio.get_running_loop().call_later(0.01, release.set)
+    await coalescer.discard("k")
+    assert written == [2]
+
+
+class RecordingSession(BaseSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeRepo:
+    def __init__(self) -> None:
+        self.queries: list = []
+        self.status = "going"
+        self.member = True
+
+    async def ensure_user(self, tg_id, username, full_name):
+        self.queries.append("ensure_user")
+        return 100
+
+    async def get_participant(self, event_id, user_id):
+        self.queries.append("get_participant")
+        return {"status": self.status} if self.member else None
+
+    async def list_participant_events(self, user_id, listing, limit):
+        self.queries.append("list_participant_events")
+        starts_at = datetime.now(timezone.utc) + timedelta(days=1)
+        return [{"id": 5, "title": "Вечеринка", "starts_at": starts_at, "status": self.status}]
+
+    async def update_participant_status(self, event_id, user_id, status):
+        self.queries.append("update_participant_status")
+        if not self.member:
+            return False
+        self.status = status
+        return True
+
+
+def status_callback(bot: Bot, status_label: str) -> CallbackQuery:
+    return CallbackQuery.model_validate(
+        {
+            "id": "cb",
+            "chat_instance": "ci",
+            "data": "cycle_status:5",
+            "from": {"id": 7, "is_bot": False, "first_name": "U"},
+            "message": {
+                "message_id": 1,
+                "date": 1,
+                "chat": {"id": 7, "type": "private"},
+                "text": f"#5 Вечеринка\nСтатус: {status_label}",
+                "reply_markup": {
+                    "inline_keyboard": [
+                        [{"text": f"Статус: {status_label}", "callback_data": "cycle_status:5"}]
+                    ]
+                },
+            },
+        },
+        context={"bot": bot},
+    )
+
+
+@pytest.fixture
+def status_env(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "123:test")
+    monkeypatch.setenv("DATABASE_URL", "postgresql://localhost/test")
+    get_settings.cache_clear()
+    repo = FakeRepo()
+    monkeypatch.setattr(repo_module, "_global_repo", repo)
+    monkeypatch.setattr(status_writes, "window", 0.05)
+    monkeypatch.setattr(events_module, "_status_cards", events_module.TTLCache(ttl=60, max_entries=100))
+    session = RecordingSession()
+    yield repo, session, Bot("123:test", session=session)
+    state.clear_user(7)
+    get_settings.cache_clear()
+
+
+def edits(session: RecordingSession) -> list[EditMessageText]:
+    return [call for call in session.calls if isinstance(call, EditMessageText)]
+
+
+@pytest.mark.asyncio
+async def test_five_taps_cost_one_write(status_env):
+    repo, session, bot = status_env
+    await build_myevents_view(100, 7, active_view=PARTICIPANT_VIEW)
+    repo.queries.clear()
+
+    labels = ["иду", "возможно", "не иду", "иду", "возможно"]
+    for label in labels:
+        await cb_cycle_status(status_callback(bot, label), CycleStatus(event_id=5))
+
+    # участие и статус берутся из показанной карточки, запись в БД — одна
+    assert repo.queries == []
+    assert status_writes.pending((5, 7)) == (100, ParticipantStatus.DECLINED)
+    first, *_, last = edits(session)
+    assert first.text.endswith("Статус: возможно")
+    assert "#5 Вечеринка" in last.text and last.text.endswith("Статус: не иду")
+    assert last.reply_markup.inline_keyboard[-1][0].text == "Статус: не иду"
+    assert sum(isinstance(call, AnswerCallbackQuery) for call in session.calls) == 5
+
+    await asyncio.sleep(0.1)
+    assert repo.queries == ["update_participant_status"]
+    assert repo.status == ParticipantStatus.DECLINED.value
+
+
+@pytest.mark.asyncio
+async def test_tap_without_shown_card_checks_membership(status_env):
+    repo, session, bot = status_env
+
+    await cb_cycle_status(status_callback(bot, "иду"), CycleStatus(event_id=5))
+    assert repo.queries == ["ensure_user", "get_participant", "list_participant_events"]
+    assert edits(session)[-1].text.endswith("Статус: возможно")
+
+    # перерисованная карточка запомнилась: следующее нажатие без запросов
+    await cb_cycle_status(status_callback(bot, "возможно"), CycleStatus(event_id=5))
+    assert len(repo.queries) == 3
+    assert edits(session)[-1].text.endswith("Статус: не иду")
+
+
+@pytest.mark.asyncio
+async def test_removed_participant_is_rechecked(status_env):
+    repo, session, bot = status_env
+    await build_myevents_view(100, 7, active_view=PARTICIPANT_VIEW)
+    repo.member = False
+
+    await cb_cycle_status(status_callback(bot, "иду"), CycleStatus(event_id=5))
+    await asyncio.sleep(0.1)
+    # запись не вернула участника, и карточка забыта
+    assert repo.status == "going"
+    repo.queries.clear()
+    await cb_cycle_status(status_callback(bot, "иду"), CycleStatus(event_id=5))
+    assert repo.queries == ["ensure_user", "get_participant"]
+    answer = [call for call in session.calls if isinstance(call, AnswerCallbackQuery)][-1]
+    assert answer.show_alert
@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from partyshare.services.digest import iter_digests, render_digest
+
+
+async def stream(rows):
+    for row in rows:
+        yield row
+
+
+def event_row(tg_id, title, status="going"):
+    return {
+        "tg_id": tg_id,
+        "kind": "event",
+        "event_id": 1,
+        "title": title,
+        "starts_at": datetime(2026, 10, 20, 18, 0, tzinfo=timezone.utc),
+        "status": status,
+        "balance_cents": None,
+    }
+
+
+def debt_row(tg_id, title, balance):
+    return {
+        "tg_id": tg_id,
+        "kind": "debt",
+        "event_id": 2,
+        "title": title,
+        "starts_at": datetime(2026, 10, 1, 18, 0, tzinfo=timezone.utc),
+        "status": None,
+        "balance_cents": balance,
+    }
+
+
+def test_render_digest_events_and_debts():
+    text = render_digest(
+        [event_row(1, "Пикник"), debt_row(1, "Бар", -1250), debt_row(1, "Кино", 300)],
+        timezone.utc,
+    )
+    assert "20.10 18:00 — Пикник (иду)" in text
+    assert "Бар: ты должен 12.50 EUR" in text
+    assert "Кино: тебе должны 3.00 EUR" in text
+
+
+@pytest.mark.asyncio
+async def test_iter_digests_groups_by_tg_id():
+    rows = [event_row(1, "A"), debt_row(1, "B", -100), event_row(2, "C"), debt_row(3, "D", 50)]
+
+    digests = [item async for item in iter_digests(stream(rows), timezone.utc)]
+
+    assert [tg_id for tg_id, _ in digests] == [1, 2, 3]
+    assert "A" in digests[0][1] and "B" in digests[0][1]
+    assert "C" in digests[1][1]
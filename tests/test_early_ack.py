@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+from aiogram.types import CallbackQuery, Update
+
+from partyshare.middlewares.early_ack import (
+    EARLY_ACK,
+    EarlyAckMiddleware,
+    answer_once,
+    callback_errors,
+)
+from partyshare.services.authz import AuthorizationError
+
+
+class RecordingSession(BaseSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+def callback_update(data: str) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": 1,
+            "callback_query": {
+                "id": "cb1",
+                "chat_instance": "ci",
+                "data": data,
+                "from": {"id": 7, "is_bot": False, "first_name": "U"},
+                "message": {
+                    "message_id": 1,
+                    "date": 0,
+                    "chat": {"id": 7, "type": "private"},
+                    "text": "menu",
+                },
+            },
+        }
+    )
+
+
+@pytest.fixture
+def setup():
+    session = RecordingSession()
+    bot = Bot("123:test", session=session)
+    router = Router()
+    dp = Dispatcher()
+    dp.include_router(router)
+    dp.callback_query.middleware(EarlyAckMiddleware(max_concurrency=2))
+    return bot, dp, router, session
+
+
+@pytest.mark.asyncio
+async def test_ack_sent_before_work_finishes(setup):
+    bot, dp, router, session = setup
+    release = asyncio.Event()
+    seen_on_start: list = []
+
+    @router.callback_query(F.data == "slow", flags={EARLY_ACK: True})
+    async def slow(callback: CallbackQuery) -> None:
+        seen_on_start.extend(type(call) for call in session.calls)
+        await release.wait()
+        await answer_once(callback, "Событие не найдено")
+
+    feed = asyncio.create_task(dp.feed_update(bot, callback_update("slow")))
+    await asyncio.sleep(0.01)
+    assert seen_on_start == [AnswerCallbackQuery]
+
+    release.set()
+    await feed
+    assert [type(call) for call in session.calls] == [AnswerCallbackQuery, SendMessage]
+    assert session.calls[1].text == "Событие не найдено"
+
+
+@pytest.mark.asyncio
+async def test_errors_reported_to_user(setup):
+    bot, dp, router, session = setup
+    before = callback_errors.value(handler="broken")
+
+    @router.callback_query(F.data == "broken", flags={EARLY_ACK: True})
+    async def broken(callback: CallbackQuery) -> None:
+        raise RuntimeError("db down")
+
+    await dp.feed_update(bot, callback_update("broken"))
+    assert callback_errors.value(handler="broken") == before + 1
+    assert isinstance(session.calls[-1], SendMessage)
+
+
+@pytest.mark.asyncio
+async def test_authorization_error_shown_not_counted(setup):
+    bot, dp, router, session = setup
+    before = callback_errors.value(handler="owner_only")
+
+    @router.callback_query(F.data == "owner_only", flags={EARLY_ACK: True})
+    async def owner_only(callback: CallbackQuery) -> None:
+        raise AuthorizationError("Только владелец события может выполнять это действие.")
+
+    await dp.feed_update(bot, callback_update("owner_only"))
+    assert callback_errors.value(handler="owner_only") == before
+    assert session.calls[-1].text == "Только владелец события может выполнять это действие."
+
+
+@pytest.mark.asyncio
+async def test_unflagged_handlers_answer_themselves(setup):
+    bot, dp, router, session = setup
+
+    @router.callback_query(F.data == "plain")
+    async def plain(callback: CallbackQuery) -> None:
+        await answer_once(callback, "ok")
+
+    await dp.feed_update(bot, callback_update("plain"))
+    assert len(session.calls) == 1
+    assert session.calls[0].text == "ok"
@@ -0,0 +1,146 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage
+from aiogram.types import Message
+
+from partyshare.db import repo as repo_module
+from partyshare.db.repo import COPY_THRESHOLD, PartyShareRepository
+from partyshare.handlers.expenses import cmd_additem
+from partyshare.services.entries import parse_amount, parse_batch, parse_expense, parse_item
+
+
+def test_amounts_are_exact():
+    assert parse_amount("0.29") == 29
+    assert parse_amount("12,5") == 1250
+    for bad in ["abc", "-1", "0", "nan"]:
+        with pytest.raises(ValueError):
+            parse_amount(bad)
+
+
+def test_single_line_form_still_works():
+    batch = parse_batch("5 | Пицца | 30 usd | items", parse_expense)
+    assert batch.target_id == 5 and batch.errors == []
+    entry = batch.entries[0]
+    assert (entry.title, entry.amount_cents, entry.currency, entry.is_shared) == ("Пицца", 3000, "USD", False)
+
+
+def test_multi_line_collects_all_errors():
+    text = "7\nСалат | 8.50 | @anna @boris\n\nСуп | много\nХлеб\nКофе | 3"
+    batch = parse_batch(text, parse_item)
+    assert batch.target_id == 7
+    assert [entry.label for entry in batch.entries] == ["Салат", "Кофе"]
+    assert batch.entries[0].usernames == ["@anna", "@boris"]
+    assert batch.errors == [
+        "Строка 4: некорректная сумма",
+        "Строка 5: ожидается «название | сумма | @u1 @u2»",
+    ]
+    assert parse_batch("Пицца | 30", parse_expense).target_id is None
+
+
+class FakeConn:
+    def __init__(self, calls: list) -> None:
+        self.calls = calls
+
+    async def fetch(self, query: str, *args):
+        self.calls.append(("nextval", args[0]))
+        return [{"id": 100 + n} for n in range(args[0])]
+
+    async def execute(self, query: str, *args):
+        self.calls.append(("insert", query.split("INTO")[1].split()[0], len(args[0])))
+        return "INSERT"
+
+    async def copy_records_to_table(self, table, *, records, columns):
+        self.calls.append(("copy", table, len(records)))
+
+
+class ReceiptDB:
+    def __init__(self) -> None:
+        self.calls: list = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.calls.append("begin")
+        yield FakeConn(self.calls)
+        self.calls.append("commit")
+
+    async def fetch(self, query: str, *args):
+        self.calls.append("resolve")
+        return [{"id": 10 + n, "username": name} for n, name in enumerate(args[0])]
+
+    async def fetchrow(self, query: str, *args):
+        if "FROM expenses" in query:
+            return {"id": args[0], "event_id": 5}
+        return {"id": 1}
+
+    async def fetchval(self, query: str, *args):
+        return args[1]
+
+
+@pytest.mark.asyncio
+async def test_small_batch_uses_insert_large_uses_copy():
+    db = ReceiptDB()
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+
+    ids = await repo.add_expense_items(1, [("Суп", 500, [10, 10, 11]), ("Хлеб", 100, [])])
+    assert ids == [100, 101]
+    assert db.calls == [
+        "begin",
+        ("nextval", 2),
+        ("insert", "expense_items", 2),
+        ("insert", "expense_item_consumers", 2),
+        "commit",
+    ]
+
+    db.calls.clear()
+    await repo.add_expense_items(1, [(f"#{n}", 100, [10, 11]) for n in range(COPY_THRESHOLD)])
+    assert db.calls[2:] == [
+        ("copy", "expense_items", COPY_THRESHOLD),
+        ("copy", "expense_item_consumers", 2 * COPY_THRESHOLD),
+        "commit",
+    ]
+
+
+class RecordingSession(BaseSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_receipt_in_one_message(monkeypatch):
+    db = ReceiptDB()
+    monkeypatch.setattr(repo_module, "_global_repo", PartyShareRepository(db))  # type: ignore[arg-type]
+    session = RecordingSession()
+    bot = Bot("123:test", session=session)
+    lines = [f"Блюдо {n} | {n + 1}.50 | @guest{n % 12} @guest{(n + 1) % 12}" for n in range(25)]
+    message = Message.model_validate(
+        {
+            "message_id": 1,
+            "date": 1,
+            "chat": {"id": 7, "type": "private"},
+            "from": {"id": 7, "is_bot": False, "first_name": "Owner"},
+            "text": "/additem 3\n" + "\n".join(lines),
+        },
+        context={"bot": bot},
+    )
+
+    await cmd_additem(message)
+
+    assert db.calls.count("resolve") == 1
+    assert db.calls.count("begin") == 1
+    replies = [call.text for call in session.calls if isinstance(call, SendMessage)]
+    assert len(replies) == 1
+    assert replies[0].startswith("Добавлено позиций: 25 на сумму 337.50")
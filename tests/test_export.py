@@ -0,0 +1,156 @@
+import csv
+import io
+from datetime import datetime, timezone
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendDocument
+from aiogram.types import Message
+
+from partyshare.config import get_settings
+from partyshare.db import repo as repo_module
+from partyshare.db.repo import PartyShareRepository
+from partyshare.handlers.expenses import cmd_export
+from partyshare.services.export import LEDGER_HEADER, format_cents, ledger_row
+from partyshare.utils.csvfile import CsvInputFile
+
+
+def test_format_cents():
+    assert format_cents(1250) == "12.50"
+    assert format_cents(-5) == "-0.05"
+    assert format_cents(None) == ""
+
+
+async def read_all(file: CsvInputFile) -> list[bytes]:
+    return [chunk async for chunk in file.read(None)]  # type: ignore[arg-type]
+
+
+@pytest.mark.asyncio
+async def test_csv_is_written_in_bounded_chunks():
+    produced = 0
+
+    async def rows():
+        nonlocal produced
+        for n in range(5_000):
+            produced += 1
+            yield [n, f"Позиция {n}", "1.00"]
+
+    file = CsvInputFile(rows, ["id", "label", "amount"], "items.csv", chunk_size=4096)
+    chunks = await read_all(file)
+
+    assert len(chunks) > 10
+    # чанк — не больше порога (в символах) плюс одна строка
+    assert max(len(chunk.decode()) for chunk in chunks[:-1]) < 4096 + 100
+    text = b"".join(chunks).decode("utf-8-sig")
+    parsed = list(csv.reader(io.StringIO(text)))
+    assert parsed[0] == ["id", "label", "amount"]
+    assert parsed[-1] == ["4999", "Позиция 4999", "1.00"]
+
+    # повторное чтение заново запрашивает строки
+    await read_all(file)
+    assert produced == 10_000
+
+
+def ledger_record(item_id, consumers):
+    return {
+        "event_id": 5,
+        "event_title": "Вечеринка",
+        "expense_id": 9,
+        "created_at": datetime(2026, 10, 1, 18, 30, tzinfo=timezone.utc),
+        "expense_title": "Ужин",
+        "payer": "@anna",
+        "currency": "EUR",
+        "amount_cents": 4200,
+        "is_shared": item_id is None,
+        "item_id": item_id,
+        "item_label": "Пицца" if item_id else None,
+        "item_amount_cents": 1450 if item_id else None,
+        "consumers": consumers,
+    }
+
+
+def test_ledger_row():
+    row = ledger_row(ledger_record(3, "@anna @boris"), timezone.utc)
+    assert dict(zip(LEDGER_HEADER, row, strict=True)) == {
+        "event_id": 5,
+        "event": "Вечеринка",
+        "expense_id": 9,
+        "created_at": "2026-10-01 18:30",
+        "expense": "Ужин",
+        "payer": "@anna",
+        "currency": "EUR",
+        "expense_amount": "42.00",
+        "split": "items",
+        "item_id": 3,
+        "item": "Пицца",
+        "item_amount": "14.50",
+        "consumers": "@anna @boris",
+    }
+    assert ledger_row(ledger_record(None, None), timezone.utc)[8:] == ["shared", "", "", "", ""]
+
+
+class CursorDB:
+    def __init__(self) -> None:
+        self.cursors: list[str] = []
+
+    async def fetchrow(self, query: str, *args):
+        return {"id": 1}
+
+    async def fetchval(self, query: str, *args):
+        return args[1]
+
+    async def cursor(self, query: str, *args, prefetch: int = 500):
+        self.cursors.append("balances" if "FROM balances" in query else "ledger")
+        if "FROM balances" in query:
+            yield {"event_id": 5, "event_title": "Вечеринка", "user_name": "@anna", "balance_cents": -700}
+        else:
+            yield ledger_record(3, "@anna")
+
+
+class RecordingSession(BaseSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_export_streams_two_documents(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "123:test")
+    monkeypatch.setenv("DATABASE_URL", "postgresql://localhost/test")
+    get_settings.cache_clear()
+    db = CursorDB()
+    monkeypatch.setattr(repo_module, "_global_repo", PartyShareRepository(db))  # type: ignore[arg-type]
+    session = RecordingSession()
+    bot = Bot("123:test", session=session)
+    message = Message.model_validate(
+        {
+            "message_id": 1,
+            "date": 1,
+            "chat": {"id": 7, "type": "private"},
+            "from": {"id": 7, "is_bot": False, "first_name": "Anna"},
+            "text": "/export 5",
+        },
+        context={"bot": bot},
+    )
+
+    await cmd_export(message)
+    get_settings.cache_clear()
+
+    documents = [call.document for call in session.calls if isinstance(call, SendDocument)]
+    assert [doc.filename for doc in documents] == ["event_5_expenses.csv", "event_5_balances.csv"]
+    # запросы выполняются только при чтении файла загрузчиком
+    assert db.cursors == []
+    balances = b"".join(await read_all(documents[1])).decode("utf-8-sig")
+    assert balances.splitlines() == ["event_id,event,user,balance", "5,Вечеринка,@anna,-7.00"]
+    assert db.cursors == ["balances"]
@@ -0,0 +1,143 @@
+from datetime import datetime, timezone
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import AnswerInlineQuery, GetMe
+from aiogram.types import InlineQuery, User
+
+from partyshare.config import get_settings
+from partyshare.db import repo as repo_module
+from partyshare.db.repo import PartyShareRepository
+from partyshare.handlers.inline import INLINE_CACHE_TIME, _cards, inline_query_handler
+
+
+class RecordingSession(BaseSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name="Bot", username="party_bot")
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class CountingDB:
+    def __init__(self) -> None:
+        self.queries: list[str] = []
+        self.event = {
+            "id": 42,
+            "owner_id": 10,
+            "title": "Вечеринка",
+            "starts_at": datetime(2026, 5, 10, 18, 0, tzinfo=timezone.utc),
+            "location": "Бар",
+            "notes": None,
+            "version": 0,
+        }
+
+    async def fetchrow(self, query: str, *args):
+        self.queries.append(query.split()[0])
+        if "INSERT INTO users" in query:
+            return {"id": 10 if args[0] == 7 else 11}
+        if "FROM events" in query:
+            return self.event if args[0] == 42 else None
+        if "INSERT INTO event_invite_links" in query:
+            return {"token": args[1], "expires_at": None}
+        return None
+
+    async def execute(self, query: str, *args):
+        self.queries.append(query.split()[0])
+        return "UPDATE 1"
+
+
+def inline_query(bot: Bot, user_id: int, query: str) -> InlineQuery:
+    return InlineQuery.model_validate(
+        {
+            "id": "iq",
+            "from": {"id": user_id, "is_bot": False, "first_name": "Owner"},
+            "query": query,
+            "offset": "",
+        },
+        context={"bot": bot},
+    )
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "123:test")
+    monkeypatch.setenv("DATABASE_URL", "postgresql://localhost/test")
+    get_settings.cache_clear()
+    db = CountingDB()
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+    monkeypatch.setattr(repo_module, "_global_repo", repo)
+    session = RecordingSession()
+    yield Bot("123:test", session=session), db, repo, session
+    get_settings.cache_clear()
+
+
+def answers(session: RecordingSession) -> list[AnswerInlineQuery]:
+    return [call for call in session.calls if isinstance(call, AnswerInlineQuery)]
+
+
+@pytest.mark.asyncio
+async def test_owner_keystrokes_after_first_cost_one_lookup(setup):
+    bot, db, repo, session = setup
+
+    await inline_query_handler(inline_query(bot, 7, "invite_42"), bot)
+    first = len(db.queries)
+    assert first > 0
+    for _ in range(5):
+        await inline_query_handler(inline_query(bot, 7, "invite_42"), bot)
+
+    # карточка и ссылка берутся из кэша, читается только версия события
+    assert db.queries[first:] == ["SELECT"] * 5
+    answer = answers(session)[-1]
+    assert answer.cache_time == INLINE_CACHE_TIME and answer.is_personal
+    article = answer.results[0]
+    assert "party_bot?start=invite_" in article.reply_markup.inline_keyboard[0][0].url
+
+
+@pytest.mark.asyncio
+async def test_card_hidden_from_non_owner_and_rebuilt_on_change(setup):
+    bot, db, repo, session = setup
+
+    await inline_query_handler(inline_query(bot, 7, "invite_42"), bot)
+    await inline_query_handler(inline_query(bot, 8, "invite_42"), bot)
+    assert answers(session)[-1].results == []
+
+    # событие изменил другой процесс: в этом процессе записей не было
+    db.event = {**db.event, "title": "Новая вечеринка", "version": 1}
+    await inline_query_handler(inline_query(bot, 7, "invite_42"), bot)
+    assert answers(session)[-1].results[0].title == "🎉 Новая вечеринка"
+
+
+@pytest.mark.asyncio
+async def test_ensure_user_cached_until_profile_changes(setup):
+    bot, db, repo, session = setup
+
+    assert await repo.ensure_user(7, "owner", "Owner") == 10
+    assert await repo.ensure_user(7, "owner", "Owner") == 10
+    assert db.queries == ["INSERT"]
+
+    await repo.ensure_user(7, "renamed", "Owner")
+    assert db.queries == ["INSERT", "INSERT"]
+
+
+@pytest.mark.asyncio
+async def test_non_owner_creates_no_link_and_no_card(setup):
+    bot, db, repo, session = setup
+    _cards.clear()
+    await inline_query_handler(inline_query(bot, 8, "invite_42"), bot)
+
+    assert answers(session)[-1].results == []
+    # единственная вставка — сам пользователь, ссылка не создавалась
+    assert db.queries.count("INSERT") == 1
+    assert len(_cards) == 0
@@ -2,38 +2,67 @@ from datetime import datetime, timedelta, timezone
 
 import pytest
 
+from partyshare.db.models import InviteResult
 from partyshare.db.repo import PartyShareRepository
 
 
-class DummyDB:
+class RedeemDB:
     def __init__(self) -> None:
-        self.links = {}
+        self.queries = 0
+        self.rows = {}
 
     async def fetchrow(self, query: str, *args):
-        if "event_invite_links" in query:
-            token = args[0]
-            return self.links.get(token)
-        return None
+        self.queries += 1
+        if "INSERT INTO event_invite_links" in query:
+            return {"token": args[1]}
+        return self.rows.get(args[0], {"result": "not_found", "event_id": None})
 
-    async def execute(self, query: str, *args):
-        return "OK"
+    async def fetch(self, query: str, *args):
+        self.queries += 1
+        return [{"token": token} for token in self.rows]
 
 
 @pytest.mark.asyncio
-async def test_invitelink_expired():
-    db = DummyDB()
+async def test_unknown_token_cached_negatively():
+    db = RedeemDB()
     repo = PartyShareRepository(db)  # type: ignore[arg-type]
-    token = "abc"
-    db.links[token] = {
-        "id": 1,
-        "event_id": 1,
-        "token": token,
-        "max_uses": None,
-        "uses": 0,
-        "expires_at": datetime.now(timezone.utc) - timedelta(hours=1),
-    }
-
-    link = await repo.get_invite_link_by_token(token)
-    assert link is not None
-    assert link["expires_at"] < datetime.now(timezone.utc)
 
+    assert (await repo.redeem_invite("bogus", 1, "going"))[0] is InviteResult.NOT_FOUND
+    assert (await repo.redeem_invite("bogus", 2, "going"))[0] is InviteResult.NOT_FOUND
+    assert repo.cached_invite_rejection("bogus") is InviteResult.NOT_FOUND
+    assert db.queries == 1
+
+    # созданная ссылка с тем же токеном сбрасывает отрицательную запись
+    await repo.add_invite_link(1, "bogus", None, None)
+    assert repo.cached_invite_rejection("bogus") is None
+
+
+@pytest.mark.asyncio
+async def test_exhausted_and_expired_tokens_skip_database():
+    db = RedeemDB()
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.rows["full"] = {"result": "exhausted", "link_expires_at": None, "event_id": 1}
+    db.rows["old"] = {"result": "joined", "link_expires_at": past, "event_id": 1}
+
+    await repo.redeem_invite("full", 1, "going")
+    await repo.redeem_invite("old", 1, "going")
+    queries = db.queries
+
+    assert (await repo.redeem_invite("full", 2, "going"))[0] is InviteResult.EXHAUSTED
+    assert (await repo.redeem_invite("old", 2, "going"))[0] is InviteResult.EXPIRED
+    assert db.queries == queries
+
+
+@pytest.mark.asyncio
+async def test_joined_token_still_checked_in_database():
+    db = RedeemDB()
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+    db.rows["hot"] = {"result": "joined", "link_expires_at": None, "event_id": 1}
+
+    for user_id in range(3):
+        await repo.redeem_invite("hot", user_id, "going")
+    assert db.queries == 3
+
+    assert await repo.revoke_invite_links(1) == ["hot"]
+    assert repo.cached_invite_rejection("hot") is InviteResult.EXPIRED
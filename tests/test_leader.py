@@ -0,0 +1,98 @@
+import pytest
+
+from partyshare.leader import LeaderElector, leader_gauge
+
+
+class FakeLocks:
+    def __init__(self) -> None:
+        self.holders: dict[int, object] = {}
+
+
+class FakeConnection:
+    def __init__(self, locks: FakeLocks) -> None:
+        self.locks = locks
+        self.closed = False
+        self.listeners = []
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    def add_termination_listener(self, callback) -> None:
+        self.listeners.append(callback)
+
+    async def fetchval(self, query: str, *args, timeout=None):
+        if self.closed:
+            raise ConnectionResetError("connection is closed")
+        if "pg_try_advisory_lock" in query:
+            holder = self.locks.holders.setdefault(args[0], self)
+            return holder is self
+        return 1
+
+    async def execute(self, query: str, *args):
+        self.locks.holders.pop(args[0], None)
+
+    async def close(self) -> None:
+        self.drop()
+
+    def terminate(self) -> None:
+        self.drop()
+
+    def drop(self) -> None:
+        # Postgres снимает сессионные блокировки при разрыве соединения
+        self.closed = True
+        for key, holder in list(self.locks.holders.items()):
+            if holder is self:
+                del self.locks.holders[key]
+        for callback in self.listeners:
+            callback(self)
+
+
+class FakeDB:
+    def __init__(self, locks: FakeLocks) -> None:
+        self.locks = locks
+        self.connections: list[FakeConnection] = []
+
+    async def connect_dedicated(self) -> FakeConnection:
+        conn = FakeConnection(self.locks)
+        self.connections.append(conn)
+        return conn
+
+
+@pytest.mark.asyncio
+async def test_only_one_leader():
+    locks = FakeLocks()
+    first = LeaderElector(FakeDB(locks), 1)
+    second = LeaderElector(FakeDB(locks), 1)
+
+    assert await first.step() is True
+    assert await second.step() is False
+
+
+@pytest.mark.asyncio
+async def test_failover_on_connection_drop():
+    locks = FakeLocks()
+    first_db = FakeDB(locks)
+    first = LeaderElector(first_db, 1)
+    second = LeaderElector(FakeDB(locks), 1)
+
+    await first.step()
+    await second.step()
+    first_db.connections[-1].drop()
+
+    assert first.is_leader is False
+    assert await second.step() is True
+    assert leader_gauge.value() == 1
+    assert await first.step() is False
+
+
+@pytest.mark.asyncio
+async def test_stop_releases_lock():
+    locks = FakeLocks()
+    first = LeaderElector(FakeDB(locks), 1)
+    second = LeaderElector(FakeDB(locks), 1)
+
+    await first.step()
+    await first.stop()
+
+    assert first.is_leader is False
+    assert await second.step() is True
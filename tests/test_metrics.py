@@ -0,0 +1,27 @@
+import pytest
+
+from partyshare.metrics import Counter, Histogram, MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("job_seconds", "Длительность")
+    histogram.observe(0.3, job="digest")
+    histogram.observe(20.0, job="digest")
+
+    lines = registry.render().splitlines()
+    assert 'job_seconds_bucket{job="digest",le="0.25"} 0' in lines
+    assert 'job_seconds_bucket{job="digest",le="0.5"} 1' in lines
+    assert 'job_seconds_bucket{job="digest",le="10"} 1' in lines
+    assert 'job_seconds_bucket{job="digest",le="+Inf"} 2' in lines
+    assert 'job_seconds_count{job="digest"} 2' in lines
+    assert isinstance(histogram, Histogram)
+
+
+def test_same_name_returns_same_metric_of_one_type():
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs_total", "Запуски")
+    assert registry.counter("jobs_total", "Запуски") is counter
+    assert isinstance(counter, Counter)
+    with pytest.raises(ValueError):
+        registry.gauge("jobs_total", "Запуски")
@@ -1,7 +1,14 @@
 from datetime import datetime, timezone
 
+import pytest
+
+from partyshare.config import get_settings
+from partyshare.db import repo as repo_module
+from partyshare.db.models import EventListing, ParticipantStatus
+from partyshare.db.repo import PartyShareRepository
+from partyshare.handlers.events import PAST_EVENTS_LIMIT, build_myevents_view
 from partyshare.services.events import EventCardData, format_event_card, humanize_status
-from partyshare.db.models import ParticipantStatus
+from partyshare.state import OWNER_VIEW, PARTICIPANT_VIEW, PAST_LISTING, state
 
 
 def test_format_event_card_owner():
@@ -23,3 +30,88 @@ def test_humanize_status():
     assert humanize_status(ParticipantStatus.GOING) == "иду"
     assert humanize_status(ParticipantStatus.MAYBE) == "возможно"
 
+
+
+class ListingDB:
+    def __init__(self, owner_rows: list[dict], participant_rows: list[dict]) -> None:
+        self.owner_rows = owner_rows
+        self.participant_rows = participant_rows
+        self.queries: list = []
+
+    async def fetch(self, query: str, *args):
+        query = " ".join(query.split())
+        self.queries.append((query, args))
+        return self.participant_rows if "event_participants" in query else self.owner_rows
+
+
+def event_row(event_id: int, **extra) -> dict:
+    starts_at = datetime(2026, 11, event_id, 18, 0, tzinfo=timezone.utc)
+    return {"id": event_id, "title": f"Событие {event_id}", "starts_at": starts_at, **extra}
+
+
+@pytest.mark.asyncio
+async def test_listing_filters_and_limit():
+    db = ListingDB([], [])
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+
+    await repo.list_owner_events(1)
+    await repo.list_participant_events(1, EventListing.PAST, 50)
+    await repo.list_owner_events(1, EventListing.CANCELED)
+
+    upcoming, past, canceled = db.queries
+    assert "WHERE e.owner_id = $1 AND NOT e.canceled AND e.starts_at >= now() ORDER BY e.starts_at LIMIT $2" in upcoming[0]
+    assert upcoming[1] == (1, None)
+    assert "FROM events e" in upcoming[0]
+    assert "NOT e.canceled AND e.starts_at < now() ORDER BY e.starts_at DESC" in past[0]
+    assert "FROM all_events e JOIN all_event_participants ep" in past[0]
+    assert past[1] == (1, 50)
+    assert "AND e.canceled ORDER BY e.starts_at DESC" in canceled[0]
+    assert "FROM all_events e" in canceled[0]
+
+
+TG_ID = 9001
+
+
+@pytest.fixture
+def listing_env(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "123:test")
+    monkeypatch.setenv("DATABASE_URL", "postgresql://localhost/test")
+    get_settings.cache_clear()
+
+    def install(db: ListingDB) -> None:
+        monkeypatch.setattr(repo_module, "_global_repo", PartyShareRepository(db))  # type: ignore[arg-type]
+
+    yield install
+    state.clear_user(TG_ID)
+    get_settings.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_only_active_tab_is_loaded(listing_env):
+    db = ListingDB([event_row(1)], [event_row(2, status="going")])
+    listing_env(db)
+
+    text, keyboard = await build_myevents_view(5, TG_ID, active_view=PARTICIPANT_VIEW)
+
+    assert "Событие 2" in text
+    assert len(db.queries) == 1 and "event_participants" in db.queries[0][0]
+    assert "starts_at >= now()" in db.queries[0][0]
+    assert [button.text for button in keyboard.inline_keyboard[1]] == ["· Предстоящие", "Прошедшие", "Отменённые"]
+
+
+@pytest.mark.asyncio
+async def test_past_listing_is_remembered_and_read_only(listing_env):
+    db = ListingDB([event_row(3), event_row(1)], [])
+    listing_env(db)
+
+    text, keyboard = await build_myevents_view(5, TG_ID, listing=PAST_LISTING)
+    assert text.startswith("Раздел «Я владелец» · прошедшие")
+    assert db.queries[0][1] == (5, PAST_EVENTS_LIMIT)
+    buttons = [button.text for row in keyboard.inline_keyboard[2:] for button in row]
+    assert buttons == ["Сводка", "След »"]
+
+    # навигация остаётся в выбранном срезе
+    db.queries.clear()
+    text, _ = await build_myevents_view(5, TG_ID, active_view=OWNER_VIEW, direction="next")
+    assert "Событие 1" in text
+    assert "starts_at < now()" in db.queries[0][0]
@@ -0,0 +1,79 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from partyshare.middlewares.ordering import OrderingMiddleware, owner_event_id
+
+
+def update(data: str | None = None):
+    return SimpleNamespace(callback_query=SimpleNamespace(data=data) if data else None)
+
+
+def context(user_id: int) -> dict:
+    return {"event_from_user": SimpleNamespace(id=user_id)}
+
+
+def test_owner_event_id():
+    assert owner_event_id(update("manage_cancel:15")) == 15
+    assert owner_event_id(update("manage_edit:title:7")) == 7
+    assert owner_event_id(update("cycle_status:7")) is None
+    assert owner_event_id(update("manage_back")) is None
+    assert owner_event_id(update()) is None
+
+
+@pytest.mark.asyncio
+async def test_same_user_updates_run_in_order():
+    middleware = OrderingMiddleware()
+    log: list[str] = []
+
+    def handler_for(name: str, delay: float):
+        async def handler(event, data):
+            log.append(f"{name}:start")
+            await asyncio.sleep(delay)
+            log.append(f"{name}:end")
+
+        return handler
+
+    await asyncio.gather(
+        middleware(handler_for("a", 0.02), update("cycle_status:1"), context(1)),
+        middleware(handler_for("b", 0), update("cycle_status:1"), context(1)),
+    )
+    assert log == ["a:start", "a:end", "b:start", "b:end"]
+
+
+@pytest.mark.asyncio
+async def test_different_users_run_concurrently_up_to_limit():
+    middleware = OrderingMiddleware(max_concurrency=2)
+    running = 0
+    peak = 0
+
+    async def handler(event, data):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await asyncio.gather(*(middleware(handler, update(), context(user_id)) for user_id in range(6)))
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_owner_actions_serialized_per_event():
+    middleware = OrderingMiddleware()
+    log: list[str] = []
+
+    def handler_for(name: str):
+        async def handler(event, data):
+            log.append(f"{name}:start")
+            await asyncio.sleep(0.01)
+            log.append(f"{name}:end")
+
+        return handler
+
+    await asyncio.gather(
+        middleware(handler_for("a"), update("manage_cancel:5"), context(1)),
+        middleware(handler_for("b"), update("manage_remove:5"), context(2)),
+    )
+    assert log == ["a:start", "a:end", "b:start", "b:end"]
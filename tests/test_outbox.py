@@ -0,0 +1,191 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from partyshare.outbox import Outbox, OutboxMessage, OutboxWorker, Priority, outbox_delivered
+
+
+class MemoryOutboxRepo:
+    def __init__(self) -> None:
+        self.rows: dict[int, dict] = {}
+        self.keys: set[str] = set()
+
+    async def enqueue_outbox(self, chat_id, method, payload, priority, idempotency_key, batch_key=None):
+        if idempotency_key in self.keys:
+            return None
+        if idempotency_key:
+            self.keys.add(idempotency_key)
+        outbox_id = len(self.rows) + 1
+        self.rows[outbox_id] = {
+            "id": outbox_id,
+            "chat_id": chat_id,
+            "method": method,
+            "payload": payload,
+            "priority": priority,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": datetime.now(timezone.utc),
+            "last_error": None,
+        }
+        return outbox_id
+
+    async def claim_outbox(self, limit, lease_seconds):
+        ready = sorted(
+            (row for row in self.rows.values() if row["status"] == "pending"),
+            key=lambda row: (row["priority"], row["id"]),
+        )[:limit]
+        for row in ready:
+            row["status"] = "sending"
+            row["attempts"] += 1
+        return [dict(row) for row in ready]
+
+    async def renew_outbox_lease(self, outbox_id, attempts, lease_seconds):
+        row = self.rows[outbox_id]
+        return row["status"] == "sending" and row["attempts"] == attempts
+
+    async def release_outbox(self, outbox_ids, attempts, delay_seconds):
+        released = 0
+        for outbox_id, attempt in zip(outbox_ids, attempts, strict=True):
+            row = self.rows[outbox_id]
+            if row["status"] == "sending" and row["attempts"] == attempt:
+                row.update(status="pending", attempts=attempt - 1, delay=delay_seconds)
+                released += 1
+        return released
+
+    def _leased(self, outbox_id, attempts):
+        row = self.rows[outbox_id]
+        return row if row["status"] == "sending" and row["attempts"] == attempts else None
+
+    async def mark_outbox_sent(self, outbox_id, attempts):
+        row = self._leased(outbox_id, attempts)
+        if row is not None:
+            row["status"] = "sent"
+        return row is not None
+
+    async def retry_outbox(self, outbox_id, attempts, delay_seconds, error):
+        row = self._leased(outbox_id, attempts)
+        if row is not None:
+            row.update(status="pending", last_error=error, delay=delay_seconds)
+        return row is not None
+
+    async def dead_letter_outbox(self, outbox_id, attempts, error):
+        row = self._leased(outbox_id, attempts)
+        if row is not None:
+            row.update(status="dead", last_error=error)
+        return row is not None
+
+
+class FakeBot:
+    def __init__(self, failures=None) -> None:
+        self.sent: list[tuple[int, str]] = []
+        self.failures = failures or {}
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        failure = self.failures.pop(chat_id, None)
+        if failure is not None:
+            raise failure
+        self.sent.append((chat_id, text))
+
+
+def make_worker(bot, repo, outbox):
+    return OutboxWorker(bot, repo, outbox, batch_size=10, rate_limit=1000)
+
+
+@pytest.mark.asyncio
+async def test_priority_order_and_idempotency():
+    repo = MemoryOutboxRepo()
+    outbox = Outbox(repo)
+    bot = FakeBot()
+
+    await outbox.send(1, "bulk", priority=Priority.BULK, idempotency_key="r:1")
+    assert await outbox.send(1, "bulk", priority=Priority.BULK, idempotency_key="r:1") is False
+    await outbox.send(2, "reply", priority=Priority.INTERACTIVE)
+
+    await make_worker(bot, repo, outbox).process_batch()
+
+    assert bot.sent == [(2, "reply"), (1, "bulk")]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_reschedules_message():
+    repo = MemoryOutboxRepo()
+    outbox = Outbox(repo)
+    flood = TelegramRetryAfter(method=SendMessage(chat_id=1, text="x"), message="flood", retry_after=7)
+    bot = FakeBot(failures={1: flood})
+
+    await outbox.enqueue(OutboxMessage(chat_id=1, text="hi"))
+    await make_worker(bot, repo, outbox).process_batch()
+
+    row = repo.rows[1]
+    assert row["status"] == "pending"
+    assert row["delay"] == 7.0
+    assert json.loads(row["payload"]) == {"text": "hi"}
+
+
+@pytest.mark.asyncio
+async def test_blocked_user_goes_to_dead_letter():
+    repo = MemoryOutboxRepo()
+    outbox = Outbox(repo)
+    blocked = TelegramForbiddenError(method=SendMessage(chat_id=1, text="x"), message="bot was blocked")
+    bot = FakeBot(failures={1: blocked})
+
+    await outbox.send(1, "hi")
+    await make_worker(bot, repo, outbox).process_batch()
+
+    assert repo.rows[1]["status"] == "dead"
+
+
+@pytest.mark.asyncio
+async def test_retry_after_releases_rest_of_batch():
+    repo = MemoryOutboxRepo()
+    outbox = Outbox(repo)
+    flood = TelegramRetryAfter(method=SendMessage(chat_id=2, text="x"), message="flood", retry_after=30)
+    bot = FakeBot(failures={2: flood})
+
+    for chat_id in (1, 2, 3, 4):
+        await outbox.send(chat_id, f"m{chat_id}")
+    await make_worker(bot, repo, outbox).process_batch()
+
+    assert bot.sent == [(1, "m1")]
+    assert [repo.rows[n]["status"] for n in (1, 2, 3, 4)] == ["sent", "pending", "pending", "pending"]
+    # остаток пачки возвращён без списания попытки и ждёт конца паузы
+    assert [(repo.rows[n]["attempts"], repo.rows[n]["delay"]) for n in (3, 4)] == [(0, 30.0), (0, 30.0)]
+
+
+@pytest.mark.asyncio
+async def test_message_with_lost_lease_is_not_sent():
+    repo = MemoryOutboxRepo()
+    outbox = Outbox(repo)
+    bot = FakeBot()
+    worker = make_worker(bot, repo, outbox)
+
+    await outbox.send(1, "hi")
+    rows = await repo.claim_outbox(10, 60)
+    # аренда истекла, и сообщение перехватил другой воркер
+    repo.rows[1]["attempts"] += 1
+
+    assert await worker._deliver(rows[0]) is None
+    assert bot.sent == []
+    assert repo.rows[1]["status"] == "sending"
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_does_not_overwrite_new_owner():
+    repo = MemoryOutboxRepo()
+    outbox = Outbox(repo)
+
+    class SlowBot(FakeBot):
+        async def send_message(self, chat_id, text, reply_markup=None):
+            # пока шла отправка, аренда истекла и сообщение захватили снова
+            repo.rows[1]["attempts"] += 1
+            await super().send_message(chat_id, text, reply_markup)
+
+    await outbox.send(1, "hi")
+    before = outbox_delivered.value(priority=Priority.NORMAL)
+    await make_worker(SlowBot(), repo, outbox).process_batch()
+
+    assert repo.rows[1]["status"] == "sending"
+    assert outbox_delivered.value(priority=Priority.NORMAL) == before
@@ -0,0 +1,79 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from partyshare.db.models import InviteResult
+from partyshare.db.repo import PartyShareRepository
+
+
+class DummyDB:
+    def __init__(self, row) -> None:
+        self.row = row
+
+    async def fetchrow(self, query: str, *args):
+        return self.row
+
+
+@pytest.mark.asyncio
+async def test_not_found_has_no_event():
+    repo = PartyShareRepository(DummyDB({"result": "not_found", "event_id": None}))  # type: ignore[arg-type]
+    assert await repo.redeem_invite("nope", 1, "going") == (InviteResult.NOT_FOUND, None)
+
+
+@pytest.mark.asyncio
+async def test_joined_returns_event():
+    row = {"result": "joined", "link_expires_at": None, "event_id": 5, "title": "Вечеринка"}
+    repo = PartyShareRepository(DummyDB(row))  # type: ignore[arg-type]
+    result, event = await repo.redeem_invite("tok", 1, "going")
+    assert result is InviteResult.JOINED
+    assert event["title"] == "Вечеринка"
+
+
+async def seed(repo: PartyShareRepository, users: int, **link) -> list[int]:
+    owner_id = await repo.ensure_user(1, "owner", "Owner")
+    event_id = await repo.db.fetchval(
+        "INSERT INTO events (owner_id, title, starts_at) VALUES ($1, 'Вечеринка', now()) RETURNING id",
+        owner_id,
+    )
+    await repo.db.execute(
+        "INSERT INTO event_invite_links (event_id, token, max_uses, expires_at) VALUES ($1, $2, $3, $4)",
+        event_id,
+        link.get("token", "tok"),
+        link.get("max_uses"),
+        link.get("expires_at"),
+    )
+    return [await repo.ensure_user(1000 + n, None, f"User {n}") for n in range(users)]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_joins_respect_max_uses(pg_repo):
+    user_ids = await seed(pg_repo, 200, max_uses=37)
+
+    results = await asyncio.gather(
+        *(pg_repo.redeem_invite("tok", user_id, "going") for user_id in user_ids)
+    )
+
+    counts = Counter(result for result, _ in results)
+    assert counts == {InviteResult.JOINED: 37, InviteResult.EXHAUSTED: 163}
+    assert await pg_repo.db.fetchval("SELECT uses FROM event_invite_links") == 37
+    assert await pg_repo.db.fetchval("SELECT count(*) FROM event_participants") == 37
+
+
+@pytest.mark.asyncio
+async def test_rejoin_and_expired(pg_repo):
+    user_ids = await seed(pg_repo, 1, max_uses=5)
+    await pg_repo.db.execute(
+        "INSERT INTO event_invite_links (event_id, token, expires_at) SELECT event_id, 'old', $1 FROM event_invite_links",
+        datetime.now(timezone.utc) - timedelta(hours=1),
+    )
+
+    assert (await pg_repo.redeem_invite("tok", user_ids[0], "going"))[0] is InviteResult.JOINED
+    assert (await pg_repo.redeem_invite("tok", user_ids[0], "invited"))[0] is InviteResult.ALREADY_PARTICIPANT
+    assert await pg_repo.db.fetchval("SELECT uses FROM event_invite_links WHERE token = 'tok'") == 1
+    assert await pg_repo.db.fetchval("SELECT status FROM event_participants") == "going"
+
+    other = await pg_repo.ensure_user(5000, None, "Late")
+    assert (await pg_repo.redeem_invite("old", other, "going"))[0] is InviteResult.EXPIRED
+    assert (await pg_repo.redeem_invite("missing", other, "going")) == (InviteResult.NOT_FOUND, None)
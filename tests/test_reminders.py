@@ -0,0 +1,76 @@
+import pytest
+
+from partyshare import scheduler
+from partyshare.scheduler import _reminder_job, reminder_backlog
+
+
+class StubRepo:
+    def __init__(self, pending: int, stale: int = 0) -> None:
+        self.pending = [
+            {"id": i, "event_id": i, "title": f"e{i}", "starts_at": "soon"} for i in range(pending)
+        ]
+        self.stale = [{"id": 1000 + i, "event_id": 1000 + i, "title": "old"} for i in range(stale)]
+        self.sent: list[int] = []
+
+    async def drop_stale_reminders(self, now):
+        stale, self.stale = self.stale, []
+        return stale
+
+    async def count_pending_reminders(self, now):
+        return len(self.pending)
+
+    async def fetch_pending_reminders(self, now, limit=None):
+        return self.pending[:limit]
+
+    async def get_event_participants(self, event_id):
+        return [{"tg_id": 1}, {"tg_id": None}]
+
+    async def mark_reminder_sent(self, reminder_id):
+        self.sent.append(reminder_id)
+        self.pending = [row for row in self.pending if row["id"] != reminder_id]
+
+
+class StubOutbox:
+    def __init__(self) -> None:
+        self.messages = []
+
+    async def enqueue_many(self, messages):
+        batch = list(messages)
+        self.messages.extend(batch)
+        return len(batch)
+
+
+@pytest.fixture(autouse=True)
+def reset_catchup():
+    scheduler._catchup.active = False
+    yield
+    scheduler._catchup.active = False
+
+
+@pytest.mark.asyncio
+async def test_backlog_drained_in_bounded_batches():
+    repo = StubRepo(pending=120)
+    outbox = StubOutbox()
+
+    await _reminder_job(repo, outbox, batch_size=50)
+    assert len(repo.sent) == 50
+    assert len(outbox.messages) == 50
+    assert outbox.messages[0].idempotency_key == "reminder:0:1"
+    assert scheduler._catchup.active is True
+    assert reminder_backlog.value() == 70
+
+    await _reminder_job(repo, outbox, batch_size=50)
+    await _reminder_job(repo, outbox, batch_size=50)
+    assert len(repo.sent) == 120
+    assert scheduler._catchup.active is False
+
+
+@pytest.mark.asyncio
+async def test_stale_reminders_dropped_without_sending():
+    repo = StubRepo(pending=0, stale=30)
+    outbox = StubOutbox()
+
+    await _reminder_job(repo, outbox, batch_size=50)
+
+    assert outbox.messages == []
+    assert repo.stale == []
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from partyshare import scheduler
+from partyshare.db.repo import PartyShareRepository
+from partyshare.scheduler import _retention_job, retention_deleted
+
+
+class PurgeRepo:
+    def __init__(self, **batches: list[int]) -> None:
+        self.batches = batches
+        self.cutoffs: dict[str, datetime] = {}
+
+    def _purge(self, kind: str):
+        async def purge(cutoff, limit):
+            self.cutoffs[kind] = cutoff
+            return self.batches[kind].pop(0)
+
+        return purge
+
+    def __getattr__(self, name: str):
+        kind = {
+            "purge_expired_invite_links": "invite_links",
+            "purge_sent_reminders": "reminders",
+            "purge_canceled_events": "canceled_events",
+            "purge_sent_outbox": "outbox",
+        }[name]
+        return self._purge(kind)
+
+
+@pytest.mark.asyncio
+async def test_batches_with_pauses_until_short_batch(monkeypatch):
+    pauses: list[float] = []
+
+    async def fake_sleep(delay):
+        pauses.append(delay)
+
+    monkeypatch.setattr(scheduler.asyncio, "sleep", fake_sleep)
+    repo = PurgeRepo(invite_links=[100, 100, 7], reminders=[0], canceled_events=[3], outbox=[100, 12])
+    before = {kind: retention_deleted.value(kind=kind) for kind in repo.batches}
+
+    await _retention_job(
+        repo,  # type: ignore[arg-type]
+        link_days=30,
+        reminder_days=7,
+        canceled_days=30,
+        outbox_days=30,
+        batch_size=100,
+        pause=0.5,
+    )
+
+    assert pauses == [0.5, 0.5, 0.5]
+    assert all(not batches for batches in repo.batches.values())
+    deleted = {kind: retention_deleted.value(kind=kind) - before[kind] for kind in before}
+    assert deleted == {"invite_links": 207, "reminders": 0, "canceled_events": 3, "outbox": 112}
+    expected = datetime.now(timezone.utc) - timedelta(days=7)
+    assert abs(repo.cutoffs["reminders"] - expected) < timedelta(seconds=5)
+
+
+class ExecuteDB:
+    def __init__(self) -> None:
+        self.calls: list = []
+
+    async def execute(self, query: str, *args):
+        self.calls.append((" ".join(query.split()), args))
+        return "DELETE 7"
+
+
+@pytest.mark.asyncio
+async def test_delete_batch_is_bounded_by_ctid():
+    db = ExecuteDB()
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+    cutoff = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    assert await repo.purge_sent_reminders(cutoff, 500) == 7
+
+    query, args = db.calls[0]
+    assert query.startswith("DELETE FROM reminders WHERE ctid = ANY(ARRAY( SELECT ctid FROM reminders")
+    assert "sent AND remind_at < $1 LIMIT $2 FOR UPDATE SKIP LOCKED" in query
+    assert args == (cutoff, 500)
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import AnswerInlineQuery, GetMe
+from aiogram.types import InlineQuery, User
+
+from partyshare.config import get_settings
+from partyshare.db import repo as repo_module
+from partyshare.db.repo import PartyShareRepository, escape_like
+from partyshare.handlers import inline as inline_module
+from partyshare.handlers.inline import SEARCH_PAGE_SIZE, inline_query_handler
+from partyshare.services.search import normalize_query, similarity, title_matches, trigrams
+
+
+def test_trigrams_match_pg_trgm():
+    assert trigrams("Cat") == {"  c", " ca", "cat", "at "}
+    assert trigrams("a-b") == {"  a", " a ", "  b", " b "}
+    assert similarity("Вечеринка", "вечеринка") == 1.0
+    assert similarity("Вечеринка", "вечер") > similarity("Вечеринка", "пикник")
+
+
+def test_query_helpers():
+    assert normalize_query("  Новый   Год ") == "новый год"
+    assert escape_like("100%_a\\b") == "100\\%\\_a\\\\b"
+    assert title_matches("ГОД", "Новый год у Пети")
+    assert not title_matches("годы", "Новый год")
+
+
+class RecordingSession(BaseSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name="Bot", username="party_bot")
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class SearchDB:
+    """Имитирует поиск: подстрока без учёта регистра, порядок по similarity."""
+
+    def __init__(self, titles: list[str]) -> None:
+        self.searches: list[str] = []
+        start = datetime.now(timezone.utc) + timedelta(days=1)
+        self.events = [
+            {
+                "id": n,
+                "owner_id": 10,
+                "title": title,
+                "starts_at": start + timedelta(hours=n),
+                "location": None,
+                "notes": None,
+                "token": f"tok{n}",
+                "link_expires_at": None,
+                "version": 0,
+            }
+            for n, title in enumerate(titles, start=1)
+        ]
+
+    async def fetch(self, query: str, *args):
+        owner_id, _, text, limit = args
+        self.searches.append(text)
+        rows = [e for e in self.events if e["owner_id"] == owner_id and title_matches(text, e["title"])]
+        rows.sort(key=lambda e: (-similarity(e["title"], text), e["starts_at"]))
+        return rows[:limit]
+
+    async def fetchrow(self, query: str, *args):
+        if "INSERT INTO users" in query:
+            return {"id": 10}
+        return None
+
+
+def inline_query(bot: Bot, query: str, offset: str = "") -> InlineQuery:
+    return InlineQuery.model_validate(
+        {
+            "id": "iq",
+            "from": {"id": 7, "is_bot": False, "first_name": "Owner"},
+            "query": query,
+            "offset": offset,
+        },
+        context={"bot": bot},
+    )
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "123:test")
+    monkeypatch.setenv("DATABASE_URL", "postgresql://localhost/test")
+    get_settings.cache_clear()
+    monkeypatch.setattr(inline_module, "_searches", inline_module.TTLCache(ttl=30, max_entries=100))
+    session = RecordingSession()
+
+    def make(titles: list[str]) -> tuple[Bot, SearchDB, RecordingSession]:
+        db = SearchDB(titles)
+        monkeypatch.setattr(repo_module, "_global_repo", PartyShareRepository(db))  # type: ignore[arg-type]
+        return Bot("123:test", session=session), db, session
+
+    yield make
+    get_settings.cache_clear()
+
+
+def last_answer(session: RecordingSession) -> AnswerInlineQuery:
+    return [call for call in session.calls if isinstance(call, AnswerInlineQuery)][-1]
+
+
+@pytest.mark.asyncio
+async def test_short_query_does_not_hit_db(setup):
+    bot, db, session = setup(["Вечеринка"])
+
+    await inline_query_handler(inline_query(bot, "ве"), bot)
+
+    assert db.searches == []
+    assert last_answer(session).results == []
+
+
+@pytest.mark.asyncio
+async def test_typing_narrows_cached_candidates(setup):
+    bot, db, session = setup(["Вечеринка у Пети", "Вечер настолок", "Пикник"])
+
+    for typed in ["веч", "вече", "вечер", "вечери", "вечер"]:
+        await inline_query_handler(inline_query(bot, typed), bot)
+    # уточнение и возврат к префиксу обходятся без новых запросов
+    assert db.searches == ["веч"]
+    assert [r.title for r in last_answer(session).results] == ["🎉 Вечер настолок", "🎉 Вечеринка у Пети"]
+
+    await inline_query_handler(inline_query(bot, "вечери"), bot)
+    assert [r.title for r in last_answer(session).results] == ["🎉 Вечеринка у Пети"]
+
+    await inline_query_handler(inline_query(bot, "пик"), bot)
+    assert db.searches == ["веч", "пик"]
+
+
+@pytest.mark.asyncio
+async def test_pages_follow_offset(setup):
+    bot, db, session = setup([f"Игра {n}" for n in range(SEARCH_PAGE_SIZE + 3)])
+
+    await inline_query_handler(inline_query(bot, "игра"), bot)
+    first = last_answer(session)
+    assert len(first.results) == SEARCH_PAGE_SIZE
+    assert first.next_offset == str(SEARCH_PAGE_SIZE)
+
+    await inline_query_handler(inline_query(bot, "игра", first.next_offset), bot)
+    second = last_answer(session)
+    assert len(second.results) == 3 and second.next_offset == ""
+    assert db.searches == ["игра"]
+    assert "party_bot?start=invite_tok" in second.results[0].reply_markup.inline_keyboard[0][0].url
@@ -0,0 +1,67 @@
+import asyncio
+import queue
+
+import pytest
+
+from partyshare.sharding import serve_queue, shard_for, update_user_id
+
+
+def message_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {"message_id": 1, "chat": {"id": user_id}, "from": {"id": user_id}, "text": "x"},
+    }
+
+
+def test_update_user_id_covers_update_kinds():
+    assert update_user_id(message_update(1, 42)) == 42
+    assert update_user_id({"update_id": 2, "callback_query": {"id": "q", "from": {"id": 7}}}) == 7
+    assert update_user_id({"update_id": 3, "inline_query": {"id": "i", "from": {"id": 8}}}) == 8
+    assert update_user_id({"update_id": 4, "channel_post": {"chat": {"id": -100}}}) == -100
+    assert update_user_id({"update_id": 5}) is None
+
+
+def test_same_user_always_lands_on_same_shard():
+    shards = {shard_for(message_update(i, 12345), 4) for i in range(100)}
+    assert shards == {12345 % 4}
+    assert shard_for({"update_id": 6}, 4) == 6 % 4
+
+
+@pytest.mark.asyncio
+async def test_serve_queue_processes_until_sentinel():
+    q: queue.Queue = queue.Queue()
+    for i in range(5):
+        q.put(message_update(i, 1))
+    q.put(None)
+    seen = []
+
+    async def handler(data):
+        seen.append(data["update_id"])
+        if data["update_id"] == 2:
+            raise RuntimeError("boom")
+
+    assert await serve_queue(q, handler) == 5
+    assert sorted(seen) == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_serve_queue_keeps_per_user_order():
+    q: queue.Queue = queue.Queue()
+    for i, user_id in enumerate([1, 1, 2, 1, 2]):
+        q.put(message_update(i, user_id))
+    q.put(None)
+    events: list = []
+
+    async def handler(data):
+        user_id = data["message"]["from"]["id"]
+        events.append(("start", user_id, data["update_id"]))
+        # первый апдейт пользователя 1 обрабатывается дольше остальных
+        await asyncio.sleep(0.03 if data["update_id"] == 0 else 0)
+        events.append(("end", user_id, data["update_id"]))
+
+    assert await serve_queue(q, handler) == 5
+
+    user1 = [update_id for kind, user_id, update_id in events if user_id == 1]
+    assert user1 == [0, 0, 1, 1, 3, 3]
+    # пользователь 2 не ждал медленный апдейт пользователя 1
+    assert events.index(("end", 2, 2)) < events.index(("end", 1, 0))
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from partyshare.db.repo import PartyShareRepository
+from partyshare.db.singleflight import SingleFlight, singleflight_shared
+
+
+class SlowDB:
+    def __init__(self) -> None:
+        self.queries: list = []
+        self.release = asyncio.Event()
+        self.fail = False
+
+    async def fetchrow(self, query: str, *args):
+        self.queries.append(args)
+        await self.release.wait()
+        if self.fail:
+            raise ConnectionError("db down")
+        return {"id": args[0], "title": "Вечеринка"}
+
+    async def fetch(self, query: str, *args):
+        self.queries.append(args)
+        await self.release.wait()
+        return [{"user_id": 1}, {"user_id": 2}]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reads_share_one_query():
+    db = SlowDB()
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+    before = singleflight_shared.value(method="get_event")
+
+    calls = [asyncio.create_task(repo.get_event(5)) for _ in range(50)]
+    other = asyncio.create_task(repo.get_event(6))
+    await asyncio.sleep(0)
+    db.release.set()
+    results = await asyncio.gather(*calls)
+
+    assert db.queries == [(5,), (6,)]
+    assert all(result == {"id": 5, "title": "Вечеринка"} for result in results)
+    assert (await other)["id"] == 6
+    assert singleflight_shared.value(method="get_event") == before + 49
+    assert len(repo.flights) == 0
+
+    # запрос завершился — следующий вызов снова идёт в БД
+    await repo.get_event(5)
+    assert db.queries[-1] == (5,)
+    assert len(db.queries) == 3
+
+
+@pytest.mark.asyncio
+async def test_shared_lists_are_copied():
+    db = SlowDB()
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+    first = asyncio.create_task(repo.get_event_participants(5))
+    second = asyncio.create_task(repo.get_event_participants(5))
+    await asyncio.sleep(0)
+    db.release.set()
+    a, b = await asyncio.gather(first, second)
+
+    assert len(db.queries) == 1
+    assert a == b and a is not b
+
+
+@pytest.mark.asyncio
+async def test_error_reaches_every_waiter():
+    db = SlowDB()
+    db.fail = True
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+    calls = [asyncio.create_task(repo.get_event(7)) for _ in range(3)]
+    await asyncio.sleep(0)
+    db.release.set()
+    results = await asyncio.gather(*calls, return_exceptions=True)
+
+    assert len(db.queries) == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def query():
+        await release.wait()
+        return 42
+
+    first = asyncio.create_task(flights.do("k", query))
+    second = asyncio.create_task(flights.do("k", query))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == (42, True)
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_write_detaches_reads_started_before_it():
+    db = SlowDB()
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+
+    async def execute(query: str, *args):
+        return "UPDATE 1"
+
+    db.execute = execute  # type: ignore[method-assign]
+    stale_event = asyncio.create_task(repo.get_event(5))
+    stale_participants = asyncio.create_task(repo.get_event_participants(5))
+    await asyncio.sleep(0)
+
+    await repo.cancel_event(5)
+    fresh_event = asyncio.create_task(repo.get_event(5))
+    await repo.remove_participant(5, 2)
+    fresh_participants = asyncio.create_task(repo.get_event_participants(5))
+    await asyncio.sleep(0)
+    db.release.set()
+    await asyncio.gather(stale_event, stale_participants, fresh_event, fresh_participants)
+
+    # записавший не присоединился к чтениям, начатым до записи
+    assert db.queries == [(5,), (5,), (5,), (5,)]
+
+
+@pytest.mark.asyncio
+async def test_keyword_and_positional_calls_share_one_query():
+    db = SlowDB()
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+    positional = asyncio.create_task(repo.get_event(5))
+    keyword = asyncio.create_task(repo.get_event(event_id=5))
+    await asyncio.sleep(0)
+    db.release.set()
+    await asyncio.gather(positional, keyword)
+
+    assert db.queries == [(5,)]
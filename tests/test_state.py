@@ -0,0 +1,146 @@
+import pytest
+
+from partyshare.state import (
+    HybridStateStorage,
+    MemoryStateStorage,
+    PostgresStateStorage,
+    UserSession,
+    UserStateManager,
+    encode_session,
+)
+from partyshare.utils.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StubRepo:
+    def __init__(self) -> None:
+        self.rows: dict[int, str] = {}
+        self.loads = 0
+
+    async def load_user_state(self, tg_id, ttl):
+        self.loads += 1
+        return self.rows.get(tg_id)
+
+    async def save_user_state(self, tg_id, data):
+        self.rows[tg_id] = data
+
+    async def delete_user_state(self, tg_id):
+        self.rows.pop(tg_id, None)
+
+
+def test_cache_expires_and_evicts_least_recently_used():
+    clock = FakeClock()
+    cache: TTLCache[int, str] = TTLCache(ttl=10, max_entries=2, clock=clock)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    assert cache.get(1) == "a"
+    cache.set(3, "c")
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+
+    clock.now = 11
+    assert cache.get(1) is None
+    assert len(cache) == 1
+
+
+def test_cache_respects_byte_limit():
+    cache: TTLCache[int, str] = TTLCache(ttl=60, max_entries=100, max_bytes=10, sizeof=len)
+    cache.set(1, "aaaa")
+    cache.set(2, "bbbb")
+    cache.set(3, "cccc")
+    assert 1 not in cache
+    assert cache.size_bytes == 8
+    assert cache.evictions == 1
+
+
+def test_memory_storage_is_bounded():
+    manager = UserStateManager(MemoryStateStorage(max_entries=3))
+    for user_id in range(10):
+        manager.set_current_event(user_id, user_id)
+    assert len(manager.storage) == 3
+    assert manager.get_current_event(0) is None
+    assert manager.get_current_event(9) == 9
+
+
+def test_memory_storage_expires_idle_sessions():
+    clock = FakeClock()
+    manager = UserStateManager(MemoryStateStorage(ttl=100, clock=clock))
+    manager.set_view(1, "owner")
+    manager.set_view(2, "participant")
+
+    clock.now = 90
+    assert manager.get_view(1) == "owner"
+    clock.now = 150
+    assert manager.get_view(1) == "owner"
+    assert manager.get_view(2) is None
+
+
+def test_session_encodes_step_and_view_compactly():
+    manager = UserStateManager()
+    manager.set_event_step(1, "location")
+    manager.set_view_event(1, "participant", 5)
+    session = manager.session(1)
+    assert isinstance(session, UserSession)
+    assert (session.step, session.view) == (3, 2)
+    assert manager.get_event_step(1) == "location"
+    assert manager.get_view_event(1, "owner") is None
+    assert encode_session(session) == '{"step": 3, "view": 2, "current_event": 5, "participant_event": 5}'
+
+    with pytest.raises(ValueError):
+        manager.set_event_step(1, "unknown")
+
+
+def test_clear_event_data_pops_all_keys():
+    manager = UserStateManager()
+    manager.set_event_step(1, "title")
+    manager.set_event_data(1, "title", "Пикник")
+    manager.clear_event_data(1)
+    assert manager.get_event_step(1) is None
+    assert manager.get_event_data(1) == {}
+    assert manager.session(1) is None
+
+
+@pytest.mark.asyncio
+async def test_postgres_storage_round_trip():
+    repo = StubRepo()
+    manager = UserStateManager(PostgresStateStorage(repo))
+
+    await manager.storage.load(1)
+    manager.set_pending_edit(1, 42, "title")
+    manager.set_view_event(1, "owner", 7)
+    await manager.storage.flush(1)
+    assert manager.get_pending_edit(1) is None
+
+    await manager.storage.load(1)
+    assert manager.get_pending_edit(1) == (42, "title")
+    assert manager.get_view_event(1, "owner") == 7
+    manager.clear_user(1)
+    await manager.storage.flush(1)
+    assert repo.rows == {}
+
+
+@pytest.mark.asyncio
+async def test_hybrid_storage_reads_database_only_on_miss():
+    repo = StubRepo()
+    storage = HybridStateStorage(MemoryStateStorage(), PostgresStateStorage(repo))
+    manager = UserStateManager(storage)
+
+    await storage.load(1)
+    manager.set_creating_event(1)
+    await storage.flush(1)
+    await storage.load(1)
+    assert manager.is_creating_event(1)
+    await storage.flush(1)
+    assert repo.loads == 1
+    assert 1 in repo.rows
+
+    other = UserStateManager(HybridStateStorage(MemoryStateStorage(), PostgresStateStorage(repo)))
+    await other.storage.load(1)
+    assert other.is_creating_event(1)
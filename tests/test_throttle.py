@@ -0,0 +1,163 @@
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+from aiogram.types import CallbackQuery, Message, Update
+
+from partyshare.middlewares.throttle import (
+    CALLBACK_NOTICE,
+    MESSAGE_NOTICE,
+    ThrottleMiddleware,
+    rate_class,
+    updates_throttled,
+)
+from partyshare.utils.ratelimit import KeyedTokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class RecordingSession(BaseSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+def callback_update(update_id: int, data: str, user_id: int = 7) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": f"cb{update_id}",
+                "chat_instance": "ci",
+                "data": data,
+                "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+            },
+        }
+    )
+
+
+def message_update(update_id: int, text: str, user_id: int = 7) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1,
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+                "text": text,
+            },
+        }
+    )
+
+
+def test_bucket_burst_and_refill():
+    clock = FakeClock()
+    bucket = KeyedTokenBucket(2.0, 3, clock=clock)
+
+    assert [bucket.take("u") for _ in range(4)] == [True, True, True, False]
+    assert bucket.retry_after("u") == pytest.approx(0.5)
+    assert bucket.take("other")
+
+    clock.now += 0.5
+    assert bucket.take("u")
+    assert not bucket.take("u")
+
+
+def test_bucket_prunes_refilled_keys():
+    clock = FakeClock()
+    bucket = KeyedTokenBucket(1.0, 2, clock=clock)
+    for key in range(1024):
+        bucket.take(key)
+    clock.now += 10
+    bucket.take("fresh")
+    assert len(bucket) == 1
+
+
+def test_rate_class():
+    assert rate_class(callback_update(1, "event_nav:owner:next")) == "nav"
+    assert rate_class(callback_update(1, "myevents_owner")) == "nav"
+    assert rate_class(callback_update(1, "cycle_status:5")) == "status"
+    assert rate_class(callback_update(1, "summary:5")) == "callback"
+    assert rate_class(message_update(1, "/summary 5")) == "command"
+    assert rate_class(message_update(1, "Пятница")) == "message"
+
+
+@pytest.fixture
+def setup():
+    clock = FakeClock()
+    session = RecordingSession()
+    bot = Bot("123:test", session=session)
+    router = Router()
+    handled: list = []
+
+    @router.callback_query()
+    async def on_callback(callback: CallbackQuery) -> None:
+        handled.append(callback.data)
+
+    @router.message()
+    async def on_message(message: Message) -> None:
+        handled.append(message.text)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    limits = {"nav": (1.0, 2), "status": (1.0, 1), "callback": (1.0, 1), "message": (1.0, 1)}
+    dp.update.outer_middleware(ThrottleMiddleware(limits, clock=clock))
+    return bot, dp, session, handled, clock
+
+
+@pytest.mark.asyncio
+async def test_over_limit_callback_answered_without_handler(setup):
+    bot, dp, session, handled, clock = setup
+    before = updates_throttled.value(kind="nav")
+
+    for update_id in range(1, 4):
+        await dp.feed_update(bot, callback_update(update_id, "event_nav:owner:next"))
+
+    assert handled == ["event_nav:owner:next"] * 2
+    assert [type(call) for call in session.calls] == [AnswerCallbackQuery]
+    assert session.calls[0].text == CALLBACK_NOTICE
+    assert updates_throttled.value(kind="nav") == before + 1
+
+    # другой класс и другой пользователь считаются отдельно
+    await dp.feed_update(bot, callback_update(4, "cycle_status:5"))
+    await dp.feed_update(bot, callback_update(5, "event_nav:owner:next", user_id=8))
+    assert handled[-2:] == ["cycle_status:5", "event_nav:owner:next"]
+
+    clock.now += 1
+    await dp.feed_update(bot, callback_update(6, "event_nav:owner:next"))
+    assert len(handled) == 5
+
+
+@pytest.mark.asyncio
+async def test_message_notice_sent_once_per_streak(setup):
+    bot, dp, session, handled, clock = setup
+
+    for update_id in range(1, 5):
+        await dp.feed_update(bot, message_update(update_id, "спам"))
+
+    assert handled == ["спам"]
+    notices = [call for call in session.calls if isinstance(call, SendMessage)]
+    assert [call.text for call in notices] == [MESSAGE_NOTICE]
+
+    clock.now += 1
+    await dp.feed_update(bot, message_update(5, "снова"))
+    await dp.feed_update(bot, message_update(6, "спам"))
+    notices = [call for call in session.calls if isinstance(call, SendMessage)]
+    assert len(notices) == 2
@@ -0,0 +1,103 @@
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage
+from aiogram.types import Message
+
+from partyshare.db import repo as repo_module
+from partyshare.db.repo import PartyShareRepository
+from partyshare.handlers.events import cmd_invite
+
+
+class UsersDB:
+    def __init__(self, users: dict[str, int], participants: set[int] = frozenset()) -> None:
+        self.users = users
+        self.participants = set(participants)
+        self.queries: list[str] = []
+
+    async def fetch(self, query: str, *args):
+        self.queries.append(" ".join(query.split()))
+        if "FROM users" in query:
+            return [
+                {"id": user_id, "username": name}
+                for name, user_id in self.users.items()
+                if name.lower() in args[0]
+            ]
+        if "INSERT INTO event_participants" in query:
+            added = [user_id for user_id in args[1] if user_id not in self.participants]
+            self.participants.update(added)
+            return [{"user_id": user_id} for user_id in added]
+        return []
+
+    async def fetchrow(self, query: str, *args):
+        return {"id": 1}
+
+    async def fetchval(self, query: str, *args):
+        # владелец события — пользователь 1
+        return 1
+
+
+@pytest.mark.asyncio
+async def test_resolve_usernames_is_one_query():
+    names = [f"guest{n}" for n in range(12)]
+    db = UsersDB({name.capitalize(): n for n, name in enumerate(names, start=10)})
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+
+    found = await repo.resolve_usernames([f"@{name.upper()}" for name in names] + ["@guest0", "@"])
+
+    assert len(db.queries) == 1
+    assert "lower(username) = ANY($1::text[])" in db.queries[0]
+    assert sorted(found) == sorted(names)
+    assert found["guest3"]["id"] == 13
+
+
+@pytest.mark.asyncio
+async def test_resolve_nothing_skips_query():
+    db = UsersDB({})
+    repo = PartyShareRepository(db)  # type: ignore[arg-type]
+    assert await repo.resolve_usernames([]) == {}
+    assert db.queries == []
+
+
+class RecordingSession(BaseSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_invite_many_users_at_once(monkeypatch):
+    db = UsersDB({"Anna": 20, "boris": 21, "vera": 22}, participants={22})
+    monkeypatch.setattr(repo_module, "_global_repo", PartyShareRepository(db))  # type: ignore[arg-type]
+    session = RecordingSession()
+    bot = Bot("123:test", session=session)
+    message = Message.model_validate(
+        {
+            "message_id": 1,
+            "date": 1,
+            "chat": {"id": 7, "type": "private"},
+            "from": {"id": 7, "is_bot": False, "first_name": "Owner"},
+            "text": "/invite 5 @anna @Boris @vera @ghost @anna",
+        },
+        context={"bot": bot},
+    )
+
+    await cmd_invite(message)
+
+    assert len(db.queries) == 2
+    reply = [call for call in session.calls if isinstance(call, SendMessage)][-1].text
+    assert reply.splitlines() == [
+        "Приглашены: @anna @Boris",
+        "Уже участвуют: @vera",
+        "Не найдены (пусть сначала напишут боту): @ghost",
+    ]
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from partyshare.webhook import SECRET_HEADER, WebhookServer, dispatcher_handler
+
+
+def make_update(update_id: int, text: str = "hi") -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "U"},
+            "text": text,
+        },
+    }
+
+
+@pytest.fixture
+async def setup():
+    handled: list[int] = []
+    release = asyncio.Event()
+    router = Router()
+
+    @router.message()
+    async def on_message(message: Message) -> None:
+        if message.text == "slow":
+            await release.wait()
+        handled.append(message.message_id)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot("123:test")
+    server = WebhookServer(dispatcher_handler(bot, dp), path="/hook", secret="s3cret")
+    client = TestClient(TestServer(server.create_app()))
+    await client.start_server()
+    yield client, server, handled, release
+    await client.close()
+    await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_rejects_wrong_secret(setup):
+    client, _, handled, _ = setup
+    resp = await client.post("/hook", json=make_update(1), headers={SECRET_HEADER: "nope"})
+    assert resp.status == 401
+    assert handled == []
+
+
+@pytest.mark.asyncio
+async def test_rejects_malformed_payload(setup):
+    client, _, _, _ = setup
+    resp = await client.post("/hook", data=b"not json", headers={SECRET_HEADER: "s3cret"})
+    assert resp.status == 400
+
+
+@pytest.mark.asyncio
+async def test_acks_before_processing_and_drains(setup):
+    client, server, handled, release = setup
+    resp = await client.post("/hook", json=make_update(1, "slow"), headers={SECRET_HEADER: "s3cret"})
+    assert resp.status == 200
+    assert server.inflight == 1
+    assert handled == []
+
+    drain = asyncio.create_task(server.drain())
+    await asyncio.sleep(0)
+    resp = await client.post("/hook", json=make_update(2), headers={SECRET_HEADER: "s3cret"})
+    assert resp.status == 503
+
+    release.set()
+    await drain
+    assert handled == [1]
+    assert server.inflight == 0